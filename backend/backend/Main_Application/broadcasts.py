@@ -0,0 +1,155 @@
+"""
+Broadcast Pipeline
+==================
+
+Sends model-change events to channel groups without blocking request
+threads on channel I/O.
+
+- broadcast() queues an event after the surrounding transaction commits, so
+  rolled-back changes are never announced and nothing is sent while rows
+  are still locked.
+- Committed events go to an in-process queue drained by one daemon thread,
+  which owns an event loop (and so the channel layer connection) for the
+  life of the process. Request threads only append to the queue.
+- Only broker-backed layers (Redis, the local broker) are used from the
+  worker's loop: they connect per event loop. InMemoryChannelLayer keeps its
+  queues on the ASGI server's loop and is not thread-safe, so with it events
+  are sent at commit from the committing thread with async_to_sync, which
+  hands them to the server's loop.
+- broadcast_latest() is for summaries such as stats: build() runs once per
+  transaction at commit (one commit hook, see commit_hooks.py), however many
+  rows changed, and the worker sends
+  only the newest summary per (group, key) in each COALESCE_WINDOW, after
+  that window's regular events. A bulk status update of 500 orders sends 500
+  order events and one stats message.
+- With WORKER disabled events wait in the queue until flush() sends them
+  from the calling thread (tests, management commands).
+"""
+
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.db import transaction
+
+from Main_Application.commit_hooks import CommitHook, on_commit_once
+from Main_Application.conf import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'COALESCE_WINDOW': 0.25,  # seconds; stats messages within a window are merged into the newest
+    'WORKER': True,  # send from a background thread; False keeps events queued until flush()
+}
+
+
+def get_config():
+    """Get broadcast settings merged over the defaults"""
+    return get_settings('BROADCASTS', DEFAULTS)
+
+
+class BroadcastQueue:
+    """Committed events waiting for the worker"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.events = []
+        self.latest = {}
+        self.thread = None
+
+    def put(self, group, event, key=None):
+        with self.lock:
+            if key is None:
+                self.events.append((group, event))
+            else:
+                self.latest[(group, key)] = event
+        if not get_config()['WORKER']:
+            return
+        if worker_can_send(get_channel_layer()):
+            self.start()
+            self.wakeup.set()
+        else:
+            flush()
+
+    def take(self):
+        """Remove and return everything queued: events in order, then the latest summaries"""
+        with self.lock:
+            batch = self.events + [(group, event) for (group, _), event in self.latest.items()]
+            self.events = []
+            self.latest = {}
+        return batch
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name='broadcasts', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        while True:
+            self.wakeup.wait()
+            # Let the burst that woke us finish before sending
+            loop.run_until_complete(asyncio.sleep(get_config()['COALESCE_WINDOW']))
+            self.wakeup.clear()
+            loop.run_until_complete(send(self.take()))
+
+
+def worker_can_send(channel_layer):
+    """Whether the worker thread's own event loop may use the channel layer"""
+    return channel_layer is not None and not isinstance(channel_layer, InMemoryChannelLayer)
+
+
+async def send(batch):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for group, event in batch:
+        try:
+            await channel_layer.group_send(group, event)
+        except Exception:
+            # One failed send must not drop the rest of the batch or kill the worker
+            logger.exception('Could not broadcast %s to %s', event.get('type'), group)
+
+
+queue = BroadcastQueue()
+
+
+def broadcast(group, event):
+    """Send an event to a group once the current transaction commits"""
+    transaction.on_commit(lambda: queue.put(group, event))
+
+
+class _Summary(CommitHook):
+    """on_commit callback building one coalesced summary"""
+
+    def __init__(self, group, key, build):
+        self.group = group
+        self.key = key
+        self.build = build
+
+    def run(self):
+        try:
+            event = self.build()
+        except Exception:
+            logger.exception('Could not build %s for %s', self.key, self.group)
+            return
+        queue.put(self.group, event, key=self.key)
+
+
+def broadcast_latest(group, key, build):
+    """Send build() to a group after commit, at most once per transaction and coalescing window"""
+    # A summary already registered for this transaction will see these changes too
+    if on_commit_once(('broadcast_latest', group, key), lambda: _Summary(group, key, build)) is None:
+        # Not in a transaction: send now
+        _Summary(group, key, build)()
+
+
+def flush():
+    """Send everything queued from the calling thread"""
+    async_to_sync(send)(queue.take())
@@ -0,0 +1,372 @@
+"""
+Local Channel Broker
+====================
+
+A pure-Python stand-in for the Redis channel layer, so several ASGI workers
+(and the tests and benchmarks) can share groups without a Redis server.
+
+- ChannelBroker is a small asyncio TCP server holding the group membership.
+  Every layer connection gets a client id; process-specific channel names
+  embed it ("specific.<client>!<token>", as channels_redis does), so the
+  broker routes a message straight to the worker that owns the channel.
+- group_send is fanned out by the broker with one frame per worker holding
+  the group's channels on it, not one frame per consumer.
+- BrokerChannelLayer is the channel layer talking to it. Like the Redis
+  layer, messages must be JSON-serializable, channels are bounded by
+  capacity (overflow is dropped), messages expire after expiry seconds and
+  group memberships after group_expiry seconds; the groups of a worker that
+  disconnects are dropped at once.
+- The layer keeps one connection per event loop, in a WeakKeyDictionary.
+  A connection closes itself and leaves the map when its reader task ends:
+  loops shutting down cancel their tasks (asyncio.run, async_to_sync), as
+  does losing the broker. Connections of loops closed without that are
+  dropped the next time the layer is used.
+
+Run the broker with `python manage.py run_channel_broker` and select it with
+CHANNEL_LAYER=local (see CHANNEL_LAYERS in settings).
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 6390
+# Largest frame (one JSON line) accepted by either side
+FRAME_LIMIT = 16 * 1024 * 1024
+
+
+async def _write(writer, frame):
+    writer.write(json.dumps(frame).encode('utf-8') + b'\n')
+    await writer.drain()
+
+
+def channel_client(channel):
+    """Client id embedded in a process-specific channel name, or None"""
+    if '!' not in channel:
+        return None
+    return channel[:channel.index('!')].rsplit('.', 1)[-1]
+
+
+class ChannelBroker:
+    """Routes channel layer messages between worker connections"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.clients = {}  # client id -> StreamWriter
+        self.groups = defaultdict(dict)  # group -> {channel: expires at}
+        self.listeners = {}  # plain channel name -> client id
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=FRAME_LIMIT)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for writer in list(self.clients.values()):
+            writer.close()
+
+    def start_in_thread(self):
+        """Serve from a background thread (tests, benchmarks); returns once listening"""
+        self.loop = asyncio.new_event_loop()
+        listening = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.start())
+            listening.set()
+            self.loop.run_forever()
+            # Let tasks of this loop (layer connections opened on it) finish, as asyncio.run() does
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name='channel-broker', daemon=True)
+        self.thread.start()
+        listening.wait()
+        return self
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def handle(self, reader, writer):
+        client_id = uuid.uuid4().hex[:12]
+        self.clients[client_id] = writer
+        try:
+            await _write(writer, {'op': 'hello', 'client': client_id})
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self.dispatch(client_id, writer, json.loads(line))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.disconnect(client_id)
+            writer.close()
+
+    def disconnect(self, client_id):
+        """Forget a worker and every group membership of its channels"""
+        self.clients.pop(client_id, None)
+        for group, channels in list(self.groups.items()):
+            for channel in [channel for channel in channels if channel_client(channel) == client_id]:
+                del channels[channel]
+            if not channels:
+                del self.groups[group]
+        for channel in [channel for channel, owner in self.listeners.items() if owner == client_id]:
+            del self.listeners[channel]
+
+    async def dispatch(self, client_id, writer, frame):
+        op = frame['op']
+        if op == 'send':
+            await self.deliver([frame['channel']], frame['message'], frame['expires'])
+        elif op == 'group_send':
+            channels = self.group_channels(frame['group'])
+            await self.deliver(channels, frame['message'], frame['expires'])
+        elif op == 'group_add':
+            self.groups[frame['group']][frame['channel']] = time.time() + frame['group_expiry']
+        elif op == 'group_discard':
+            channels = self.groups.get(frame['group'], {})
+            channels.pop(frame['channel'], None)
+            if not channels:
+                self.groups.pop(frame['group'], None)
+        elif op == 'listen':
+            self.listeners[frame['channel']] = client_id
+        elif op == 'flush':
+            self.groups.clear()
+            self.listeners.clear()
+        if 'id' in frame:
+            await _write(writer, {'op': 'ack', 'id': frame['id']})
+
+    def group_channels(self, group):
+        channels = self.groups.get(group)
+        if not channels:
+            return []
+        now = time.time()
+        for channel in [channel for channel, expires in channels.items() if expires < now]:
+            del channels[channel]
+        return list(channels)
+
+    async def deliver(self, channels, message, expires):
+        """Send a message to channels with one frame per owning worker"""
+        by_client = defaultdict(list)
+        for channel in channels:
+            by_client[channel_client(channel) or self.listeners.get(channel)].append(channel)
+        for client_id, client_channels in by_client.items():
+            writer = self.clients.get(client_id)
+            if writer is None:
+                continue
+            try:
+                await _write(writer, {
+                    'op': 'deliver', 'channels': client_channels, 'message': message, 'expires': expires,
+                })
+            except ConnectionError:
+                self.disconnect(client_id)
+
+
+class BrokerConnection:
+    """One event loop's connection to the broker and its receive buffers"""
+
+    def __init__(self, layer, reader, writer, client_id):
+        self.layer = layer
+        self.loop = asyncio.get_running_loop()
+        self.reader = reader
+        self.writer = writer
+        self.client_id = client_id
+        self.queues = {}
+        self.listening = set()
+        self.pending = {}
+        self.next_id = 0
+        self.reader_task = asyncio.ensure_future(self.read_frames())
+
+    @classmethod
+    async def open(cls, layer):
+        reader, writer = await asyncio.open_connection(layer.host, layer.port, limit=FRAME_LIMIT)
+        hello = json.loads(await reader.readline())
+        return cls(layer, reader, writer, hello['client'])
+
+    def queue(self, channel):
+        if channel not in self.queues:
+            self.queues[channel] = asyncio.Queue(maxsize=self.layer.get_capacity(channel))
+        return self.queues[channel]
+
+    async def read_frames(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                frame = json.loads(line)
+                if frame['op'] == 'ack':
+                    future = self.pending.pop(frame['id'], None)
+                    if future is not None and not future.done():
+                        future.set_result(None)
+                    continue
+                for channel in frame['channels']:
+                    try:
+                        self.queue(channel).put_nowait((frame['expires'], frame['message']))
+                    except asyncio.QueueFull:
+                        # Same as a full channel on the Redis layer: the message is dropped
+                        pass
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('Channel broker connection closed'))
+            # Cancelled by the loop shutting down, or the broker went away: the next call reconnects
+            if self.layer.connections.get(self.loop) is self:
+                del self.layer.connections[self.loop]
+            if not self.loop.is_closed():
+                self.writer.close()
+
+    async def request(self, frame, wait=False):
+        """Send a frame; with wait=True, until the broker has applied it"""
+        future = None
+        if wait:
+            self.next_id += 1
+            frame['id'] = self.next_id
+            future = asyncio.get_running_loop().create_future()
+            self.pending[self.next_id] = future
+        await _write(self.writer, frame)
+        if future is not None:
+            await future
+
+    async def receive(self, channel):
+        if channel_client(channel) is None and channel not in self.listening:
+            self.listening.add(channel)
+            await self.request({'op': 'listen', 'channel': channel}, wait=True)
+        queue = self.queue(channel)
+        while True:
+            expires, message = await queue.get()
+            if expires >= time.time():
+                return message
+
+    async def close(self):
+        self.reader_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class BrokerChannelLayer(BaseChannelLayer):
+    """Channel layer backed by a ChannelBroker, shared by every worker connected to it"""
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, expiry=60, group_expiry=86400,
+                 capacity=100, channel_capacity=None, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.host = host
+        self.port = port
+        self.group_expiry = group_expiry
+        self.connections = weakref.WeakKeyDictionary()  # event loop -> BrokerConnection
+
+    async def connection(self):
+        """Get the connection of the running event loop, opening it on first use"""
+        loop = asyncio.get_running_loop()
+        if loop not in self.connections:
+            self._drop_stale_connections()
+            connection = await BrokerConnection.open(self)
+            if loop in self.connections:
+                # Opened concurrently by another task of this loop
+                await connection.close()
+            else:
+                self.connections[loop] = connection
+        return self.connections[loop]
+
+    def _drop_stale_connections(self):
+        """Forget connections of loops closed without cancelling their tasks"""
+        for loop in [loop for loop in list(self.connections.keys()) if loop.is_closed()]:
+            connection = self.connections.pop(loop)
+            # Nothing can run on a closed loop: end the stream so the broker drops the worker's
+            # channels now; the socket itself is closed when the transport is collected
+            sock = connection.writer.get_extra_info('socket')
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _expires(self):
+        return time.time() + self.expiry
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        assert '__asgi_channel__' not in message
+        connection = await self.connection()
+        if channel_client(channel) == connection.client_id and connection.queue(channel).full():
+            raise ChannelFull(channel)
+        await connection.request({
+            'op': 'send', 'channel': channel, 'message': message, 'expires': self._expires(),
+        })
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel)
+        connection = await self.connection()
+        return await connection.receive(channel)
+
+    async def new_channel(self, prefix='specific'):
+        connection = await self.connection()
+        return f'{prefix}.{connection.client_id}!{uuid.uuid4().hex}'
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), 'Group name not valid'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        connection = await self.connection()
+        await connection.request({
+            'op': 'group_add', 'group': group, 'channel': channel, 'group_expiry': self.group_expiry,
+        }, wait=True)
+
+    async def group_discard(self, group, channel):
+        assert self.valid_channel_name(channel), 'Invalid channel name'
+        assert self.valid_group_name(group), 'Invalid group name'
+        connection = await self.connection()
+        await connection.request({'op': 'group_discard', 'group': group, 'channel': channel}, wait=True)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        assert self.valid_group_name(group), 'Invalid group name'
+        connection = await self.connection()
+        await connection.request({
+            'op': 'group_send', 'group': group, 'message': message, 'expires': self._expires(),
+        })
+
+    async def flush(self):
+        connection = await self.connection()
+        await connection.request({'op': 'flush'}, wait=True)
+        connection.queues.clear()
+        connection.listening.clear()
+
+    async def close(self):
+        """Close the connection of the running event loop"""
+        connection = self.connections.pop(asyncio.get_running_loop(), None)
+        if connection is not None:
+            await connection.close()
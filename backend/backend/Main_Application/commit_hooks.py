@@ -0,0 +1,47 @@
+"""
+Commit Hooks
+============
+
+One on_commit callback per transaction, shared by every change made in it.
+
+- on_commit_once(key, factory) registers factory() with transaction.on_commit
+  the first time key is used in a transaction and returns that same callback
+  to later changes, so they add to it instead of registering their own.
+- The registry lives on the connection and holds its callbacks weakly: an
+  entry goes away once Django drops the callback, after running it at commit
+  or discarding it on rollback, so the next transaction starts afresh.
+- Outside a transaction there is nothing to share: on_commit_once() returns
+  None and the caller does its work at once.
+"""
+
+import weakref
+
+from django.db import transaction
+
+
+def on_commit_once(key, factory, using=None):
+    """Get the callback registered under key in the current transaction, registering factory() on first use"""
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+    registry = getattr(connection, 'commit_hooks', None)
+    if registry is None:
+        registry = connection.commit_hooks = weakref.WeakValueDictionary()
+    callback = registry.get(key)
+    if callback is None or callback.done:
+        callback = registry[key] = factory()
+        transaction.on_commit(callback, using=using)
+    return callback
+
+
+class CommitHook:
+    """Base for on_commit_once() callbacks: run() does the work, once"""
+
+    done = False
+
+    def __call__(self):
+        self.done = True
+        self.run()
+
+    def run(self):
+        raise NotImplementedError
@@ -0,0 +1,16 @@
+"""
+Feature Settings
+================
+
+Service modules keep their tunables in a DEFAULTS dict next to the code
+that uses them. settings.py only names the values a deployment changes,
+in a dict per feature (PRODUCT_FEED_CACHE, ...), usually read from
+the environment.
+"""
+
+from django.conf import settings
+
+
+def get_settings(name, defaults):
+    """Get the settings dict `name` merged over the given defaults, read on every call so overrides apply"""
+    return {**defaults, **getattr(settings, name, {})}
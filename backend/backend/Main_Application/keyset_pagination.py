@@ -0,0 +1,197 @@
+"""
+Keyset (Cursor) Pagination
+==========================
+
+Opaque cursor pagination over a (field, id) key. Each page is fetched with a
+``WHERE (field, id) > (last_field, last_id) ORDER BY field, id LIMIT n``
+style query, so deep pages cost the same as the first one, and rows inserted
+while a client scrolls never shift or duplicate results.
+
+NULLs in the sort field are treated as the smallest value (first when
+ascending, last when descending) on every database backend.
+"""
+
+import base64
+import json
+from decimal import Decimal
+from datetime import date, datetime
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor cannot be decoded or does not match the ordering"""
+
+
+def encode_cursor(ordering, value, pk, reverse=False):
+    """Encode a position into an opaque, URL-safe cursor"""
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    payload = {'o': ordering, 'k': [value, pk], 'r': 1 if reverse else 0}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    """Decode a cursor into (value, pk, reverse), checking it was issued for this ordering"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value, pk = payload['k']
+        reverse = bool(payload.get('r'))
+        if payload['o'] != ordering:
+            raise InvalidCursor('Cursor was issued for a different sort order')
+        return value, int(pk), reverse
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _parse_ordering(ordering):
+    descending = ordering.startswith('-')
+    return ordering.lstrip('-'), descending
+
+
+def _order_by(field, descending):
+    if descending:
+        return [F(field).desc(nulls_last=True), '-pk']
+    return [F(field).asc(nulls_first=True), 'pk']
+
+
+def _after(field, value, pk, descending, nullable):
+    """Rows strictly after (value, pk) in the given direction"""
+    op = 'lt' if descending else 'gt'
+    if not nullable:
+        return Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+    if value is None:
+        if descending:
+            return Q(**{f'{field}__isnull': True, 'pk__lt': pk})
+        return Q(**{f'{field}__isnull': True, 'pk__gt': pk}) | Q(**{f'{field}__isnull': False})
+    after = Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+    if descending:
+        after |= Q(**{f'{field}__isnull': True})
+    return after
+
+
+def paginate_keyset(queryset, ordering, page_size, cursor=None):
+    """
+    Fetch one page of a queryset ordered by (ordering, pk).
+
+    ordering is a field name, optionally prefixed with '-'. Returns
+    (rows, next_cursor, previous_cursor); cursors are None at either end.
+    Raises InvalidCursor for malformed or mismatched cursors.
+    """
+    field, descending = _parse_ordering(ordering)
+    model_field = queryset.model._meta.get_field(field)
+    position = None
+    reverse = False
+    if cursor:
+        value, pk, reverse = decode_cursor(cursor, ordering)
+        if value is not None:
+            try:
+                value = model_field.to_python(value)
+            except Exception:
+                raise InvalidCursor('Invalid cursor')
+        position = (value, pk)
+
+    # Walking backwards is the same query in the opposite direction
+    direction = (not descending) if reverse else descending
+    queryset = queryset.order_by(*_order_by(field, direction))
+    if position:
+        queryset = queryset.filter(_after(field, position[0], position[1], direction, model_field.null))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+        has_next, has_previous = position is not None, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    next_cursor = None
+    previous_cursor = None
+    if rows and has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(ordering, getattr(last, field), last.pk)
+    if rows and has_previous:
+        first = rows[0]
+        previous_cursor = encode_cursor(ordering, getattr(first, field), first.pk, reverse=True)
+    return rows, next_cursor, previous_cursor
+
+
+def wants_count(request, default=True):
+    """Read the include_count query parameter (skip-total-count mode)"""
+    value = request.query_params.get('include_count')
+    if value is None:
+        return default
+    return value.lower() not in ('false', '0', 'no')
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination class for cursor paging over (ordering, id).
+
+    The view sets ``cursor_ordering`` (e.g. '-created_at'). Cursor mode is
+    used when the request carries a ``cursor`` parameter (empty for the first
+    page); otherwise ``fallback_class`` paginates as before, or the list is
+    returned unpaginated when it is None.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    ordering = '-created_at'
+    fallback_class = None
+
+    def _get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            if self.fallback_class is None:
+                return None
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.count = queryset.count() if wants_count(request, default=False) else None
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        try:
+            rows, self.next_cursor, self.previous_cursor = paginate_keyset(
+                queryset, ordering, self._get_page_size(request),
+                request.query_params.get(self.cursor_query_param) or None,
+            )
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self._link(self.next_cursor),
+            'previous': self._link(self.previous_cursor),
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+            'results': data,
+        })
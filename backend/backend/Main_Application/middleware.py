@@ -10,22 +10,19 @@ from django.conf import settings
 
 class SessionCookieMiddleware(MiddlewareMixin):
     """
-    Middleware to ensure session cookies are properly set
+    Middleware to ensure session cookies are properly set.
+    Sessions are not created here: code that needs a guest session calls
+    Main_Application.sessions.get_session_key().
     """
     
-    def process_request(self, request):
-        # Ensure session is created if it doesn't exist
-        if not request.session.session_key:
-            request.session.create()
-        return None
-    
     def process_response(self, request, response):
         # Skip for Django admin panel to avoid conflicts
         if request.path.startswith('/admin/'):
             return response
         
-        # Add session cookie headers for cross-origin requests
-        if hasattr(request, 'session') and request.session.session_key:
+        # Add session cookie headers for cross-origin requests when the
+        # session was written in this request
+        if hasattr(request, 'session') and request.session.modified and request.session.session_key:
             # Set session cookie with proper attributes
             response.set_cookie(
                 settings.SESSION_COOKIE_NAME,
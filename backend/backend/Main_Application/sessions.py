@@ -0,0 +1,69 @@
+"""
+Guest Sessions
+==============
+
+Sessions are created lazily: only code that needs to identify a guest (the
+guest cart) calls get_session_key(), so catalog reads and JWT-authenticated
+API calls never write a session row.
+
+- get_session_key() returns a stable guest identifier, creating the session
+  on first use. With the signed-cookie backend the session key is the whole
+  signed payload and changes with every write, so a random key kept inside
+  the session identifies the guest instead.
+- get_guest_key() returns that identifier only when the guest already has
+  one (login looks up the guest cart without creating a session).
+- purge_expired_sessions() deletes expired database sessions in batches of
+  primary keys, so the purge never holds a long lock on the session table.
+"""
+
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+SIGNED_COOKIES_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+DATABASE_ENGINES = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+GUEST_KEY = '_guest_key'
+
+
+def get_session_key(request):
+    """Get the key identifying a guest, creating the session when it has none"""
+    session = request.session
+    if settings.SESSION_ENGINE == SIGNED_COOKIES_ENGINE:
+        if GUEST_KEY not in session:
+            session[GUEST_KEY] = get_random_string(32)
+        return session[GUEST_KEY]
+    if not session.session_key:
+        session.create()
+    return session.session_key
+
+
+def get_guest_key(request):
+    """Get the key identifying a guest without creating a session, None when there is none"""
+    session = getattr(request, 'session', None)
+    if session is None:
+        return None
+    if settings.SESSION_ENGINE == SIGNED_COOKIES_ENGINE:
+        return session.get(GUEST_KEY)
+    return session.session_key
+
+
+def purge_expired_sessions(batch_size=1000, now=None, pause=0):
+    """Delete expired database sessions batch by batch (pause seconds apart), returns the number deleted"""
+    if settings.SESSION_ENGINE not in DATABASE_ENGINES:
+        # Cache entries and signed cookies expire on their own
+        return 0
+    from django.contrib.sessions.models import Session
+
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=keys, expire_date__lt=now).delete()[0]
+        if pause:
+            time.sleep(pause)
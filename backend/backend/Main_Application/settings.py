@@ -222,16 +222,58 @@ SESSION_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = False  
 SESSION_COOKIE_SAMESITE = 'None'  # Allow cross-origin cookies
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are only written when modified (guest cart); catalog reads stay read-only
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_COOKIE_NAME = 'sessionid'
 SESSION_COOKIE_DOMAIN = None  # Allow cross-origin cookies
 SESSION_COOKIE_PATH = '/'
+# Session storage, selected with SESSION_BACKEND: db (default), cached_db,
+# cache (the shared cache, see REDIS_URL) or signed_cookies (no server storage)
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "db").lower()
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}.get(SESSION_BACKEND, 'django.contrib.sessions.backends.db')
 
 # Media files settings
 MEDIA_URL = '/media/'
 # MEDIA_URL = f"{BACKEND_BASE_URL}/media/"
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache Settings
+# Set REDIS_URL (e.g. redis://127.0.0.1:6379/1) to share the cache between workers
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'anon-ecommerce',
+        }
+    }
+
+# Homepage / home pagination feed cache (products/feed_cache.py): PRODUCT_FEED_CACHE overrides
+# the module's DEFAULTS through Main_Application/conf.py; the defaults need no entry here
+
+# Guest cart and session sweeper (cart/sweeper.py); run sweep_guest_carts from cron,
+# or set CART_SWEEPER_AUTO to sweep from a background thread as guest carts are created
+CART_SWEEPER = {
+    'AUTO': os.environ.get("CART_SWEEPER_AUTO", "False").lower() == "true",
+}
+
+# Outbound email queue (settings/email_outbox.py)
+EMAIL_OUTBOX = {
+    'DISPATCH_ON_COMMIT': os.environ.get("EMAIL_OUTBOX_DISPATCH_ON_COMMIT", "True").lower() == "true",
+}
+
 # Swagger Settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -261,22 +303,70 @@ SWAGGER_SETTINGS = {
 # Channels and WebSocket Settings
 ASGI_APPLICATION = 'Main_Application.asgi.application'
 
-# Channel layer configuration (using in-memory for development)
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+# Channel layer, selected with CHANNEL_LAYER:
+#   memory       - in-process only; groups do not reach other ASGI workers (default)
+#   redis        - channels_redis.core.RedisChannelLayer, shared by every worker
+#   redis-pubsub - channels_redis.pubsub.RedisPubSubChannelLayer
+#   local        - pure-Python Redis stand-in (python manage.py run_channel_broker),
+#                  for tests and local multi-worker runs
+CHANNEL_LAYER = os.environ.get("CHANNEL_LAYER", "memory").lower()
+CHANNEL_LAYER_CONFIG = {
+    'capacity': int(os.environ.get("CHANNEL_LAYER_CAPACITY", "100")),  # messages buffered per channel
+    'expiry': 60,  # seconds an undelivered message is kept
+    'group_expiry': 86400,  # seconds a group membership is kept
+}
+
+if CHANNEL_LAYER == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.environ.get("CHANNEL_REDIS_URL") or REDIS_URL or 'redis://127.0.0.1:6379/2'],
+                'prefix': 'anon-ecommerce',
+                **CHANNEL_LAYER_CONFIG,
+            },
+        },
+    }
+elif CHANNEL_LAYER == 'redis-pubsub':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {
+                'hosts': [os.environ.get("CHANNEL_REDIS_URL") or REDIS_URL or 'redis://127.0.0.1:6379/2'],
+                'prefix': 'anon-ecommerce',
+            },
+        },
+    }
+elif CHANNEL_LAYER == 'local':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'Main_Application.channel_layers.BrokerChannelLayer',
+            'CONFIG': {
+                'host': os.environ.get("CHANNEL_BROKER_HOST", "127.0.0.1"),
+                'port': int(os.environ.get("CHANNEL_BROKER_PORT", "6390")),
+                **CHANNEL_LAYER_CONFIG,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': CHANNEL_LAYER_CONFIG,
+        },
     }
+
+# WebSocket JWT authentication (Main_Application/websocket_auth.py)
+WEBSOCKET_AUTH = {
+    # Also run the cookie/session/auth middleware for sockets that carry a token
+    'SESSION_STACK_FOR_TOKENS': os.environ.get("WEBSOCKET_SESSION_STACK_FOR_TOKENS", "False").lower() == "true",
 }
 
-# For production, use Redis:
-# CHANNEL_LAYERS = {
-#     'default': {
-#         'BACKEND': 'channels_redis.core.RedisChannelLayer',
-#         'CONFIG': {
-#             "hosts": [('127.0.0.1', 6379)],
-#         },
-#     },
-# }
+# Chat presence (chat_and_notifications/presence.py), selected with PRESENCE_BACKEND:
+# cache (the shared cache, see REDIS_URL) or memory (a single worker process)
+PRESENCE = {
+    'BACKEND': os.environ.get("PRESENCE_BACKEND", "cache").lower(),
+}
 
 # Chat system settings
 CHAT_SETTINGS = {
@@ -285,4 +375,10 @@ CHAT_SETTINGS = {
     'TYPING_TIMEOUT': 5,  # seconds
     'ONLINE_TIMEOUT': 30,  # seconds
     'MAX_CONVERSATIONS_PER_USER': 10,
-}
\ No newline at end of file
+    'HISTORY_PAGE_SIZE': 30,  # newest messages per history page and sent on WebSocket connect
+}
+
+# Invoice PDFs (invoice/pdf_cache.py), stored content-addressed under MEDIA_ROOT/<DIRECTORY>
+INVOICE_PDF = {
+    'RENDER_ON_COMMIT': os.environ.get("INVOICE_PDF_RENDER_ON_COMMIT", "True").lower() == "true",
+}
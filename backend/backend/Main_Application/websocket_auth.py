@@ -0,0 +1,136 @@
+"""
+WebSocket Authentication
+========================
+
+Resolves the user of a WebSocket connection from the JWT in its query
+string (?token=...).
+
+- The token's signature and expiry are checked on every connect (no
+  database involved); the user it names is read through a short-TTL cache,
+  so a reconnect storm after a deploy costs one query per user instead of
+  one per socket. Only the fields consumers read are cached, never the
+  password hash; the user is rebuilt from them with the rest deferred.
+- The cache is keyed by the token's user_id: every token of a user maps to
+  the same record, and a single delete drops it. accounts' signals delete
+  it whenever the user is saved or deleted, so deactivation (or a role
+  change) applies to the next connect. Inactive users are anonymous.
+- Sockets that carry a token skip the cookie/session/auth stack unless
+  WEBSOCKET_AUTH['SESSION_STACK_FOR_TOKENS'] is set: the token decides the
+  user, so the session lookup only cost queries.
+"""
+
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import router
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Main_Application.conf import get_settings
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'USER_CACHE_TIMEOUT': 60,  # seconds a resolved user is reused across connects; 0 disables the cache
+    'SESSION_STACK_FOR_TOKENS': False,
+}
+
+CACHE_KEY = 'ws-auth-user:{}'
+# User fields the consumers read; the cache holds these and the pk only
+CACHED_FIELDS = ('email', 'is_active', 'is_staff', 'is_superuser')
+
+
+def get_config():
+    """Get WebSocket auth settings merged over the defaults"""
+    return get_settings('WEBSOCKET_AUTH', DEFAULTS)
+
+
+def get_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def get_token(scope):
+    """JWT from the ?token= query parameter, or None"""
+    query_string = scope.get('query_string', b'').decode()
+    return parse_qs(query_string).get('token', [None])[0]
+
+
+def load_user(user_id):
+    """Read the cached fields of a user from the database, or None"""
+    User = get_user_model()
+    fields = ('pk', *CACHED_FIELDS)
+    return User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values(*fields).first()
+
+
+def build_user(fields):
+    """User instance from its cached fields, the others deferred"""
+    User = get_user_model()
+    values = dict(fields, **{User._meta.pk.attname: fields['pk']})
+    concrete = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(router.db_for_read(User), concrete, [values[name] for name in concrete])
+
+
+def get_token_user(user_id):
+    """Get the user a token names, from the cache when possible"""
+    config = get_config()
+    if not config['USER_CACHE_TIMEOUT']:
+        fields = load_user(user_id)
+    else:
+        cache = get_cache()
+        key = CACHE_KEY.format(user_id)
+        fields = cache.get(key)
+        if fields is None:
+            fields = load_user(user_id)
+            if fields is not None:
+                cache.set(key, fields, config['USER_CACHE_TIMEOUT'])
+    return build_user(fields) if fields is not None else None
+
+
+def invalidate_token_user(user_id):
+    """Drop a cached user so the next connect reads it again"""
+    get_cache().delete(CACHE_KEY.format(user_id))
+
+
+async def authenticate_token(token):
+    """Get the user for a JWT, AnonymousUser when the token or user is not valid"""
+    try:
+        user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return AnonymousUser()
+    user = await database_sync_to_async(get_token_user)(user_id)
+    if user is None or not user.is_active:
+        return AnonymousUser()
+    return user
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Custom middleware to authenticate WebSocket connections using JWT tokens
+    """
+
+    async def __call__(self, scope, receive, send):
+        token = get_token(scope)
+        scope = dict(scope)
+        scope['user'] = await authenticate_token(token) if token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+
+class TokenAuthRouter:
+    """
+    Sends sockets with a token straight to JWTAuthMiddleware and the rest
+    through AuthMiddlewareStack first.
+    """
+
+    def __init__(self, inner):
+        self.token_only = JWTAuthMiddleware(inner)
+        self.with_session = AuthMiddlewareStack(self.token_only)
+
+    async def __call__(self, scope, receive, send):
+        if get_token(scope) and not get_config()['SESSION_STACK_FOR_TOKENS']:
+            return await self.token_only(scope, receive, send)
+        return await self.with_session(scope, receive, send)
@@ -5,6 +5,7 @@ from rest_framework import status
 from django.contrib.auth.models import User
 from .permission_models import Permission, UserPermission, RolePermission, Role
 from .serializers import PermissionSerializer
+from .permission_resolver import get_permission_set
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -34,19 +35,10 @@ def check_dynamic_permission(request):
         # Check if permission exists
         permission = Permission.objects.get(codename=permission_codename, is_active=True)
         
-        # Check if user has direct permission
-        has_direct_permission = UserPermission.objects.filter(
-            user=user,
-            permission=permission,
-            is_active=True
-        ).exists()
-        
-        # Check if user has permission through roles
-        has_role_permission = RolePermission.objects.filter(
-            role__user_roles__user=user,
-            permission=permission,
-            is_active=True
-        ).exists()
+        # Answer from the cached permission set
+        permission_set = get_permission_set(user)
+        has_direct_permission = permission_codename in permission_set.direct_codenames
+        has_role_permission = permission_codename in permission_set.role_codenames
         
         has_permission = has_direct_permission or has_role_permission
         
@@ -175,26 +167,7 @@ def get_user_dynamic_permissions(request):
     """
     user = request.user
     
-    # Get direct permissions
-    direct_permissions = UserPermission.objects.filter(
-        user=user,
-        is_active=True
-    ).select_related('permission')
-    
-    # Get permissions through roles
-    role_permissions = RolePermission.objects.filter(
-        role__user_roles__user=user,
-        is_active=True
-    ).select_related('permission')
-    
-    # Combine and deduplicate
-    all_permissions = set()
-    
-    for up in direct_permissions:
-        all_permissions.add(up.permission.codename)
-    
-    for rp in role_permissions:
-        all_permissions.add(rp.permission.codename)
+    all_permissions = sorted(get_permission_set(user).codenames)
     
     return Response({
         'user_id': user.id,
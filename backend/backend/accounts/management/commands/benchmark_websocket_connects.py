@@ -0,0 +1,87 @@
+import asyncio
+import time
+from channels.auth import AuthMiddlewareStack
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from Main_Application.websocket_auth import JWTAuthMiddleware, TokenAuthRouter, invalidate_token_user
+
+
+class AcceptConsumer(AsyncWebsocketConsumer):
+    """Accepts authenticated sockets, so only the auth middleware is measured"""
+
+    async def connect(self):
+        if self.scope['user'].is_authenticated:
+            await self.accept()
+        else:
+            await self.close()
+
+
+async def connect_many(application, path, headers, connections, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def connect_once():
+        nonlocal rejected
+        async with limit:
+            communicator = WebsocketCommunicator(application, path, headers=headers)
+            connected, _ = await communicator.connect(timeout=30)
+            if not connected:
+                rejected += 1
+            await communicator.disconnect()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[connect_once() for _ in range(connections)])
+    return time.perf_counter() - started, rejected
+
+
+class Command(BaseCommand):
+    help = 'Measure WebSocket connects per second with and without the cached JWT user and session stack'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=500, help='Connects per variant')
+        parser.add_argument('--concurrency', type=int, default=50, help='Connects in flight at once')
+        parser.add_argument('--email', help='User the token is issued for (default: the first active staff user)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(is_active=True)
+        user = users.filter(email=options['email']).first() if options['email'] else users.filter(is_staff=True).first()
+        if user is None:
+            raise CommandError('No matching active user to issue a token for')
+
+        path = f'/ws/benchmark/?token={AccessToken.for_user(user)}'
+        # Browsers send the session cookie the HTTP middleware sets on every response
+        session = SessionStore()
+        session.create()
+        headers = [(b'cookie', f'{settings.SESSION_COOKIE_NAME}={session.session_key}'.encode())]
+        inner = AcceptConsumer.as_asgi()
+        config = getattr(settings, 'WEBSOCKET_AUTH', {})
+        variants = [
+            ('session stack, uncached user', AuthMiddlewareStack(JWTAuthMiddleware(inner)), 0),
+            ('session stack, cached user', AuthMiddlewareStack(JWTAuthMiddleware(inner)), None),
+            ('token only, cached user', TokenAuthRouter(inner), None),
+        ]
+        try:
+            for name, application, cache_timeout in variants:
+                overrides = {'SESSION_STACK_FOR_TOKENS': False}
+                if cache_timeout is not None:
+                    overrides['USER_CACHE_TIMEOUT'] = cache_timeout
+                with override_settings(WEBSOCKET_AUTH={**config, **overrides}):
+                    invalidate_token_user(user.pk)
+                    seconds, rejected = asyncio.run(connect_many(
+                        application, path, headers, options['connections'], options['concurrency']
+                    ))
+                self.stdout.write(
+                    f"{name}: {options['connections'] / seconds:.0f} connects/s "
+                    f"({seconds:.2f}s, {rejected} rejected)"
+                )
+        finally:
+            session.delete()
+            invalidate_token_user(user.pk)
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
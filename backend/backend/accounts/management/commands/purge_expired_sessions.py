@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from Main_Application.sessions import purge_expired_sessions
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of sessions deleted per query',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_sessions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired sessions'))
@@ -0,0 +1,138 @@
+"""
+Effective Permissions
+=====================
+
+Resolves the permission codenames a user holds (through active roles and
+directly) once, and answers permission checks from a cached copy.
+
+- A user's sets are computed with two queries and cached under the user's id
+  together with the current permission version stamp.
+- Changes to one user's roles or direct permissions drop that user's entry;
+  changes to roles, role permissions or permissions bump the version stamp,
+  which invalidates every entry at once (see accounts/signals).
+- A lookup reads the stamp and the entry in one cache round trip; entries
+  also expire after CACHE_TIMEOUT as a safety net for bulk updates that
+  bypass the signals.
+- Inactive permissions and roles grant nothing. Superusers pass every check.
+"""
+
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from accounts.permission_models import UserPermission, UserRole
+from Main_Application.conf import get_settings
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'CACHE_TIMEOUT': 300,  # seconds; entries are also invalidated on every role/permission change
+}
+
+VERSION_KEY = 'perm-version'
+ENTRY_KEY = 'perm-set:{}'
+
+
+def get_config():
+    """Get permission cache settings merged over the defaults"""
+    return get_settings('PERMISSION_CACHE', DEFAULTS)
+
+
+def get_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+class PermissionSet:
+    """Codenames a user holds through roles and directly"""
+
+    def __init__(self, role_codenames, direct_codenames):
+        self.role_codenames = frozenset(role_codenames)
+        self.direct_codenames = frozenset(direct_codenames)
+
+    @property
+    def codenames(self):
+        return self.role_codenames | self.direct_codenames
+
+    def __contains__(self, codename):
+        return codename in self.role_codenames or codename in self.direct_codenames
+
+
+def compute_permission_sets(user_ids):
+    """Compute PermissionSets for users from the database (two queries)"""
+    role_codenames = {user_id: set() for user_id in user_ids}
+    direct_codenames = {user_id: set() for user_id in user_ids}
+    for user_id, codename in UserRole.objects.filter(
+        user_id__in=user_ids, role__is_active=True, role__role_permissions__permission__is_active=True,
+    ).values_list('user_id', 'role__role_permissions__permission__codename'):
+        role_codenames[user_id].add(codename)
+    for user_id, codename in UserPermission.objects.filter(
+        user_id__in=user_ids, permission__is_active=True,
+    ).values_list('user_id', 'permission__codename'):
+        direct_codenames[user_id].add(codename)
+    return {
+        user_id: PermissionSet(role_codenames[user_id], direct_codenames[user_id])
+        for user_id in user_ids
+    }
+
+
+def get_permission_sets(user_ids):
+    """Get PermissionSets for many users, computing only the uncached ones"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    cache = get_cache()
+    keys = {user_id: ENTRY_KEY.format(user_id) for user_id in user_ids}
+    cached = cache.get_many([VERSION_KEY, *keys.values()])
+    version = cached.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY)
+
+    sets = {}
+    for user_id, key in keys.items():
+        entry = cached.get(key)
+        if entry is not None and entry[0] == version:
+            sets[user_id] = entry[1]
+    missing = [user_id for user_id in user_ids if user_id not in sets]
+    if missing:
+        computed = compute_permission_sets(missing)
+        cache.set_many(
+            {keys[user_id]: (version, permission_set) for user_id, permission_set in computed.items()},
+            get_config()['CACHE_TIMEOUT'],
+        )
+        sets.update(computed)
+    return sets
+
+
+def get_permission_set(user):
+    """Get the PermissionSet of one user"""
+    return get_permission_sets([user.pk])[user.pk]
+
+
+def has_permissions(user, codenames):
+    """Check several codenames for a user, returns {codename: bool}"""
+    if user.is_superuser:
+        return {codename: True for codename in codenames}
+    permission_set = get_permission_set(user)
+    return {codename: codename in permission_set for codename in codenames}
+
+
+def has_permission(user, codename):
+    return has_permissions(user, [codename])[codename]
+
+
+def _after_commit(invalidate):
+    invalidate()
+    # Again after commit: a check during the transaction may have cached the old sets
+    transaction.on_commit(invalidate)
+
+
+def invalidate_user_permissions(user_id):
+    """Drop one user's cached sets (their roles or direct permissions changed)"""
+    _after_commit(lambda: get_cache().delete(ENTRY_KEY.format(user_id)))
+
+
+def invalidate_all_permissions():
+    """Bump the version stamp (a role, role permission or permission changed)"""
+    _after_commit(lambda: get_cache().set(VERSION_KEY, uuid.uuid4().hex, None))
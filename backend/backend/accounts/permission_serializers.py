@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .permission_models import Permission, Role, RolePermission, UserRole, UserPermission
+from .permission_resolver import get_permission_set
 
 User = get_user_model()
 
@@ -98,22 +99,13 @@ class UserPermissionListSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'full_name', 'is_staff', 'is_superuser', 'roles', 'permissions']
 
     def get_roles(self, obj):
-        user_roles = obj.user_roles.select_related('role').all()
-        return [{'id': ur.role.id, 'name': ur.role.name} for ur in user_roles]
+        return [{'id': ur.role.id, 'name': ur.role.name} for ur in obj.user_roles.all()]
 
     def get_permissions(self, obj):
-        # Get permissions from roles
-        role_permissions = set()
-        for user_role in obj.user_roles.select_related('role').prefetch_related('role__role_permissions__permission'):
-            for role_perm in user_role.role.role_permissions.all():
-                role_permissions.add(role_perm.permission.codename)
-
-        # Get direct permissions
-        direct_permissions = set(obj.direct_permissions.values_list('permission__codename', flat=True))
-
-        # Combine both
-        all_permissions = role_permissions.union(direct_permissions)
-        return list(all_permissions)
+        # Sets resolved for the whole page by the view, else from the cache
+        permission_sets = self.context.get('permission_sets') or {}
+        permission_set = permission_sets.get(obj.pk) or get_permission_set(obj)
+        return sorted(permission_set.codenames)
 
 class PermissionCheckSerializer(serializers.Serializer):
     """Serializer for checking user permissions"""
@@ -126,3 +118,10 @@ class PermissionCheckSerializer(serializers.Serializer):
         except Permission.DoesNotExist:
             raise serializers.ValidationError("Permission does not exist or is inactive")
         return value
+
+class PermissionBatchCheckSerializer(serializers.Serializer):
+    """Serializer for checking several permissions at once"""
+    permission_codenames = serializers.ListField(
+        child=serializers.CharField(max_length=100), allow_empty=False, max_length=200
+    )
+    user_id = serializers.IntegerField(required=False)
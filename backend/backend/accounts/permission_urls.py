@@ -18,5 +18,6 @@ urlpatterns = [
     
     # Permission checking
     path('check-permission/', permission_views.check_permission, name='check-permission'),
+    path('check-permissions/', permission_views.check_permissions, name='check-permissions'),
     path('user-permissions/', permission_views.get_user_permissions, name='user-permissions'),
 ]
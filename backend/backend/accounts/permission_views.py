@@ -8,8 +8,9 @@ from .permission_models import Permission, Role, RolePermission, UserRole, UserP
 from .permission_serializers import (
     PermissionSerializer, RoleSerializer, RoleDetailSerializer, 
     UserRoleSerializer, UserPermissionSerializer, UserPermissionAssignmentSerializer,
-    UserPermissionListSerializer, PermissionCheckSerializer
+    UserPermissionListSerializer, PermissionCheckSerializer, PermissionBatchCheckSerializer
 )
+from .permission_resolver import get_permission_set, get_permission_sets, has_permission, has_permissions
 
 User = get_user_model()
 
@@ -101,6 +102,15 @@ class UserPermissionListView(generics.ListAPIView):
     serializer_class = UserPermissionListSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    def list(self, request, *args, **kwargs):
+        users = list(self.get_queryset())
+        # Resolve every listed user's permissions in one cache round trip
+        permission_sets = get_permission_sets([user.pk for user in users])
+        serializer = self.get_serializer(
+            users, many=True, context={**self.get_serializer_context(), 'permission_sets': permission_sets}
+        )
+        return Response(serializer.data)
+
 class UserPermissionAssignmentView(generics.CreateAPIView):
     """Assign permissions and roles to a user"""
     serializer_class = UserPermissionAssignmentSerializer
@@ -147,21 +157,10 @@ class UserPermissionAssignmentView(generics.CreateAPIView):
 def get_user_permissions(request):
     """Get current user's permissions"""
     user = request.user
-    
-    # Get permissions from roles
-    role_permissions = set()
-    for user_role in user.user_roles.select_related('role').prefetch_related('role__role_permissions__permission'):
-        for role_perm in user_role.role.role_permissions.all():
-            role_permissions.add(role_perm.permission.codename)
-
-    # Get direct permissions
-    direct_permissions = set(user.direct_permissions.values_list('permission__codename', flat=True))
-
-    # Combine both
-    all_permissions = role_permissions.union(direct_permissions)
+    permission_set = get_permission_set(user)
     
     return Response({
-        'permissions': list(all_permissions),
+        'permissions': sorted(permission_set.codenames),
         'is_superuser': user.is_superuser,
         'is_staff': user.is_staff
     })
@@ -184,26 +183,45 @@ def check_permission(request):
     else:
         user = request.user
 
-    # Superuser has all permissions
-    if user.is_superuser:
-        return Response({'has_permission': True})
+    # Superusers pass, everyone else is answered from the cached permission set
+    return Response({'has_permission': has_permission(user, permission_codename)})
 
-    # Check role permissions
-    has_role_permission = UserRole.objects.filter(
-        user=user,
-        role__role_permissions__permission__codename=permission_codename,
-        role__is_active=True
-    ).exists()
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def check_permissions(request):
+    """
+    Check several permissions at once, answered from the cached permission set.
+    Staff can check another user with user_id.
+    """
+    serializer = PermissionBatchCheckSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'message': 'Invalid data',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check direct permissions
-    has_direct_permission = UserPermission.objects.filter(
-        user=user,
-        permission__codename=permission_codename
-    ).exists()
+    codenames = serializer.validated_data['permission_codenames']
+    user_id = serializer.validated_data.get('user_id')
 
-    has_permission = has_role_permission or has_direct_permission
+    user = request.user
+    if user_id and user_id != request.user.id:
+        if not request.user.is_staff:
+            return Response({
+                'success': False,
+                'message': 'Only staff can check permissions of other users'
+            }, status=status.HTTP_403_FORBIDDEN)
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            return Response({'success': False, 'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    return Response({'has_permission': has_permission})
+    return Response({
+        'success': True,
+        'user_id': user.id,
+        'is_superuser': user.is_superuser,
+        'permissions': has_permissions(user, codenames)
+    })
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
@@ -0,0 +1,7 @@
+"""
+Accounts Signals Package
+"""
+
+# Import signal handlers to ensure they are registered
+from .websocket_auth_signals import user_saved, user_deleted
+from .permission_signals import user_assignment_changed, permission_definition_changed
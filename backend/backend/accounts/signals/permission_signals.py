@@ -0,0 +1,34 @@
+"""
+Permission Cache Signal Handlers
+Invalidates cached effective permissions when roles, role permissions,
+permissions or a user's assignments change
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.permission_models import Permission, Role, RolePermission, UserPermission, UserRole
+from accounts.permission_resolver import invalidate_all_permissions, invalidate_user_permissions
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def user_assignment_changed(sender, instance, raw=False, **kwargs):
+    """A user's roles or direct permissions changed"""
+    if raw:
+        return
+    invalidate_user_permissions(instance.user_id)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def permission_definition_changed(sender, instance, raw=False, **kwargs):
+    """A change that can affect every user's permissions"""
+    if raw:
+        return
+    invalidate_all_permissions()
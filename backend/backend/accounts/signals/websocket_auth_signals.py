@@ -0,0 +1,31 @@
+"""
+WebSocket Auth Cache Signal Handlers
+Drops the cached WebSocket user when a user is saved (deactivated, role
+changed) or deleted
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import User
+from Main_Application.websocket_auth import invalidate_token_user
+
+
+def _invalidate(user_id):
+    invalidate_token_user(user_id)
+    # Again after commit: a connect during the transaction may have cached the old row
+    transaction.on_commit(lambda: invalidate_token_user(user_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, **kwargs):
+    """Make the next WebSocket connect read the saved user"""
+    if raw:
+        return
+    _invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Forget a deleted user"""
+    _invalidate(instance.pk)
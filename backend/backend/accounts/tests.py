@@ -1,3 +1,241 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from accounts.permission_models import Permission, Role, RolePermission, UserPermission, UserRole
+from Main_Application import websocket_auth
+from Main_Application.sessions import get_session_key
+from Main_Application.websocket_auth import TokenAuthRouter
+
+
+class ScopeConsumer(AsyncWebsocketConsumer):
+    """Accepts authenticated sockets and reports what the middleware put in the scope"""
+
+    async def connect(self):
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+        await self.accept()
+        await self.send(text_data=f"{self.scope['user'].email} session={'session' in self.scope}")
+
+
+class WebSocketAuthCacheTests(TestCase):
+    """WebSocket connects reuse the cached token user until the user changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='staff@example.com', password='pass12345', is_staff=True)
+        self.token = str(AccessToken.for_user(self.user))
+        self.application = TokenAuthRouter(ScopeConsumer.as_asgi())
+
+    async def connect(self, token=None, headers=None):
+        communicator = WebsocketCommunicator(
+            self.application, f'/ws/admin/orders/?token={token or self.token}', headers=headers or []
+        )
+        connected, _ = await communicator.connect()
+        message = await communicator.receive_from() if connected else None
+        await communicator.disconnect()
+        return connected, message
+
+    async def test_user_is_read_once_and_dropped_on_deactivation(self):
+        with mock.patch.object(websocket_auth, 'load_user', wraps=websocket_auth.load_user) as load_user:
+            for _ in range(3):
+                connected, message = await self.connect()
+                self.assertTrue(connected)
+                self.assertEqual(message, 'staff@example.com session=False')
+            self.assertEqual(load_user.call_count, 1)
+
+            # The entry holds the fields consumers read, not the password hash
+            cached = cache.get(websocket_auth.CACHE_KEY.format(self.user.pk))
+            self.assertEqual(set(cached), {'pk', *websocket_auth.CACHED_FIELDS})
+            user = await database_sync_to_async(websocket_auth.get_token_user)(self.user.pk)
+            self.assertEqual((user.pk, user.is_staff), (self.user.pk, True))
+            self.assertIn('password', user.get_deferred_fields())
+
+            # A second token of the same user shares the entry
+            other_token = str(AccessToken.for_user(self.user))
+            self.assertTrue((await self.connect(other_token))[0])
+            self.assertEqual(load_user.call_count, 1)
+
+            self.user.is_active = False
+            await self.user.asave()
+            self.assertEqual(await self.connect(), (False, None))
+            self.assertEqual(load_user.call_count, 2)
+
+    async def test_invalid_token_is_rejected_without_a_lookup(self):
+        with mock.patch.object(websocket_auth, 'load_user') as load_user:
+            self.assertEqual(await self.connect('not-a-token'), (False, None))
+        load_user.assert_not_called()
+
+    @override_settings(WEBSOCKET_AUTH={'USER_CACHE_TIMEOUT': 60, 'SESSION_STACK_FOR_TOKENS': True})
+    async def test_session_stack_can_be_kept_for_token_sockets(self):
+        connected, message = await self.connect(headers=[(b'cookie', b'sessionid=missing')])
+        self.assertTrue(connected)
+        self.assertEqual(message, 'staff@example.com session=True')
+
+
+class LazySessionTests(TestCase):
+    """Sessions are only written when guest code needs one"""
+
+    def session_writes(self, queries):
+        return [
+            q['sql'] for q in queries.captured_queries
+            if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+
+    def test_catalog_reads_do_not_touch_sessions(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('homepage-products'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session_writes(queries), [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_authenticated_requests_do_not_resave_the_session(self):
+        user = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        session = SessionStore()
+        session['seen'] = True
+        session.create()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        token = AccessToken.for_user(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('homepage-products'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session_writes(queries), [])
+
+    def guest_keys(self):
+        """Guest key of two requests, the second carrying the cookie set by the first"""
+        middleware = SessionMiddleware(lambda request: HttpResponse())
+        keys = []
+        cookies = {}
+        for _ in range(2):
+            request = RequestFactory().get('/')
+            request.COOKIES.update(cookies)
+            middleware.process_request(request)
+            keys.append(get_session_key(request))
+            response = middleware.process_response(request, HttpResponse())
+            cookies = {name: morsel.value for name, morsel in response.cookies.items()}
+        return keys
+
+    def test_guest_cart_creates_one_session(self):
+        for _ in range(2):
+            self.assertEqual(self.client.delete(reverse('clear-cart')).status_code, 200)
+        self.assertEqual(Session.objects.count(), 1)
+
+        first, second = self.guest_keys()
+        self.assertEqual(first, second)
+        self.assertTrue(Session.objects.filter(session_key=first).exists())
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_guests_keep_their_key(self):
+        first, second = self.guest_keys()
+        self.assertEqual(first, second)
+        self.assertFalse(Session.objects.exists())
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+            for i in range(5)
+        ] + [Session(session_key='live', session_data='', expire_date=now + timedelta(days=1))])
+
+        out = StringIO()
+        call_command('purge_expired_sessions', batch_size=2, stdout=out)
+
+        self.assertIn('Purged 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+
+class PermissionResolverTests(TestCase):
+    """Permission checks are answered from a cached set that follows role and permission changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(email='admin@example.com', password='pass12345', is_staff=True)
+        self.user = User.objects.create_user(email='support@example.com', password='pass12345', is_staff=True)
+        self.orders = Permission.objects.create(name='Manage Orders', codename='manage_orders')
+        self.products = Permission.objects.create(name='Manage Products', codename='manage_products')
+        self.inbox = Permission.objects.create(name='Inbox Access', codename='inbox_access')
+        self.role = Role.objects.create(name='Customer Support')
+        RolePermission.objects.create(role=self.role, permission=self.orders)
+        UserRole.objects.create(user=self.user, role=self.role)
+        UserPermission.objects.create(user=self.user, permission=self.inbox)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def check(self, *codenames):
+        response = self.client.post(
+            reverse('check-permissions'), {'permission_codenames': list(codenames)}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data['permissions']
+
+    def test_batch_check_is_answered_from_the_cache(self):
+        expected = {'manage_orders': True, 'inbox_access': True, 'manage_products': False}
+        self.assertEqual(self.check(*expected), expected)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.check(*expected), expected)
+        self.assertFalse([q for q in queries.captured_queries if 'accounts_' in q['sql'] and 'permission' in q['sql']])
+
+        response = self.client.get(reverse('user-permissions'))
+        self.assertEqual(response.data['permissions'], ['inbox_access', 'manage_orders'])
+
+    def test_changes_invalidate_the_cached_set(self):
+        self.assertFalse(self.check('manage_products')['manage_products'])
+
+        # Role permissions change for everyone holding the role
+        RolePermission.objects.create(role=self.role, permission=self.products)
+        self.assertTrue(self.check('manage_products')['manage_products'])
+
+        # A deactivated permission grants nothing
+        self.products.is_active = False
+        self.products.save()
+        self.assertFalse(self.check('manage_products')['manage_products'])
+
+        # Direct assignments change for that user
+        UserPermission.objects.filter(user=self.user).delete()
+        self.assertFalse(self.check('inbox_access')['inbox_access'])
+
+        UserRole.objects.filter(user=self.user).delete()
+        self.assertFalse(self.check('manage_orders')['manage_orders'])
+
+    def test_other_users_need_staff_and_superusers_pass(self):
+        customer = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        self.client.force_authenticate(customer)
+        response = self.client.post(
+            reverse('check-permissions'), {'permission_codenames': ['manage_orders'], 'user_id': self.user.id},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+        superuser = User.objects.create_superuser(email='root@example.com', password='pass12345')
+        self.client.force_authenticate(superuser)
+        self.assertEqual(self.check('manage_orders', 'anything'), {'manage_orders': True, 'anything': True})
+
+    def test_user_list_resolves_permissions_for_the_page(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-permission-list'))
+        listed = {user['email']: user['permissions'] for user in response.data}
+        self.assertEqual(listed['support@example.com'], ['inbox_access', 'manage_orders'])
+        self.assertEqual(listed['admin@example.com'], [])
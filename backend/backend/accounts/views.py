@@ -17,6 +17,7 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils import timezone
 from datetime import timedelta
+from cart.merge import merge_guest_cart_on_login
 
 # Create your views here.
 
@@ -121,6 +122,9 @@ class User_login(APIView):
                 user.last_login = timezone.now()
                 user.save(update_fields=['last_login'])
                 
+                # Keep what the guest put in the cart before signing in
+                merge_guest_cart_on_login(request, user)
+                
                 token=get_tokens_for_user(user)
                 
                 # Determine user type
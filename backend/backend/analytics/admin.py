@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import DailySalesRollup
 
-# Analytics admin can be added here in the future
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ['date', 'status', 'order_count', 'revenue', 'item_count', 'updated_at']
+    list_filter = ['status', 'date']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,306 @@
+"""
+Streaming Report Exports
+========================
+
+Builds the analytics reports as row generators and streams them as XLSX,
+CSV or NDJSON, so a report over a long date range never sits in memory.
+
+- Rows come from chunked iterator() querysets with the per-row aggregates
+  (order items, orders per user, units sold per product) joined or
+  prefetched per chunk, so a report runs a fixed number of queries.
+- XLSX uses openpyxl's write-only workbook (rows are flushed to a temporary
+  file as they are written) with fixed column widths instead of an auto-fit
+  pass. A zip archive cannot be sent before it is complete, so the whole
+  workbook is written to that file first and only then streamed back in
+  chunks: memory stays flat, but the first byte waits for the last row.
+  CSV and NDJSON suit the largest ranges better.
+- CSV and NDJSON are encoded and yielded row by row.
+- The response has been started by the time rows are read, so a failure
+  mid-stream is logged and ends the body; CSV and NDJSON get a last line
+  saying the export is incomplete.
+"""
+
+import csv
+import io
+import json
+import logging
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, F, Prefetch, Sum
+from django.utils import timezone
+
+from analytics.models import DailySalesRollup
+from accounts.models import User
+from orders.models import Order, OrderItem
+from products.models import Product
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+STREAM_BLOCK_SIZE = 64 * 1024
+
+FORMATS = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+MONEY_FORMAT = '"৳"#,##0.00'
+CENTS = Decimal('0.01')
+
+
+class Report:
+    """A report: sheet title, columns as (header, width, is_money) and a row generator"""
+
+    def __init__(self, title, columns, rows):
+        self.title = title
+        self.columns = columns
+        self.rows = rows
+
+    @property
+    def headers(self):
+        return [header for header, _, _ in self.columns]
+
+
+def _datetime_range(start_date, end_date):
+    """Aware [start, end) datetimes covering two local dates, so created_at indexes are usable"""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def _sales_rows(start_date, end_date):
+    rollups = DailySalesRollup.objects.filter(
+        date__range=[start_date, end_date], order_count__gt=0
+    ).order_by('date', 'status').values_list('date', 'status', 'order_count', 'revenue')
+
+    total_orders = 0
+    total_amount = Decimal('0.00')
+    current = None
+    for date, status, count, revenue in rollups.iterator(chunk_size=CHUNK_SIZE):
+        if current and current[0] != date:
+            yield _sales_day(*current)
+            current = None
+        if current is None:
+            current = [date, 0, Decimal('0.00'), []]
+        current[1] += count
+        current[2] += revenue
+        current[3].append(f"{status}: {count}")
+        total_orders += count
+        total_amount += revenue
+    if current:
+        yield _sales_day(*current)
+
+    average = total_amount / total_orders if total_orders else Decimal('0.00')
+    yield ['TOTAL', total_orders, total_amount, average.quantize(CENTS), '']
+
+
+def _sales_day(date, orders, amount, statuses):
+    average = amount / orders if orders else Decimal('0.00')
+    return [date.strftime('%Y-%m-%d'), orders, amount, average.quantize(CENTS), ', '.join(statuses)]
+
+
+def _order_rows(start_date, end_date):
+    orders = Order.objects.filter(
+        created_at__range=_datetime_range(start_date, end_date)
+    ).annotate(
+        customer_email=F('user__email'),
+        payment_status=F('payment__status'),
+    ).only('id', 'created_at', 'status', 'total_amount').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.only('order', 'product_name', 'quantity').order_by('id'))
+    ).order_by('-created_at')
+
+    for order in orders.iterator(chunk_size=CHUNK_SIZE):
+        items = ', '.join(f"{item.product_name} x{item.quantity}" for item in order.items.all())
+        yield [
+            order.id,
+            order.customer_email,
+            timezone.localtime(order.created_at).strftime('%Y-%m-%d %H:%M'),
+            order.status,
+            order.total_amount,
+            order.payment_status or 'No Payment',
+            items,
+        ]
+
+
+def _user_rows(start_date, end_date):
+    users = User.objects.filter(
+        date_joined__range=_datetime_range(start_date, end_date)
+    ).annotate(
+        profile_full_name=F('profile__full_name'),
+        orders_count=Count('orders'),
+        total_spent=Sum('orders__total_amount'),
+    ).values_list(
+        'id', 'email', 'profile_full_name', 'date_joined', 'last_login', 'is_active', 'orders_count', 'total_spent'
+    ).order_by('id')
+
+    for user_id, email, full_name, date_joined, last_login, is_active, orders_count, total_spent in users.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            user_id,
+            email,
+            full_name or '',
+            timezone.localtime(date_joined).strftime('%Y-%m-%d'),
+            timezone.localtime(last_login).strftime('%Y-%m-%d %H:%M') if last_login else 'Never',
+            'Active' if is_active else 'Inactive',
+            orders_count,
+            total_spent or Decimal('0.00'),
+        ]
+
+
+def _product_rows(start_date, end_date):
+    products = Product.objects.filter(
+        created_at__range=_datetime_range(start_date, end_date)
+    ).annotate(
+        category_name=F('category__name'),
+        orders_count=Count('order_items'),
+        total_sold=Sum('order_items__quantity'),
+    ).values_list(
+        'id', 'title', 'category_name', 'price', 'status', 'created_at', 'orders_count', 'total_sold'
+    ).order_by('id')
+
+    for product_id, title, category_name, price, status, created_at, orders_count, total_sold in products.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            product_id,
+            title,
+            category_name or '',
+            price if price is not None else 'N/A',
+            status,
+            timezone.localtime(created_at).strftime('%Y-%m-%d') if created_at else 'N/A',
+            orders_count,
+            total_sold or 0,
+        ]
+
+
+def build_report(report_type, start_date, end_date):
+    """Get the Report for a report type, or None for an unknown type"""
+    if report_type == 'sales':
+        return Report('Sales Report', [
+            ('Date', 12, False), ('Orders', 10, False), ('Total Amount', 16, True),
+            ('Average Order Value', 20, True), ('Status', 50, False),
+        ], _sales_rows(start_date, end_date))
+    if report_type == 'orders':
+        return Report('Orders Report', [
+            ('Order ID', 10, False), ('Customer', 30, False), ('Date', 17, False), ('Status', 12, False),
+            ('Total Amount', 16, True), ('Payment Status', 15, False), ('Items', 50, False),
+        ], _order_rows(start_date, end_date))
+    if report_type == 'users':
+        return Report('Users Report', [
+            ('User ID', 10, False), ('Email', 30, False), ('Full Name', 25, False), ('Date Joined', 12, False),
+            ('Last Login', 17, False), ('Status', 10, False), ('Orders Count', 13, False), ('Total Spent', 16, True),
+        ], _user_rows(start_date, end_date))
+    if report_type == 'products':
+        return Report('Products Report', [
+            ('Product ID', 11, False), ('Title', 40, False), ('Category', 20, False), ('Price', 14, True),
+            ('Status', 10, False), ('Created Date', 13, False), ('Orders Count', 13, False), ('Total Sold', 11, False),
+        ], _product_rows(start_date, end_date))
+    return None
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def stream_csv(report):
+    """Yield the report as UTF-8 CSV, one encoded row at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so spreadsheet apps detect UTF-8 (currency symbols, names)
+    yield '\ufeff'.encode('utf-8')
+    for row in _with_header(report):
+        writer.writerow(row)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def stream_ndjson(report):
+    """Yield the report as newline-delimited JSON objects keyed by header"""
+    headers = report.headers
+    for row in report.rows:
+        yield (json.dumps(dict(zip(headers, map(_json_value, row))), ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _with_header(report):
+    yield report.headers
+    yield from report.rows
+
+
+def stream_xlsx(report):
+    """Write the whole report to a write-only workbook on disk, then yield the file in blocks"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(report.title)
+    for index, (_, width, _) in enumerate(report.columns, 1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+
+    side = Side(style='thin')
+    border = Border(left=side, right=side, top=side, bottom=side)
+    header_cells = []
+    for header in report.headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.border = border
+        header_cells.append(cell)
+    sheet.append(header_cells)
+
+    money_columns = {index for index, (_, _, is_money) in enumerate(report.columns) if is_money}
+    for row in report.rows:
+        cells = []
+        for index, value in enumerate(row):
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.border = border
+            if index in money_columns and isinstance(value, Decimal):
+                cell.number_format = MONEY_FORMAT
+            cells.append(cell)
+        sheet.append(cells)
+
+    output = tempfile.TemporaryFile()
+    try:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            block = output.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+    finally:
+        output.close()
+
+
+STREAMERS = {
+    'xlsx': stream_xlsx,
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
+
+
+# Last line of a CSV or NDJSON body cut short by an error
+INCOMPLETE_MARKERS = {
+    'csv': b'Export failed, this report is incomplete\r\n',
+    'ndjson': b'{"error": "Export failed, this report is incomplete"}\n',
+}
+
+
+def _ending_on_error(chunks, report, export_format):
+    try:
+        yield from chunks
+    except Exception:
+        logger.exception('%s export as %s failed mid-stream', report.title, export_format)
+        marker = INCOMPLETE_MARKERS.get(export_format)
+        if marker:
+            yield marker
+
+
+def stream_report(report, export_format):
+    """Get the byte generator for a report in one of FORMATS; a failure while streaming is logged and ends it"""
+    return _ending_on_error(STREAMERS[export_format](report), report, export_format)
@@ -0,0 +1,34 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from analytics.rollups import backfill_sales_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild daily sales rollups from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start-date',
+            help='First day to rebuild (YYYY-MM-DD), all days when omitted',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day to rebuild (YYYY-MM-DD), all days when omitted',
+        )
+
+    def handle(self, *args, **options):
+        start_date = options['start_date']
+        end_date = options['end_date']
+        if bool(start_date) != bool(end_date):
+            raise CommandError('Pass both --start-date and --end-date, or neither')
+        if start_date:
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Dates must be YYYY-MM-DD')
+
+        started = time.monotonic()
+        written = backfill_sales_rollups(start_date, end_date)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily sales rollups in {elapsed:.2f}s'))
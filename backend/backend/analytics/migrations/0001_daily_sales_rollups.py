@@ -0,0 +1,63 @@
+# Generated by Django 4.2.4 on 2026-10-16 23:02
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales_rollups(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySalesRollup = apps.get_model('analytics', 'DailySalesRollup')
+    items = {
+        (row['day'], row['order__status']): row['quantity']
+        for row in OrderItem.objects.annotate(day=TruncDate('order__created_at'))
+        .values('day', 'order__status').annotate(quantity=Sum('quantity')).order_by()
+    }
+    rows = Order.objects.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+        orders=Count('id'), amount=Sum('total_amount')
+    ).order_by()
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(
+            date=row['day'],
+            status=row['status'],
+            order_count=row['orders'],
+            revenue=row['amount'] or 0,
+            item_count=items.get((row['day'], row['status'])) or 0,
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0005_order_status_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Day the orders were placed (local time)')),
+                ('status', models.CharField(help_text='Current status of the orders counted', max_length=20)),
+                ('order_count', models.IntegerField(default=0, help_text='Number of orders')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Sum of order totals', max_digits=14)),
+                ('item_count', models.IntegerField(default=0, help_text='Sum of item quantities')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Rollup',
+                'verbose_name_plural': 'Daily Sales Rollups',
+                'ordering': ['-date', 'status'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'status'), name='unique_daily_sales_rollup'),
+        ),
+        migrations.RunPython(backfill_daily_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,28 @@
 from django.db import models
 
-# Analytics models can be added here in the future
-# For now, we're using the existing models from other apps
+class DailySalesRollup(models.Model):
+    """
+    Orders placed on one day in one status
+    Maintained incrementally by the order signals (analytics/rollups.py) so
+    sales analytics read a handful of rows per day instead of scanning orders
+    """
+    
+    date = models.DateField(help_text="Day the orders were placed (local time)")
+    status = models.CharField(max_length=20, help_text="Current status of the orders counted")
+    
+    order_count = models.IntegerField(default=0, help_text="Number of orders")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Sum of order totals")
+    item_count = models.IntegerField(default=0, help_text="Sum of item quantities")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Daily Sales Rollup"
+        verbose_name_plural = "Daily Sales Rollups"
+        ordering = ['-date', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='unique_daily_sales_rollup'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.order_count} orders, {self.revenue}"
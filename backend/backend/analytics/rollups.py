@@ -0,0 +1,179 @@
+"""
+Daily Sales Rollups
+===================
+
+Keeps DailySalesRollup (one row per day and order status) in step with
+orders, so sales analytics answer any date range with one range scan over
+a few rows per day instead of rescanning the orders table.
+
+- An order adds (1 order, its total, its items) to the row of the day it was
+  placed and its current status; a status change moves that contribution
+  between rows, a delete removes it. Every change is an F() increment.
+- Item quantities are added by create_order once the items exist
+  (add_order_items), since they are written after the order row.
+- backfill_sales_rollups() rebuilds a date range from the orders table with
+  grouped queries, e.g. for history that predates the rollups.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from analytics.models import DailySalesRollup
+from orders.models import Order, OrderItem
+
+ZERO = Decimal('0.00')
+
+
+def order_date(created_at):
+    """Local day an order was placed on"""
+    return timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date()
+
+
+def order_items_quantity(order_id):
+    """Sum of item quantities of one order"""
+    return OrderItem.objects.filter(order_id=order_id).aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def order_state(order, items=0):
+    """Snapshot the contribution of an order to the rollups"""
+    return {
+        'date': order_date(order.created_at),
+        'status': order.status,
+        'revenue': order.total_amount or ZERO,
+        'items': items,
+    }
+
+
+def _add(date, status, orders, revenue, items):
+    """Add deltas to one (date, status) row, creating it when missing"""
+    changes = {
+        'order_count': F('order_count') + orders,
+        'revenue': F('revenue') + revenue,
+        'item_count': F('item_count') + items,
+    }
+    if DailySalesRollup.objects.filter(date=date, status=status).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailySalesRollup.objects.create(
+                date=date, status=status, order_count=orders, revenue=revenue, item_count=items
+            )
+    except IntegrityError:
+        # Created concurrently by another transaction
+        DailySalesRollup.objects.filter(date=date, status=status).update(**changes)
+
+
+def apply_order_change(old_state, new_state):
+    """
+    Apply the rollup change between two order states.
+
+    States are dicts from order_state(), or None when the order does not
+    exist (creation / deletion).
+    """
+    if old_state == new_state:
+        return
+    if old_state:
+        _add(old_state['date'], old_state['status'], -1, -old_state['revenue'], -old_state['items'])
+    if new_state:
+        _add(new_state['date'], new_state['status'], 1, new_state['revenue'], new_state['items'])
+
+
+def add_order_items(order, quantity):
+    """Count the items of a newly placed order"""
+    if quantity:
+        _add(order_date(order.created_at), order.status, 0, ZERO, quantity)
+
+
+def get_daily_sales(start_date, end_date, status='delivered'):
+    """
+    Sales per day between two dates (inclusive), in one range query.
+
+    Returns a list with an entry for every day, including days without
+    sales. status=None counts orders in any status.
+    """
+    rows = DailySalesRollup.objects.filter(date__range=[start_date, end_date])
+    if status:
+        rows = rows.filter(status=status)
+    totals = {
+        row['date']: row
+        for row in rows.values('date').annotate(
+            orders=Sum('order_count'), amount=Sum('revenue'), items=Sum('item_count')
+        ).order_by('date')
+    }
+    days = []
+    day = start_date
+    while day <= end_date:
+        row = totals.get(day, {})
+        days.append({
+            'date': day,
+            'total_amount': row.get('amount') or ZERO,
+            'order_count': row.get('orders') or 0,
+            'item_count': row.get('items') or 0,
+        })
+        day += timedelta(days=1)
+    return days
+
+
+def summarize(days, start_date=None, end_date=None):
+    """Total a slice of get_daily_sales() output, optionally limited to a date range"""
+    selected = [
+        day for day in days
+        if (start_date is None or day['date'] >= start_date) and (end_date is None or day['date'] <= end_date)
+    ]
+    return {
+        'total_amount': sum((day['total_amount'] for day in selected), ZERO),
+        'order_count': sum(day['order_count'] for day in selected),
+        'item_count': sum(day['item_count'] for day in selected),
+    }
+
+
+def get_status_breakdown(start_date=None, end_date=None):
+    """Orders and revenue per status, optionally within a date range"""
+    rows = DailySalesRollup.objects.all()
+    if start_date and end_date:
+        rows = rows.filter(date__range=[start_date, end_date])
+    return list(
+        rows.values('status').annotate(
+            total_amount=Sum('revenue'), order_count=Sum('order_count'), item_count=Sum('item_count')
+        ).filter(order_count__gt=0).order_by('status')
+    )
+
+
+def backfill_sales_rollups(start_date=None, end_date=None):
+    """Rebuild rollups from the orders table (all days when no range is given), returns rows written"""
+    orders = Order.objects.all()
+    items = OrderItem.objects.all()
+    rollups = DailySalesRollup.objects.all()
+    if start_date and end_date:
+        orders = orders.filter(created_at__date__range=[start_date, end_date])
+        items = items.filter(order__created_at__date__range=[start_date, end_date])
+        rollups = rollups.filter(date__range=[start_date, end_date])
+
+    order_totals = orders.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+        orders=Count('id'), amount=Sum('total_amount')
+    ).order_by()
+    item_totals = {
+        (row['day'], row['order__status']): row['quantity']
+        for row in items.annotate(day=TruncDate('order__created_at')).values('day', 'order__status').annotate(
+            quantity=Sum('quantity')
+        ).order_by()
+    }
+
+    with transaction.atomic():
+        rollups.delete()
+        written = DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(
+                date=row['day'],
+                status=row['status'],
+                order_count=row['orders'],
+                revenue=row['amount'] or ZERO,
+                item_count=item_totals.get((row['day'], row['status'])) or 0,
+            )
+            for row in order_totals
+        ], batch_size=500)
+    return len(written)
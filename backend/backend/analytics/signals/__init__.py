@@ -0,0 +1,6 @@
+"""
+Analytics Signals Package
+"""
+
+# Import signal handlers to ensure they are registered
+from .rollup_signals import order_saved, order_deleting, order_deleted
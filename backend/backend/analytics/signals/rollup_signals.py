@@ -0,0 +1,41 @@
+"""
+Daily Sales Rollup Signal Handlers
+Keeps DailySalesRollup in sync with Order create, status/total change and delete
+"""
+
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from orders.models import Order
+from analytics.rollups import apply_order_change, order_items_quantity, order_state
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    """Apply the rollup change of a placed order or a status/total change"""
+    if raw or getattr(instance, '_tracked_unchanged', False):
+        return
+    # Stored row before this save, read by order_snapshot (orders/signals/order_snapshot_signals.py)
+    stored = getattr(instance, '_stored_order', None)
+    if created or stored is None:
+        # Items are counted by create_order once they are written
+        apply_order_change(None, order_state(instance))
+        return
+    old_state = order_state(Order(**stored))
+    new_state = order_state(instance)
+    if (old_state['status'], old_state['revenue']) == (new_state['status'], new_state['revenue']):
+        return
+    items = order_items_quantity(instance.pk)
+    old_state['items'] = new_state['items'] = items
+    apply_order_change(old_state, new_state)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    """Count the items of an order before they are deleted with it"""
+    instance._rollup_items = order_items_quantity(instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    """Remove a deleted order from the rollups"""
+    apply_order_change(order_state(instance, items=getattr(instance, '_rollup_items', 0)), None)
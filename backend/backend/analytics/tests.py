@@ -1,3 +1,188 @@
+from datetime import timedelta
+from decimal import Decimal
+import csv
+import io
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from analytics.exports import Report, stream_report
+from analytics.models import DailySalesRollup
+from analytics.rollups import add_order_items, backfill_sales_rollups
+from orders.models import Address, Order, OrderItem
+from products.models import Product
+
+
+def rollup_rows():
+    return sorted(DailySalesRollup.objects.filter(order_count__gt=0).values_list(
+        'date', 'status', 'order_count', 'revenue', 'item_count'
+    ))
+
+
+class DailySalesRollupTests(TestCase):
+    """Rollups follow order changes and answer analytics without scanning orders"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        self.address = Address.objects.create(
+            user=self.user, full_name='Buyer', phone_number='01700000000', city='Dhaka',
+            address_line_1='Road 1', postal_code='1200', country='Bangladesh',
+        )
+        self.product = Product.objects.create(title='Mug', slug='mug', status='active', price=Decimal('5.00'))
+        admin = User.objects.create_user(email='admin@example.com', password='pass12345', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def place_order(self, total, quantity):
+        order = Order.objects.create(
+            user=self.user, delivery_address=self.address, subtotal=total, total_amount=total
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=quantity, unit_price=total / quantity, total_price=total
+        )
+        add_order_items(order, quantity)
+        return order
+
+    def test_incremental_rollups_match_backfill(self):
+        delivered = self.place_order(Decimal('30.00'), 3)
+        cancelled = self.place_order(Decimal('10.00'), 1)
+        deleted = self.place_order(Decimal('5.00'), 1)
+        self.place_order(Decimal('8.00'), 2)
+        for order, new_status in [(delivered, 'shipped'), (delivered, 'delivered'), (cancelled, 'cancelled')]:
+            order.status = new_status
+            order.save()
+        deleted.delete()
+
+        incremental = rollup_rows()
+        today = timezone.localdate()
+        self.assertEqual(incremental, [
+            (today, 'cancelled', 1, Decimal('10.00'), 1),
+            (today, 'delivered', 1, Decimal('30.00'), 3),
+            (today, 'pending', 1, Decimal('8.00'), 2),
+        ])
+        backfill_sales_rollups()
+        self.assertEqual(rollup_rows(), incremental)
+
+    def test_sales_analytics_reads_rollups_only(self):
+        order = self.place_order(Decimal('30.00'), 3)
+        order.status = 'delivered'
+        order.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('sales_analytics'))
+
+        data = response.data['data']
+        self.assertEqual(data['daily_sales']['total_amount'], 30.0)
+        self.assertEqual(data['monthly_sales']['order_count'], 1)
+        self.assertEqual(len(data['chart_data']), 7)
+        self.assertEqual(data['chart_data'][-1]['order_count'], 1)
+        self.assertEqual(data['status_breakdown'], [{'status': 'delivered', 'total_amount': 30.0, 'order_count': 1}])
+        self.assertFalse([q for q in queries.captured_queries if 'orders_order' in q['sql']])
+        self.assertEqual(len([q for q in queries.captured_queries if 'analytics_dailysalesrollup' in q['sql']]), 2)
+
+    def test_backfill_and_custom_range_trends(self):
+        old = self.place_order(Decimal('12.50'), 1)
+        old.status = 'delivered'
+        old.save()
+        # Rewrite history behind the signals' back, then rebuild
+        ninety_days_ago = timezone.now() - timedelta(days=90)
+        Order.objects.filter(pk=old.pk).update(created_at=ninety_days_ago)
+        out = StringIO()
+        call_command('backfill_sales_rollups', stdout=out)
+        self.assertIn('Wrote 1 daily sales rollups', out.getvalue())
+
+        day = timezone.localdate(ninety_days_ago)
+        response = self.client.get(reverse('sales_trends'), {
+            'start_date': (day - timedelta(days=1)).isoformat(),
+            'end_date': (day + timedelta(days=1)).isoformat(),
+        })
+
+        custom = response.data['data']['custom']
+        self.assertEqual(custom['total_amount'], 12.5)
+        self.assertEqual([d['order_count'] for d in custom['daily']], [0, 1, 0])
+        self.assertEqual(response.data['data']['today']['order_count'], 0)
+
+        response = self.client.get(reverse('sales_trends'), {'start_date': 'soon', 'end_date': 'later'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StreamingReportExportTests(TestCase):
+    """Reports stream in every format with a query count independent of their size"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        address = Address.objects.create(
+            user=self.user, full_name='Buyer', phone_number='01700000000', city='Dhaka',
+            address_line_1='Road 1', postal_code='1200', country='Bangladesh',
+        )
+        product = Product.objects.create(title='Mug', slug='mug', status='active', price=Decimal('5.00'))
+        for i in range(6):
+            order = Order.objects.create(
+                user=self.user, delivery_address=address, subtotal=Decimal('10.00'), total_amount=Decimal('10.00')
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=Decimal('5.00'), total_price=Decimal('10.00'))
+        admin = User.objects.create_user(email='admin@example.com', password='pass12345', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def export(self, **params):
+        response = self.client.get(reverse('excel_report'), params)
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content)
+        return response, content, queries
+
+    def test_csv_and_ndjson_exports(self):
+        response, content, queries = self.export(type='orders', export_format='csv')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv"'))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][0], 'Order ID')
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1][6], 'Mug x2')
+        # Orders and their prefetched items, however many orders there are
+        self.assertEqual(len(queries), 2)
+
+        _, content, queries = self.export(type='users', export_format='ndjson')
+        lines = [json.loads(line) for line in content.decode().splitlines()]
+        buyer = next(line for line in lines if line['Email'] == 'buyer@example.com')
+        self.assertEqual((buyer['Orders Count'], buyer['Total Spent']), (6, 60.0))
+        self.assertEqual(len(queries), 1)
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        from openpyxl import load_workbook
+
+        response, content, _ = self.export(type='products')
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        sheet = load_workbook(io.BytesIO(content)).active
+        rows = list(sheet.values)
+        self.assertEqual(sheet.title, 'Products Report')
+        self.assertEqual(rows[1][1], 'Mug')
+        self.assertEqual(rows[1][6:], (6, 12))
+
+        _, content, _ = self.export(type='sales')
+        rows = list(load_workbook(io.BytesIO(content)).active.values)
+        self.assertEqual(rows[-1][:3], ('TOTAL', 6, 60))
+
+    def test_failure_mid_stream_is_logged_and_ends_the_body(self):
+        def rows():
+            yield [1, 'buyer@example.com']
+            raise ValueError('database went away')
+
+        report = Report('Broken Report', [('ID', 10, False), ('Email', 30, False)], rows())
+        with self.assertLogs('analytics.exports', 'ERROR'):
+            content = b''.join(stream_report(report, 'ndjson'))
+        lines = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(lines[0], {'ID': 1, 'Email': 'buyer@example.com'})
+        self.assertIn('incomplete', lines[-1]['error'])
 
-# Analytics tests can be added here in the future
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse('excel_report'), {'type': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('excel_report'), {'export_format': 'pdf'}).status_code, 400)
@@ -0,0 +1,6 @@
+"""
+Cart Consumers Package
+"""
+
+# Import consumers
+from .cart_websocket_consumer import CartWebSocketConsumer
@@ -0,0 +1,55 @@
+"""
+Cart Real-time WebSocket Consumer
+Sends a signed-in customer the changes made to their cart by others, such as repricing
+"""
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.contrib.auth.models import AnonymousUser
+
+from cart.repricing import cart_group_name
+
+
+class CartWebSocketConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket consumer for a customer's cart updates
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cart_group_name = None
+        self.user = None
+
+    async def connect(self):
+        """Handle WebSocket connection"""
+        self.user = self.scope.get('user')
+
+        # Guest carts are not notified
+        if isinstance(self.user, AnonymousUser) or not self.user:
+            await self.close()
+            return
+
+        self.cart_group_name = cart_group_name(self.user.id)
+        await self.channel_layer.group_add(
+            self.cart_group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection"""
+        if self.cart_group_name:
+            try:
+                await self.channel_layer.group_discard(
+                    self.cart_group_name,
+                    self.channel_name
+                )
+            except Exception:
+                pass
+
+    async def cart_repriced(self, event):
+        """Handle cart repriced group message"""
+        await self.send_json({
+            'type': 'cart_repriced',
+            'cart': event['cart']
+        })
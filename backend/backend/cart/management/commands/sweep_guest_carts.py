@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from cart.sweeper import sweep
+
+class Command(BaseCommand):
+    help = 'Delete expired guest carts, their items and expired sessions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Number of rows deleted per query',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=None,
+            help='Seconds to wait between batches',
+        )
+
+    def handle(self, *args, **options):
+        result = sweep(batch_size=options['batch_size'], pause=options['pause'])
+        removed = result['carts'] + result['items'] + result['sessions']
+        rate = removed / result['seconds'] if result['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Swept {result['carts']} guest carts, {result['items']} items and {result['sessions']} sessions "
+            f"in {result['seconds']:.2f}s ({rate:.0f} rows/s)"
+        ))
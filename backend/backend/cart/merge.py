@@ -0,0 +1,106 @@
+"""
+Guest Cart Merge
+================
+
+Folds a guest's session cart into their account cart at login, with
+set-based statements: the number of queries does not depend on how many
+items either cart holds.
+
+- Without an active account cart the guest cart is adopted: it becomes the
+  user's cart and stops expiring.
+- Otherwise items both carts hold get the guest quantity added in one
+  UPDATE, capped at the product or variant stock (a quantity already above
+  it is left as it is), the other guest items are moved over in one UPDATE,
+  and the guest cart is deleted with what is left of its items.
+- Every item of the resulting cart is then priced at the current product or
+  variant price (CartItem.get_current_price() in SQL), and the stored totals
+  are recomputed from the items.
+- Wishlists belong to accounts only, so there is no guest wishlist to merge.
+- At login a failed merge is logged and the guest cart left in place; it
+  never fails the login.
+
+Guests cannot add items yet (add_to_cart requires a signed-in user), so
+today guest carts are empty and the merge only cleans them up; it is ready
+for when guest carts are opened.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from cart.repricing import recalculate_cart_totals
+from Main_Application.sessions import get_guest_key
+from products.models import Product, ProductVariant
+
+logger = logging.getLogger(__name__)
+
+
+def _same_item(cart_id):
+    """Items of a cart with the product and variant of the outer item (NULL variants match)"""
+    return CartItem.objects.annotate(variant_key=Coalesce('variant_id', 0)).filter(
+        cart_id=cart_id,
+        product_id=OuterRef('product_id'),
+        variant_key=Coalesce(OuterRef('variant_id'), 0),
+    ).order_by()
+
+
+def _current(field):
+    """The variant's field of the outer cart item, or the product's for items without a variant"""
+    return Coalesce(
+        Subquery(ProductVariant.objects.filter(pk=OuterRef('variant_id')).values(field)),
+        Subquery(Product.objects.filter(pk=OuterRef('product_id')).values(field)),
+    )
+
+
+def refresh_cart_prices(cart_id):
+    """Price every item of a cart at the current variant or product price in one UPDATE"""
+    return CartItem.objects.filter(cart_id=cart_id).update(
+        unit_price=Coalesce(_current('price'), F('unit_price')),
+        updated_at=timezone.now(),
+    )
+
+
+def merge_guest_cart(user, session_key):
+    """Merge the active guest cart of a session into the user's cart, returns the user's cart id or None"""
+    if not session_key:
+        return None
+    with transaction.atomic():
+        guest_cart_id = Cart.objects.select_for_update().filter(
+            session_key=session_key, user__isnull=True, is_active=True
+        ).values_list('pk', flat=True).first()
+        if guest_cart_id is None:
+            return None
+
+        cart_id = Cart.objects.filter(user=user, is_active=True).values_list('pk', flat=True).first()
+        if cart_id is None:
+            Cart.objects.filter(pk=guest_cart_id).update(
+                user=user, session_key=None, expires_at=None, updated_at=timezone.now()
+            )
+            cart_id = guest_cart_id
+        else:
+            guest_items = _same_item(guest_cart_id)
+            CartItem.objects.filter(cart_id=cart_id).filter(Exists(guest_items)).update(
+                quantity=Least(
+                    F('quantity') + Subquery(guest_items.values('quantity')[:1]),
+                    Greatest(_current('quantity'), F('quantity')),
+                ),
+            )
+            CartItem.objects.filter(cart_id=guest_cart_id).exclude(Exists(_same_item(cart_id))).update(cart_id=cart_id)
+            Cart.objects.filter(pk=guest_cart_id).delete()
+
+        refresh_cart_prices(cart_id)
+        recalculate_cart_totals([cart_id])
+    return cart_id
+
+
+def merge_guest_cart_on_login(request, user):
+    """Merge the guest cart of the request's session, if it has one, into the user's cart; never raises"""
+    try:
+        return merge_guest_cart(user, get_guest_key(request))
+    except Exception:
+        logger.exception('Could not merge the guest cart of user %s', user.pk)
+        return None
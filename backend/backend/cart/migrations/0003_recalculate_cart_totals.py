@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+def recalculate_cart_totals(apps, schema_editor):
+    """
+    Recompute the stored cart totals once: carts are serialized from them
+    and item mutations only apply deltas from here on
+    """
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+    
+    money = DecimalField(max_digits=10, decimal_places=2)
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    Cart.objects.update(
+        total_items=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+        subtotal=Coalesce(
+            Subquery(items.annotate(total=Sum(F('unit_price') * F('quantity'), output_field=money)).values('total')),
+            Decimal('0.00'),
+            output_field=money,
+        ),
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_clean_duplicate_carts'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalculate_cart_totals, migrations.RunPython.noop),
+    ]
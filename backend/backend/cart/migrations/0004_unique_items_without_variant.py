@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-16 23:35
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+def merge_duplicate_items(apps, schema_editor):
+    """
+    Merge cart and wishlist items duplicated before the constraints existed:
+    keep the oldest row, carrying a cart item's summed quantity
+    """
+    CartItem = apps.get_model('cart', 'CartItem')
+    WishlistItem = apps.get_model('cart', 'WishlistItem')
+    
+    duplicates = CartItem.objects.filter(variant__isnull=True).values('cart', 'product').annotate(
+        rows=Count('id'), keep=Min('id'), quantity=Sum('quantity')
+    ).filter(rows__gt=1)
+    for duplicate in duplicates:
+        CartItem.objects.filter(pk=duplicate['keep']).update(quantity=duplicate['quantity'])
+        CartItem.objects.filter(
+            cart=duplicate['cart'], product=duplicate['product'], variant__isnull=True
+        ).exclude(pk=duplicate['keep']).delete()
+    
+    duplicates = WishlistItem.objects.filter(variant__isnull=True).values('wishlist', 'product').annotate(
+        rows=Count('id'), keep=Min('id')
+    ).filter(rows__gt=1)
+    for duplicate in duplicates:
+        WishlistItem.objects.filter(
+            wishlist=duplicate['wishlist'], product=duplicate['product'], variant__isnull=True
+        ).exclude(pk=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_recalculate_cart_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('variant__isnull', True)), fields=('cart', 'product'), name='unique_cart_item_without_variant'),
+        ),
+        migrations.AddConstraint(
+            model_name='wishlistitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('variant__isnull', True)), fields=('wishlist', 'product'), name='unique_wishlist_item_without_variant'),
+        ),
+    ]
@@ -10,7 +10,11 @@ Models:
 - CartItem: Individual items in the cart with variants support
 """
 
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import DecimalField, F, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -29,6 +33,7 @@ class Cart(models.Model):
     - Session-based carts (guest users)
     - Automatic cleanup of old guest carts
     - Cart expiration for security
+    - Stored totals, kept current by the item mutations (apply_totals_delta)
     """
     
     # User association - null for guest users
@@ -116,21 +121,40 @@ class Cart(models.Model):
             self.expires_at = timezone.now() + timezone.timedelta(days=30)
         super().save(*args, **kwargs)
     
+    def compute_totals(self):
+        """Count the items and subtotal from the cart items with one aggregate query"""
+        return self.items.aggregate(
+            total_items=Coalesce(Sum('quantity'), 0),
+            subtotal=Coalesce(
+                Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=10, decimal_places=2)),
+                Decimal('0.00'),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+    
     def calculate_totals(self):
-        """Calculate and update cart totals"""
-        items = self.items.all()
+        """Recompute and store cart totals (item mutations apply deltas instead)"""
+        totals = self.compute_totals()
         
-        total_items = sum(item.quantity for item in items)
-        subtotal = sum(item.get_total_price() for item in items)
-        
-        self.total_items = total_items
-        self.subtotal = subtotal
+        self.total_items = totals['total_items']
+        self.subtotal = totals['subtotal']
         self.save(update_fields=['total_items', 'subtotal', 'updated_at'])
         
-        return {
-            'total_items': total_items,
-            'subtotal': subtotal
-        }
+        return totals
+    
+    def apply_totals_delta(self, items=0, subtotal=0):
+        """Add an item mutation's change to the stored totals with one UPDATE"""
+        if not items and not subtotal:
+            return
+        now = timezone.now()
+        Cart.objects.filter(pk=self.pk).update(
+            total_items=F('total_items') + items,
+            subtotal=F('subtotal') + subtotal,
+            updated_at=now,
+        )
+        self.total_items += items
+        self.subtotal = Decimal(self.subtotal) + subtotal
+        self.updated_at = now
     
     def is_expired(self):
         """Check if cart has expired"""
@@ -140,22 +164,23 @@ class Cart(models.Model):
     
     def clear_expired_items(self):
         """Remove items that are no longer available"""
-        expired_items = []
-        for item in self.items.all():
-            if not item.is_available():
-                expired_items.append(item)
-        
-        for item in expired_items:
-            item.delete()
+        # Reads prefetched items (with products and variants) when the caller loaded them
+        expired_items = [item for item in self.items.all() if not item.is_available()]
         
         if expired_items:
-            self.calculate_totals()
+            CartItem.objects.filter(pk__in=[item.pk for item in expired_items]).delete()
+            self.apply_totals_delta(
+                -sum(item.quantity for item in expired_items),
+                -sum(item.get_total_price() for item in expired_items),
+            )
+            # Forget prefetched items so the next read leaves the removed ones out
+            getattr(self, '_prefetched_objects_cache', {}).pop('items', None)
         
         return len(expired_items)
     
     def is_empty(self):
         """Check if cart has no items"""
-        return self.items.count() == 0
+        return not self.items.exists()
     
     def cleanup_if_empty(self):
         """Delete cart if it's empty (for both guest and authenticated users)"""
@@ -240,6 +265,15 @@ class CartItem(models.Model):
         unique_together = [
             ['cart', 'product', 'variant']
         ]
+        constraints = [
+            # NULL variants never conflict in unique_together; also the ON CONFLICT target of cart/upserts.py
+            models.UniqueConstraint(
+                fields=['cart', 'product'],
+                condition=models.Q(variant__isnull=True),
+                name='unique_cart_item_without_variant',
+            ),
+        ]
+        
         
         # Database indexes for performance
         indexes = [
@@ -289,30 +323,56 @@ class CartItem(models.Model):
         else:
             return self.product.quantity >= (self.quantity + amount)
     
+    def _stock(self):
+        """Stock of the variant, or of the product for items without one, as a subquery"""
+        if self.variant_id:
+            return Subquery(ProductVariant.objects.filter(pk=self.variant_id).values('quantity'))
+        return Subquery(Product.objects.filter(pk=self.product_id).values('quantity'))
+    
     def increase_quantity(self, amount=1):
-        """Increase quantity if possible"""
-        if self.can_increase_quantity(amount):
-            self.quantity += amount
-            self.save(update_fields=['quantity', 'updated_at'])
-            return True
-        return False
+        """Increase quantity if stock allows, in one conditional UPDATE"""
+        # The stock check is part of the UPDATE, so concurrent increases cannot overshoot it
+        updated = CartItem.objects.filter(pk=self.pk, quantity__lte=self._stock() - amount).update(
+            quantity=F('quantity') + amount, updated_at=timezone.now()
+        )
+        if not updated:
+            return False
+        self.cart.apply_totals_delta(amount, self.unit_price * amount)
+        self.refresh_from_db(fields=['quantity', 'updated_at'])
+        return True
     
     def decrease_quantity(self, amount=1):
         """Decrease quantity, remove item if quantity becomes 0"""
-        if self.quantity > amount:
-            self.quantity -= amount
-            self.save(update_fields=['quantity', 'updated_at'])
+        updated = CartItem.objects.filter(pk=self.pk, quantity__gt=amount).update(
+            quantity=F('quantity') - amount, updated_at=timezone.now()
+        )
+        if updated:
+            self.cart.apply_totals_delta(-amount, -self.unit_price * amount)
+            self.refresh_from_db(fields=['quantity', 'updated_at'])
             return True
-        else:
-            # Remove item if quantity becomes 0 or less
-            self.delete()
-            return False
+        # Remove item if quantity becomes 0 or less
+        self.remove()
+        return False
+    
+    def remove(self):
+        """Delete the item and take its stored quantity out of the cart totals"""
+        with transaction.atomic():
+            stored = CartItem.objects.select_for_update().filter(pk=self.pk).values('quantity', 'unit_price').first()
+            if stored is None:
+                # Already removed by a concurrent request, which took it out of the totals
+                return False
+            CartItem.objects.filter(pk=self.pk).delete()
+            self.cart.apply_totals_delta(-stored['quantity'], -stored['unit_price'] * stored['quantity'])
+        self.quantity = stored['quantity']
+        return True
     
     def update_price(self):
         """Update unit price to current product price"""
         current_price = self.get_current_price()
         if current_price != self.unit_price:
+            previous_price = self.unit_price
             self.unit_price = current_price
             self.save(update_fields=['unit_price', 'updated_at'])
+            self.cart.apply_totals_delta(0, (current_price - previous_price) * self.quantity)
             return True
         return False
@@ -142,6 +142,15 @@ class WishlistItem(models.Model):
         unique_together = [
             ['wishlist', 'product', 'variant']
         ]
+        constraints = [
+            # NULL variants never conflict in unique_together; also the ON CONFLICT target of cart/upserts.py
+            models.UniqueConstraint(
+                fields=['wishlist', 'product'],
+                condition=models.Q(variant__isnull=True),
+                name='unique_wishlist_item_without_variant',
+            ),
+        ]
+        
         
         # Database indexes for performance
         indexes = [
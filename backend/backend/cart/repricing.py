@@ -0,0 +1,100 @@
+"""
+Cart Repricing
+==============
+
+Carries product and variant price changes into active carts with set-based
+statements instead of CartItem.update_price() per item.
+
+- A price change reprices every affected item of active carts with one
+  UPDATE: items without a variant follow Product.price, items with one
+  follow ProductVariant.price, as in CartItem.get_current_price().
+- The stored totals of the affected carts are then recomputed with one
+  UPDATE from the items, so they stay exact whatever the carts held.
+- Owners of the affected carts get a cart_repriced event on their cart group
+  (see CartWebSocketConsumer) with the new unit price and cart totals, once
+  the change commits. Guest carts are repriced but not notified.
+- The price signals call reprice_product() / reprice_variant() when a saved
+  price differs from the stored one, whichever view or admin saved it.
+"""
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from cart.models import Cart, CartItem
+from Main_Application.broadcasts import broadcast
+from Main_Application.conf import get_settings
+
+DEFAULTS = {
+    'ON_PRICE_CHANGE': True,  # reprice active carts when a product or variant price is saved
+    'BROADCAST': True,  # send cart_repriced events to the owners of repriced carts
+}
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def get_config():
+    """Get repricing settings merged over the defaults"""
+    return get_settings('CART_REPRICING', DEFAULTS)
+
+
+def cart_group_name(user_id):
+    """Channel group of a customer's cart events"""
+    return f'cart_user_{user_id}'
+
+
+def recalculate_cart_totals(cart_ids):
+    """Recompute the stored totals of the given carts from their items in one UPDATE"""
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    return Cart.objects.filter(pk__in=cart_ids).update(
+        total_items=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+        subtotal=Coalesce(
+            Subquery(items.annotate(total=Sum(F('unit_price') * F('quantity'), output_field=MONEY)).values('total')),
+            Decimal('0.00'),
+            output_field=MONEY,
+        ),
+    )
+
+
+def _reprice(items, price, product_id, variant_id):
+    # Items of active carts still at another price
+    items = items.filter(cart__is_active=True).exclude(unit_price=price)
+    cart_ids = list(items.order_by().values_list('cart_id', flat=True).distinct())
+    if not cart_ids:
+        return 0
+    items.filter(cart_id__in=cart_ids).update(unit_price=price)
+    recalculate_cart_totals(cart_ids)
+    if get_config()['BROADCAST']:
+        _announce(cart_ids, price, product_id, variant_id)
+    return len(cart_ids)
+
+
+def _announce(cart_ids, price, product_id, variant_id):
+    carts = Cart.objects.filter(pk__in=cart_ids, user__isnull=False).values('id', 'user_id', 'total_items', 'subtotal')
+    for cart in carts:
+        broadcast(cart_group_name(cart['user_id']), {
+            'type': 'cart_repriced',
+            'cart': {
+                'id': cart['id'],
+                'product_id': product_id,
+                'variant_id': variant_id,
+                'unit_price': str(price),
+                'total_items': cart['total_items'],
+                'subtotal': str(cart['subtotal']),
+            },
+        })
+
+
+def reprice_product(product_id, price):
+    """Reprice the items without a variant of a product in active carts, returns the number of carts repriced"""
+    if price is None:
+        return 0
+    items = CartItem.objects.filter(product_id=product_id, variant__isnull=True)
+    return _reprice(items, price, product_id, None)
+
+
+def reprice_variant(variant_id, price, product_id=None):
+    """Reprice the items of a variant in active carts, returns the number of carts repriced"""
+    items = CartItem.objects.filter(variant_id=variant_id)
+    return _reprice(items, price, product_id, variant_id)
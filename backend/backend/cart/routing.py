@@ -0,0 +1,6 @@
+from django.urls import re_path
+from .consumers import CartWebSocketConsumer
+
+websocket_urlpatterns = [
+    re_path(r'ws/cart/$', CartWebSocketConsumer.as_asgi()),
+]
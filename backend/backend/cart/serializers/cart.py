@@ -11,6 +11,7 @@ Serializers:
 - AddToCartSerializer: For adding items to cart
 """
 
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from cart.models import Cart, CartItem
 from products.serializers import ProductListSerializer, ProductVariantSerializer
@@ -165,7 +166,10 @@ class CartSerializer(serializers.ModelSerializer):
     ===============
     
     Serializes complete cart data including all items.
-    Includes calculated totals and metadata.
+    Includes the stored totals and metadata.
+    
+    Load carts through setup_eager_loading() (or prefetch_items() for a cart
+    already fetched) to serialize every item in a fixed number of queries.
     """
     
     # Related items
@@ -201,17 +205,34 @@ class CartSerializer(serializers.ModelSerializer):
             'expires_at'
         ]
     
+    @staticmethod
+    def items_prefetch():
+        """Cart items with their products, variants, categories, images and variant options"""
+        return Prefetch('items', queryset=CartItem.objects.select_related(
+            'product__category', 'product__subcategory', 'variant',
+        ).prefetch_related(
+            'product__images', 'product__variants__dynamic_options', 'variant__dynamic_options',
+        ))
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the items of a page of carts"""
+        return queryset.prefetch_related(CartSerializer.items_prefetch())
+    
+    @staticmethod
+    def prefetch_items(cart):
+        """Load the items of a fetched cart, returns the cart"""
+        prefetch_related_objects([cart], CartSerializer.items_prefetch())
+        return cart
+    
     def get_total_items(self, obj):
         """Get total number of items in cart"""
-        # Calculate total items from cart items
-        total_items = sum(item.quantity for item in obj.items.all())
-        return total_items
+        # Stored total, kept current by the item mutations
+        return obj.total_items
     
     def get_subtotal(self, obj):
         """Get cart subtotal"""
-        # Calculate subtotal from cart items
-        subtotal = sum(item.get_total_price() for item in obj.items.all())
-        return float(subtotal)
+        return float(obj.subtotal)
     
     def get_is_expired(self, obj):
         """Check if cart has expired"""
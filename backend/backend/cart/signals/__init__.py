@@ -0,0 +1,6 @@
+"""
+Cart Signals Package
+"""
+
+# Import signal handlers to ensure they are registered
+from .price_signals import price_saving, product_price_saved, variant_price_saved, catalog_item_deleting, catalog_item_deleted
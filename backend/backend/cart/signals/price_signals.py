@@ -0,0 +1,83 @@
+"""
+Cart Price Signal Handlers
+Reprices active carts when a product or variant price changes (see cart/repricing.py),
+and recomputes cart totals when deleting a product or variant deletes cart items
+
+A saved price is compared with the one the instance was loaded with
+(_stored_price, see Product.from_db) or last saved; only instances without
+one read the stored price before the save.
+"""
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from cart.models import CartItem
+from cart.repricing import get_config, recalculate_cart_totals, reprice_product, reprice_variant
+from products.models import Product, ProductVariant
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductVariant)
+def price_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Remember the stored price before it changes"""
+    instance._cart_old_price = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and 'price' not in update_fields:
+        # Price is not written, nothing to reprice
+        return
+    old_price = getattr(instance, '_stored_price', None)
+    if old_price is None:
+        old_price = sender.objects.filter(pk=instance.pk).values_list('price', flat=True).first()
+    instance._cart_old_price = old_price
+
+
+def _price_changed(sender, instance, update_fields):
+    if update_fields is not None and 'price' not in update_fields:
+        return None
+    price = sender._meta.get_field('price').to_python(instance.price)
+    old_price = getattr(instance, '_cart_old_price', None)
+    # The row now holds this price, for the next save of the instance
+    instance._cart_old_price = None
+    instance._stored_price = price
+    if old_price is None or price is None or price == old_price:
+        return None
+    return price
+
+
+@receiver(post_save, sender=Product)
+def product_price_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Reprice the cart items of a product whose price changed"""
+    if raw:
+        return
+    price = _price_changed(sender, instance, update_fields)
+    if price is not None and get_config()['ON_PRICE_CHANGE']:
+        reprice_product(instance.pk, price)
+
+
+@receiver(post_save, sender=ProductVariant)
+def variant_price_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Reprice the cart items of a variant whose price changed"""
+    if raw:
+        return
+    price = _price_changed(sender, instance, update_fields)
+    if price is not None and get_config()['ON_PRICE_CHANGE']:
+        reprice_variant(instance.pk, price, product_id=instance.product_id)
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=ProductVariant)
+def catalog_item_deleting(sender, instance, **kwargs):
+    """Remember the carts whose items are deleted along with the product or variant"""
+    lookup = 'product_id' if sender is Product else 'variant_id'
+    instance._cart_ids = list(
+        CartItem.objects.filter(**{lookup: instance.pk}).order_by().values_list('cart_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductVariant)
+def catalog_item_deleted(sender, instance, **kwargs):
+    """Recompute the totals of carts that lost items"""
+    cart_ids = getattr(instance, '_cart_ids', None)
+    if cart_ids:
+        recalculate_cart_totals(cart_ids)
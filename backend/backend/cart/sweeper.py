@@ -0,0 +1,118 @@
+"""
+Cart Sweeper
+============
+
+Deletes expired guest carts, their items and stale sessions in batches.
+
+- A guest cart is swept once it expires (Cart.save gives guest carts an
+  expires_at), or when its database session is gone so no request can reach
+  it again.
+- Every DELETE names at most BATCH_SIZE primary keys and runs in its own
+  short transaction, with an optional BATCH_PAUSE between batches, so the
+  sweep never holds long locks on the cart tables. Items are deleted before
+  their carts, in their own batches.
+- Expired sessions are purged with purge_expired_sessions().
+- sweep() is the scheduler hook: the sweep_guest_carts command, cron or any
+  task runner can call it. maybe_sweep() runs it from a background thread at
+  most once per INTERVAL across workers; guest cart creation calls it when
+  AUTO is on.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connections
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from Main_Application.conf import get_settings
+from Main_Application.sessions import DATABASE_ENGINES, purge_expired_sessions
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,  # rows per DELETE
+    'BATCH_PAUSE': 0,  # seconds between batches, lets other writers in
+    'INTERVAL': 60 * 60,  # seconds between automatic sweeps
+    'AUTO': False,  # sweep from a background thread when guest carts are created
+    'CACHE_ALIAS': 'default',
+}
+
+SWEEP_KEY = 'cart-sweep'
+
+
+def get_config():
+    """Get sweeper settings merged over the defaults"""
+    return get_settings('CART_SWEEPER', DEFAULTS)
+
+
+def sweepable_carts(now):
+    """Guest carts that expired or lost their database session"""
+    swept = Q(expires_at__lt=now)
+    if settings.SESSION_ENGINE in DATABASE_ENGINES:
+        # Signed-cookie and cache sessions cannot be checked; those carts go when they expire
+        from django.contrib.sessions.models import Session
+
+        swept |= ~Exists(Session.objects.filter(session_key=OuterRef('session_key')))
+    return Cart.objects.filter(swept, user__isnull=True)
+
+
+def delete_in_batches(queryset, batch_size, pause):
+    """Delete the rows of a queryset batch by batch of primary keys, returns the number deleted"""
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        # Conditions are checked again, for rows that changed since they were selected
+        deleted += queryset.filter(pk__in=ids).delete()[1].get(queryset.model._meta.label, 0)
+        if pause:
+            time.sleep(pause)
+
+
+def sweep(now=None, batch_size=None, pause=None):
+    """Delete expired guest carts, their items and expired sessions; returns counts and seconds taken"""
+    config = get_config()
+    now = now or timezone.now()
+    batch_size = batch_size or config['BATCH_SIZE']
+    pause = config['BATCH_PAUSE'] if pause is None else pause
+    started = time.monotonic()
+
+    carts = sweepable_carts(now)
+    items = delete_in_batches(CartItem.objects.filter(cart__in=carts), batch_size, pause)
+    deleted_carts = delete_in_batches(carts, batch_size, pause)
+    # Sessions last, so carts whose sessions expire in this sweep go in the next one
+    sessions = purge_expired_sessions(batch_size=batch_size, now=now, pause=pause)
+
+    return {
+        'carts': deleted_carts,
+        'items': items,
+        'sessions': sessions,
+        'seconds': time.monotonic() - started,
+    }
+
+
+def _run():
+    close_old_connections()
+    try:
+        result = sweep()
+        logger.info('Swept %(carts)s guest carts, %(items)s items and %(sessions)s sessions', result)
+    except Exception:
+        logger.exception('Cart sweep failed')
+    finally:
+        connections.close_all()
+
+
+def maybe_sweep():
+    """Start a background sweep when no worker has started one in the last INTERVAL"""
+    config = get_config()
+    if not config['AUTO']:
+        return False
+    if not caches[config['CACHE_ALIAS']].add(SWEEP_KEY, True, config['INTERVAL']):
+        return False
+    threading.Thread(target=_run, name='cart-sweeper', daemon=True).start()
+    return True
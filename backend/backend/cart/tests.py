@@ -1,3 +1,543 @@
-from django.test import TestCase
+import asyncio
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from Main_Application import broadcasts
+from cart import merge, repricing, sweeper, upserts
+from cart.models import Cart, CartItem, Wishlist, WishlistItem
+from products.models import Product, ProductImage, ProductVariant, VariantOption
+
+
+def create_products(count):
+    """Active products with images, every other one variable with two variants"""
+    products = []
+    for i in range(count):
+        product = Product.objects.create(
+            title=f'Product {i}', slug=f'product-{i}', status='active',
+            product_type='variable' if i % 2 else 'simple', price=Decimal('10.00') + i, quantity=20,
+        )
+        ProductImage.objects.create(product=product, image=f'products/images/{i}.jpg', position=1, is_primary=True)
+        if product.product_type == 'variable':
+            for position in (1, 2):
+                variant = ProductVariant.objects.create(
+                    product=product, title=f'Variant {position}', sku=f'SKU-{i}-{position}',
+                    price=Decimal('20.00') + position, quantity=20, option1_value=str(position), position=position,
+                )
+                VariantOption.objects.create(variant=variant, name='Size', value=str(position))
+        products.append(product)
+    return products
+
+
+class CartTotalsMixin:
+
+    def assertTotalsConsistent(self, cart):
+        """Stored totals must equal the totals recomputed from the items"""
+        cart = Cart.objects.get(pk=cart.pk)
+        totals = cart.compute_totals()
+        self.assertEqual(cart.total_items, totals['total_items'])
+        self.assertEqual(cart.subtotal, totals['subtotal'])
+
+
+class CartReadTests(CartTotalsMixin, TestCase):
+    """The cart loads in a fixed number of queries and keeps its totals by deltas"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='shopper@example.com', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = create_products(6)
+
+    def add(self, product, quantity=1):
+        variant = product.variants.order_by('position').first()
+        response = self.client.post(reverse('add-to-cart'), {
+            'product_id': product.id, 'quantity': quantity, 'variant_id': variant.id if variant else None,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response
+
+    def cart(self):
+        return Cart.objects.get(user=self.user, is_active=True)
+
+    def count_cart_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get-cart'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['cart']
+
+    def test_cart_read_query_count_is_independent_of_item_count(self):
+        for product in self.products[:2]:
+            self.add(product)
+        self.client.get(reverse('get-cart'))  # warm up session and auth lookups
+        small, data = self.count_cart_queries()
+        self.assertEqual(len(data['items']), 2)
+
+        for product in self.products[2:]:
+            self.add(product)
+        large, data = self.count_cart_queries()
+        self.assertEqual(len(data['items']), 6)
+        self.assertEqual(small, large)
+        # cart, items with products, categories and variants, images, product variants and their options,
+        # options of the items' variants
+        self.assertEqual(large, 6)
+
+        variable = next(item for item in data['items'] if item['variant'])
+        self.assertEqual(variable['variant']['all_options'], [{'name': 'Size', 'value': '1', 'position': 1}])
+        self.assertEqual(len(variable['product']['variants']), 2)
+        self.assertTrue(variable['product']['primary_image']['is_primary'])
+
+    def test_mutations_keep_totals_by_deltas(self):
+        simple, variable = self.products[0], self.products[1]
+        self.add(simple, 2)
+        self.add(variable)
+        response = self.add(simple, 1)
+        self.assertEqual(response.data['cart']['total_items'], 4)
+        self.assertEqual(response.data['cart']['subtotal'], float(Decimal('10.00') * 3 + Decimal('21.00')))
+        cart = self.cart()
+        self.assertTotalsConsistent(cart)
+
+        item = CartItem.objects.get(cart=cart, product=simple)
+        response = self.client.post(reverse('increase-cart-item', args=[item.id]))
+        self.assertEqual(response.data['cart']['total_items'], 5)
+        self.assertTotalsConsistent(cart)
+
+        response = self.client.post(reverse('decrease-cart-item', args=[item.id]))
+        self.assertEqual(response.data['cart']['total_items'], 4)
+        self.assertTotalsConsistent(cart)
+
+        variable_item = CartItem.objects.get(cart=cart, product=variable)
+        response = self.client.post(reverse('decrease-cart-item', args=[variable_item.id]))
+        self.assertIsNone(response.data['cart_item'])
+        self.assertEqual(response.data['cart']['total_items'], 3)
+        self.assertTotalsConsistent(cart)
+
+        # The mutation paths never recompute the totals
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(reverse('remove-cart-item', args=[item.id]))
+        self.assertFalse(any('SUM(' in query['sql'] for query in queries))
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+
+    def test_quantity_changes_check_the_stored_row(self):
+        self.add(self.products[0], 19)
+        cart = self.cart()
+        item = CartItem.objects.get(cart=cart)
+        stale = CartItem.objects.get(pk=item.pk)
+
+        self.assertTrue(item.increase_quantity(1))
+        # The stale copy still holds 19, but the UPDATE checks the stored quantity against the stock
+        self.assertFalse(stale.increase_quantity(1))
+        self.assertEqual(CartItem.objects.get(pk=item.pk).quantity, 20)
+        self.assertTotalsConsistent(cart)
+
+        # Removing an item twice takes it out of the totals once
+        item.remove()
+        self.assertFalse(stale.decrease_quantity(1))
+        self.assertEqual(Cart.objects.get(pk=cart.pk).total_items, 0)
+        self.assertTotalsConsistent(cart)
+
+    def test_items_of_another_cart_are_not_found(self):
+        other = User.objects.create_user(email='other@example.com', password='pass12345')
+        other_cart = Cart.objects.create(user=other)
+        item = CartItem.objects.create(cart=other_cart, product=self.products[0], quantity=1, unit_price=Decimal('10.00'))
+        response = self.client.post(reverse('increase-cart-item', args=[item.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_unavailable_items_are_removed_on_read_with_their_totals(self):
+        for product in self.products[:3]:
+            self.add(product)
+        Product.objects.filter(pk=self.products[0].pk).update(status='draft')
+
+        response = self.client.get(reverse('get-cart'))
+        self.assertEqual(response.data['message'], '1 expired items removed from cart')
+        self.assertEqual(len(response.data['cart']['items']), 2)
+        self.assertEqual(response.data['cart']['total_items'], 2)
+        self.assertTotalsConsistent(self.cart())
+
+
+class CartUpsertTests(CartTotalsMixin, TestCase):
+    """Adding an item is one statement that inserts or increments, never duplicates"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='shopper@example.com', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.simple, self.variable = create_products(2)
+        self.variant = self.variable.variants.get(position=1)
+        self.cart = Cart.objects.create(user=self.user)
+        self.wishlist = Wishlist.objects.create(user=self.user)
+
+    def test_add_is_one_statement_that_increments_the_existing_row(self):
+        for variant, product in ((None, self.simple), (self.variant, self.variable)):
+            with self.subTest(variant=variant):
+                with self.assertNumQueries(1):
+                    first = upserts.add_cart_item(self.cart, product, variant, 2, Decimal('10.00'), 20)
+                # An existing item keeps the price it was added at
+                second = upserts.add_cart_item(self.cart, product, variant, 3, Decimal('99.00'), 20)
+                self.assertEqual(first.pk, second.pk)
+                self.assertEqual(second.quantity, 5)
+                self.assertEqual(second.unit_price, Decimal('10.00'))
+                self.assertEqual(CartItem.objects.get(cart=self.cart, product=product, variant=variant).quantity, 5)
+
+    def test_increment_beyond_stock_is_refused(self):
+        upserts.add_cart_item(self.cart, self.simple, None, 15, Decimal('10.00'), 20)
+        self.assertIsNone(upserts.add_cart_item(self.cart, self.simple, None, 6, Decimal('10.00'), 20))
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 15)
+
+        response = self.client.post(reverse('add-to-cart'), {'product_id': self.simple.id, 'quantity': 6}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 15)
+
+    def test_wishlist_add_inserts_once(self):
+        for variant, product in ((None, self.simple), (self.variant, self.variable)):
+            with self.subTest(variant=variant):
+                with self.assertNumQueries(1):
+                    item, created = upserts.add_wishlist_item(self.wishlist, product, variant)
+                self.assertTrue(created)
+                self.assertEqual(upserts.add_wishlist_item(self.wishlist, product, variant), (None, False))
+                self.assertEqual(WishlistItem.objects.get(wishlist=self.wishlist, product=product, variant=variant).pk, item.pk)
+
+        url = reverse('add-to-wishlist')
+        response = self.client.post(url, {'product_id': self.simple.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Item already exists in wishlist')
+
+    def test_fallback_for_databases_without_upsert(self):
+        with mock.patch.object(upserts, 'UPSERT_VENDORS', ()):
+            upserts.add_cart_item(self.cart, self.simple, None, 2, Decimal('10.00'), 20)
+            item = upserts.add_cart_item(self.cart, self.simple, None, 3, Decimal('10.00'), 20)
+            self.assertEqual(item.quantity, 5)
+            self.assertIsNone(upserts.add_cart_item(self.cart, self.simple, None, 16, Decimal('10.00'), 20))
+            self.assertTrue(upserts.add_wishlist_item(self.wishlist, self.simple, None)[1])
+            self.assertFalse(upserts.add_wishlist_item(self.wishlist, self.simple, None)[1])
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 1)
+        self.assertEqual(WishlistItem.objects.filter(wishlist=self.wishlist).count(), 1)
+
+
+class CartUpsertConcurrencyTests(CartTotalsMixin, TransactionTestCase):
+    """Parallel adds of the same product end up in one row holding every increment"""
+
+    WORKERS = 10
+
+    def run_parallel(self, add):
+        barrier = threading.Barrier(self.WORKERS)
+        outcomes = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(200):
+                    try:
+                        outcomes.append(add())
+                        return
+                    except OperationalError:
+                        # SQLite reports lock contention instead of blocking, retry like a client would
+                        time.sleep(random.uniform(0.001, 0.01))
+                outcomes.append('gave_up')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_parallel_adds_do_not_duplicate_rows(self):
+        user = User.objects.create_user(email='shopper@example.com', password='pass12345')
+        (product,) = create_products(1)
+        cart = Cart.objects.create(user=user)
+        wishlist = Wishlist.objects.create(user=user)
+
+        def add_to_cart():
+            with transaction.atomic():
+                item = upserts.add_cart_item(cart, product, None, 1, product.price, 100)
+                Cart.objects.get(pk=cart.pk).apply_totals_delta(1, item.unit_price)
+            return item.pk
+
+        outcomes = self.run_parallel(add_to_cart)
+        self.assertNotIn('gave_up', outcomes)
+        self.assertEqual(len(set(outcomes)), 1)
+        self.assertEqual(CartItem.objects.get(cart=cart, product=product).quantity, self.WORKERS)
+        self.assertTotalsConsistent(cart)
+
+        outcomes = self.run_parallel(lambda: upserts.add_wishlist_item(wishlist, product, None)[1])
+        self.assertEqual(outcomes.count(True), 1)
+        self.assertEqual(WishlistItem.objects.filter(wishlist=wishlist).count(), 1)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class CartSweeperTests(TestCase):
+    """Expired guest carts, their items and sessions are deleted in bounded batches"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        (self.product,) = create_products(1)
+        Session.objects.bulk_create([
+            Session(session_key=f'live{i}', session_data='', expire_date=self.now + timedelta(days=1))
+            for i in range(6)
+        ] + [Session(session_key='expired', session_data='', expire_date=self.now - timedelta(days=1))])
+
+    def guest_cart(self, session_key, expired=False):
+        cart = Cart.objects.create(session_key=session_key)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1, unit_price=Decimal('10.00'))
+        if expired:
+            Cart.objects.filter(pk=cart.pk).update(expires_at=self.now - timedelta(days=1))
+        return cart
+
+    def test_sweep_deletes_expired_and_orphaned_guest_carts_in_batches(self):
+        for i in range(5):
+            self.guest_cart(f'live{i}', expired=True)
+        orphaned = self.guest_cart('gone')
+        kept = self.guest_cart('live5')
+        user = User.objects.create_user(email='shopper@example.com', password='pass12345')
+        user_cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=user_cart, product=self.product, quantity=1, unit_price=Decimal('10.00'))
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('sweep_guest_carts', batch_size=2, stdout=out)
+
+        self.assertIn('Swept 6 guest carts, 6 items and 1 sessions', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {kept.pk, user_cart.pk})
+        self.assertFalse(Cart.objects.filter(pk=orphaned.pk).exists())
+        self.assertEqual(CartItem.objects.count(), 2)
+        self.assertFalse(Session.objects.filter(session_key='expired').exists())
+        # Six items and six carts, at most two per DELETE (cart deletes also cascade to items, finding none)
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len([sql for sql in deletes if sql.startswith('DELETE FROM "cart_cartitem"') and '"cart_cartitem"."id" IN' in sql]), 3)
+        self.assertEqual(len([sql for sql in deletes if sql.startswith('DELETE FROM "cart_cart" ')]), 3)
+
+    @override_settings(CART_SWEEPER={'AUTO': True, 'INTERVAL': 60})
+    def test_automatic_sweep_runs_at_most_once_per_interval(self):
+        with mock.patch.object(sweeper.threading, 'Thread') as thread:
+            self.assertTrue(sweeper.maybe_sweep())
+            self.assertFalse(sweeper.maybe_sweep())
+        thread.assert_called_once_with(target=sweeper._run, name='cart-sweeper', daemon=True)
+
+        with override_settings(CART_SWEEPER={'AUTO': False}), mock.patch.object(sweeper.threading, 'Thread') as thread:
+            cache.clear()
+            self.assertFalse(sweeper.maybe_sweep())
+        thread.assert_not_called()
+
+
+@override_settings(BROADCASTS={'WORKER': False, 'COALESCE_WINDOW': 0})
+class CartRepricingTests(CartTotalsMixin, TestCase):
+    """Price changes reprice active carts with set-based updates and tell their owners"""
+
+    CARTS = 4
+
+    def setUp(self):
+        self.simple, self.variable = create_products(2)
+        self.variant, self.other_variant = self.variable.variants.order_by('position')
+        self.users = [User.objects.create_user(email=f'shopper{i}@example.com', password='pass12345') for i in range(self.CARTS)]
+        self.carts = [self.cart_with_items(user=user) for user in self.users]
+        self.guest_cart = self.cart_with_items(session_key='guest')
+        self.inactive_cart = self.cart_with_items(user=self.users[0], is_active=False)
+        broadcasts.queue.take()
+
+    def cart_with_items(self, **fields):
+        cart = Cart.objects.create(**fields)
+        CartItem.objects.create(cart=cart, product=self.simple, quantity=2, unit_price=self.simple.price)
+        CartItem.objects.create(cart=cart, product=self.variable, variant=self.variant, quantity=1, unit_price=self.variant.price)
+        CartItem.objects.create(cart=cart, product=self.variable, variant=self.other_variant, quantity=3, unit_price=self.other_variant.price)
+        cart.calculate_totals()
+        return cart
+
+    def unit_prices(self, cart, **lookup):
+        return set(CartItem.objects.filter(cart=cart, **lookup).values_list('unit_price', flat=True))
+
+    def test_reprice_is_a_fixed_number_of_statements(self):
+        # Collect the carts, update the items, update the totals, read the owners to notify
+        with self.assertNumQueries(4):
+            self.assertEqual(repricing.reprice_product(self.simple.pk, Decimal('12.50')), self.CARTS + 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(repricing.reprice_product(self.simple.pk, Decimal('12.50')), 0)
+
+        for cart in self.carts + [self.guest_cart]:
+            self.assertEqual(self.unit_prices(cart, product=self.simple), {Decimal('12.50')})
+            self.assertTotalsConsistent(cart)
+        self.assertEqual(self.unit_prices(self.inactive_cart, product=self.simple), {self.simple.price})
+
+    def test_saving_a_new_price_reprices_carts(self):
+        self.simple.price = Decimal('8.00')
+        self.simple.save()
+        self.variant.price = '30.00'
+        self.variant.save()
+
+        cart = Cart.objects.get(pk=self.carts[0].pk)
+        self.assertEqual(self.unit_prices(cart, product=self.simple), {Decimal('8.00')})
+        self.assertEqual(self.unit_prices(cart, variant=self.variant), {Decimal('30.00')})
+        # Other variants keep their price
+        self.assertEqual(self.unit_prices(cart, variant=self.other_variant), {self.other_variant.price})
+        self.assertEqual(cart.subtotal, Decimal('8.00') * 2 + Decimal('30.00') + self.other_variant.price * 3)
+        self.assertTotalsConsistent(cart)
+
+        # Saves that leave the price alone reprice nothing
+        with mock.patch.object(repricing, 'recalculate_cart_totals') as recalculate:
+            self.simple.title = 'Renamed'
+            self.simple.save()
+            self.variant.save()
+        recalculate.assert_not_called()
+
+        # ...and saves that do not write the price do not read it either
+        with self.assertNumQueries(1):
+            self.variant.save(update_fields=['title'])
+
+        # Loaded instances compare against the price they were loaded with
+        product = Product.objects.get(pk=self.simple.pk)
+        product.price = Decimal('9.00')
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        self.assertFalse(any(q['sql'].startswith('SELECT "products_product"."price"') for q in queries))
+        self.assertEqual(self.unit_prices(cart, product=self.simple), {Decimal('9.00')})
+
+    def test_owners_are_sent_the_new_totals_after_commit(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        group = repricing.cart_group_name(self.users[1].pk)
+        async_to_sync(channel_layer.group_add)(group, channel)
+        self.addCleanup(async_to_sync(channel_layer.group_discard), group, channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.price = Decimal('25.00')
+            self.variant.save()
+        # One event per signed-in owner; guest carts are not notified
+        self.assertEqual(len(broadcasts.queue.events), self.CARTS)
+        broadcasts.flush()
+
+        message = async_to_sync(asyncio.wait_for)(channel_layer.receive(channel), 1)
+        cart = Cart.objects.get(pk=self.carts[1].pk)
+        self.assertEqual(message['type'], 'cart_repriced')
+        self.assertEqual(message['cart'], {
+            'id': cart.pk, 'product_id': self.variable.pk, 'variant_id': self.variant.pk, 'unit_price': '25.00',
+            'total_items': cart.total_items, 'subtotal': str(cart.subtotal),
+        })
+
+    def test_deleting_a_variant_recomputes_the_totals_of_its_carts(self):
+        self.other_variant.delete()
+        for cart in self.carts + [self.guest_cart, self.inactive_cart]:
+            self.assertTotalsConsistent(cart)
+        self.assertEqual(Cart.objects.get(pk=self.carts[0].pk).total_items, 3)
+
+
+class GuestCartMergeTests(CartTotalsMixin, TestCase):
+    """A guest cart is folded into the account cart at login in a fixed number of queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='shopper@example.com', password='pass12345', is_email_verified=True)
+        self.products = create_products(6)
+        self.simple = self.products[0]
+        self.variable = self.products[1]
+        self.variant = self.variable.variants.get(position=1)
+
+    def fill(self, cart, products, quantity=1, unit_price=Decimal('1.00')):
+        for product in products:
+            variant = product.variants.order_by('position').first()
+            CartItem.objects.create(cart=cart, product=product, variant=variant, quantity=quantity, unit_price=unit_price)
+        cart.calculate_totals()
+
+    def carts(self, guest_products, user_products):
+        guest_cart = Cart.objects.create(session_key='guest')
+        user_cart = Cart.objects.create(user=self.user)
+        self.fill(guest_cart, guest_products, quantity=2)
+        self.fill(user_cart, user_products, quantity=3)
+        return guest_cart, user_cart
+
+    def test_quantities_are_summed_prices_refreshed_and_the_guest_cart_deleted(self):
+        guest_cart, user_cart = self.carts(self.products[:4], self.products[2:])
+
+        self.assertEqual(merge.merge_guest_cart(self.user, 'guest'), user_cart.pk)
+
+        self.assertFalse(Cart.objects.filter(pk=guest_cart.pk).exists())
+        items = {(item.product_id, item.variant_id): item for item in CartItem.objects.filter(cart=user_cart)}
+        self.assertEqual(len(items), 6)
+        quantities = [items[(product.pk, getattr(product.variants.order_by('position').first(), 'pk', None))].quantity
+                      for product in self.products]
+        self.assertEqual(quantities, [2, 2, 5, 5, 3, 3])
+        self.assertEqual(items[(self.simple.pk, None)].unit_price, self.simple.price)
+        self.assertEqual(items[(self.variable.pk, self.variant.pk)].unit_price, self.variant.price)
+        self.assertTotalsConsistent(user_cart)
+
+    def test_summed_quantities_are_capped_at_stock(self):
+        guest_cart, user_cart = self.carts(self.products[:2], self.products[:2])
+        Product.objects.filter(pk=self.simple.pk).update(quantity=4)
+        # Already above stock in the account cart: kept, not lowered
+        ProductVariant.objects.filter(pk=self.variant.pk).update(quantity=1)
+
+        merge.merge_guest_cart(self.user, 'guest')
+
+        self.assertEqual(CartItem.objects.get(cart=user_cart, product=self.simple).quantity, 4)
+        self.assertEqual(CartItem.objects.get(cart=user_cart, variant=self.variant).quantity, 3)
+        self.assertTotalsConsistent(user_cart)
+
+    def test_query_count_is_independent_of_cart_size(self):
+        def count(size):
+            CartItem.objects.all().delete()
+            Cart.objects.all().delete()
+            self.carts(self.products[:size], self.products[size // 2:size + size // 2])
+            with CaptureQueriesContext(connection) as queries:
+                merge.merge_guest_cart(self.user, 'guest')
+            return len(queries)
+
+        self.assertEqual(count(1), count(4))
+
+    def test_guest_cart_is_adopted_without_an_account_cart(self):
+        guest_cart = Cart.objects.create(session_key='guest')
+        self.fill(guest_cart, self.products[:2])
+
+        self.assertEqual(merge.merge_guest_cart(self.user, 'guest'), guest_cart.pk)
+
+        cart = Cart.objects.get(pk=guest_cart.pk)
+        self.assertEqual((cart.user_id, cart.session_key, cart.expires_at), (self.user.pk, None, None))
+        self.assertTotalsConsistent(cart)
+        self.assertIsNone(merge.merge_guest_cart(self.user, 'guest'))
+        self.assertIsNone(merge.merge_guest_cart(self.user, None))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_login_merges_the_session_cart(self):
+        client = APIClient()
+        session = SessionStore()
+        session.create()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        guest_cart = Cart.objects.create(session_key=session.session_key)
+        self.fill(guest_cart, [self.simple], quantity=2)
+        user_cart = Cart.objects.create(user=self.user)
+        self.fill(user_cart, [self.simple], quantity=1)
+
+        response = client.post('/api/accounts/login/', {'email': self.user.email, 'password': 'pass12345'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Cart.objects.filter(pk=guest_cart.pk).exists())
+        self.assertEqual(CartItem.objects.get(cart=user_cart).quantity, 3)
+        self.assertTotalsConsistent(user_cart)
+
+    def test_failed_merge_does_not_fail_the_login(self):
+        with mock.patch.object(merge, 'merge_guest_cart', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('cart.merge', 'ERROR'):
+            response = APIClient().post(
+                '/api/accounts/login/', {'email': self.user.email, 'password': 'pass12345'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.data)
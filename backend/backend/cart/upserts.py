@@ -0,0 +1,129 @@
+"""
+Cart Upserts
+============
+
+Adds items to carts and wishlists with one statement, so double clicks and
+parallel tabs cannot create duplicate rows or lose an increment.
+
+- (cart, product, variant) and (wishlist, product, variant) are unique,
+  rows without a variant included: those get partial unique constraints,
+  since NULL variants never conflict in the plain unique_together index.
+- On SQLite and PostgreSQL an add is one INSERT ... ON CONFLICT statement
+  (one round trip). A cart item's quantity is incremented in that statement
+  and only while the new quantity stays within stock; a wishlist item that
+  is already there is left alone. RETURNING tells the caller what happened.
+- Other databases insert and, on an IntegrityError, apply a conditional
+  F() update instead.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from cart.models import CartItem, WishlistItem
+
+UPSERT_VENDORS = ('sqlite', 'postgresql')
+
+
+def _conflict_target(variant):
+    # Must name the columns (and predicate) of one of the unique indexes exactly
+    if variant is None:
+        return '(%s, product_id) WHERE variant_id IS NULL'
+    return '(%s, product_id, variant_id)'
+
+
+def _prep(model, field_name, value):
+    return model._meta.get_field(field_name).get_db_prep_save(value, connection)
+
+
+def _money(value):
+    """Decimal of a price read back by a raw query (SQLite returns numbers)"""
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def _fetched(instance):
+    instance._state.adding = False
+    instance._state.db = connection.alias
+    return instance
+
+
+def add_cart_item(cart, product, variant, quantity, unit_price, stock):
+    """
+    Insert a cart item or add to its quantity, in one statement
+
+    unit_price is used for a new item; an existing one keeps its price.
+    Returns the item, or None when the new quantity would exceed stock.
+    """
+    now = timezone.now()
+    if connection.vendor not in UPSERT_VENDORS:
+        return _add_cart_item_fallback(cart, product, variant, quantity, unit_price, stock, now)
+
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    sql = f"""
+        INSERT INTO {table} (cart_id, product_id, variant_id, quantity, unit_price, added_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT {_conflict_target(variant) % 'cart_id'} DO UPDATE
+        SET quantity = {table}.quantity + excluded.quantity, updated_at = excluded.updated_at
+        WHERE {table}.quantity + excluded.quantity <= %s
+        RETURNING id, quantity, unit_price
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            cart.pk, product.pk, variant.pk if variant else None, quantity,
+            _prep(CartItem, 'unit_price', unit_price),
+            _prep(CartItem, 'added_at', now), _prep(CartItem, 'updated_at', now),
+            stock,
+        ])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    item_id, new_quantity, stored_price = row
+    return _fetched(CartItem(
+        id=item_id, cart=cart, product=product, variant=variant,
+        quantity=new_quantity, unit_price=_money(stored_price), updated_at=now,
+    ))
+
+
+def _add_cart_item_fallback(cart, product, variant, quantity, unit_price, stock, now):
+    try:
+        with transaction.atomic():
+            return CartItem.objects.create(
+                cart=cart, product=product, variant=variant, quantity=quantity, unit_price=unit_price,
+            )
+    except IntegrityError:
+        pass
+    items = CartItem.objects.filter(cart=cart, product=product, variant=variant)
+    if not items.filter(quantity__lte=stock - quantity).update(quantity=F('quantity') + quantity, updated_at=now):
+        return None
+    item = items.get()
+    item.cart, item.product, item.variant = cart, product, variant
+    return item
+
+
+def add_wishlist_item(wishlist, product, variant):
+    """Insert a wishlist item unless it is there, returns (item, created); item is None when not created"""
+    if connection.vendor not in UPSERT_VENDORS:
+        try:
+            with transaction.atomic():
+                return WishlistItem.objects.create(wishlist=wishlist, product=product, variant=variant), True
+        except IntegrityError:
+            return None, False
+
+    now = timezone.now()
+    table = connection.ops.quote_name(WishlistItem._meta.db_table)
+    sql = f"""
+        INSERT INTO {table} (wishlist_id, product_id, variant_id, added_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT {_conflict_target(variant) % 'wishlist_id'} DO NOTHING
+        RETURNING id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            wishlist.pk, product.pk, variant.pk if variant else None, _prep(WishlistItem, 'added_at', now),
+        ])
+        row = cursor.fetchone()
+    if row is None:
+        return None, False
+    return _fetched(WishlistItem(id=row[0], wishlist=wishlist, product=product, variant=variant, added_at=now)), True
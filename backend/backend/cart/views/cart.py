@@ -18,7 +18,6 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
 
@@ -28,6 +27,7 @@ from cart.serializers import (
     AddToCartSerializer,
     UpdateCartItemSerializer
 )
+from cart.upserts import add_cart_item
 from products.models import Product, ProductVariant
 
 def get_or_create_cart(request):
@@ -47,19 +47,22 @@ def get_or_create_cart(request):
     """
     # Check if user is authenticated and not anonymous
     if request.user.is_authenticated and hasattr(request.user, 'email'):
-        # Authenticated user - get or create user cart
-        try:
-            cart = Cart.objects.get(user=request.user, is_active=True)
-        except Cart.DoesNotExist:
-            # Deactivate any existing active carts for this user
-            Cart.objects.filter(user=request.user, is_active=True).update(is_active=False)
-            cart = Cart.objects.create(user=request.user, is_active=True)
+        # Authenticated user - get or create user cart (a parallel create gets the winner's cart)
+        cart, created = Cart.objects.get_or_create(user=request.user, is_active=True)
     else:
         # Guest users are not allowed to have carts
         return None
     
     return cart
 
+def get_cart_item(cart, item_id):
+    """Get an item of the given cart with its product and variant, None if it is not there"""
+    cart_item = CartItem.objects.select_related('product', 'variant').filter(id=item_id, cart=cart).first()
+    if cart_item is not None:
+        # Share the cart instance so total deltas update it
+        cart_item.cart = cart
+    return cart_item
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])  # Only authenticated users can add to cart
 def add_to_cart(request):
@@ -114,41 +117,23 @@ def add_to_cart(request):
         
         # Debug: Log cart details
 
-        # Check if item already exists in cart
-        existing_item = CartItem.objects.filter(
-            cart=cart,
-            product=product,
-            variant=variant
-        ).first()
+        stock = variant.quantity if variant else product.quantity
+        unit_price = variant.price if variant else product.price
         
         with transaction.atomic():
-            if existing_item:
-                # Update existing item quantity
-                if existing_item.can_increase_quantity(quantity):
-                    existing_item.quantity += quantity
-                    existing_item.save()
-                    cart_item = existing_item
-                else:
-                    return Response({
-                        'success': False,
-                        'error': 'Not enough items available in stock'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                # Create new cart item
-                unit_price = variant.price if variant else product.price
-                cart_item = CartItem.objects.create(
-                    cart=cart,
-                    product=product,
-                    variant=variant,
-                    quantity=quantity,
-                    unit_price=unit_price
-                )
+            # Insert the item or add to the one in the cart, in one statement
+            cart_item = add_cart_item(cart, product, variant, quantity, unit_price, stock)
+            if cart_item is None:
+                return Response({
+                    'success': False,
+                    'error': 'Not enough items available in stock'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             # Update cart totals
-            cart.calculate_totals()
+            cart.apply_totals_delta(quantity, cart_item.unit_price * quantity)
         
         # Serialize response
-        cart_serializer = CartSerializer(cart)
+        cart_serializer = CartSerializer(CartSerializer.prefetch_items(cart))
         
         return Response({
             'success': True,
@@ -200,13 +185,11 @@ def remove_cart_item(request, item_id):
     """
     try:
 
-        # Get cart item
-        cart_item = get_object_or_404(CartItem, id=item_id)
-
-        # Verify cart ownership
+        # Get cart item from the user's cart
         cart = get_or_create_cart(request)
+        cart_item = get_cart_item(cart, item_id)
 
-        if cart_item.cart != cart:
+        if cart_item is None:
             
             return Response({
                 'success': False,
@@ -214,19 +197,11 @@ def remove_cart_item(request, item_id):
             }, status=status.HTTP_404_NOT_FOUND)
         
         with transaction.atomic():
-            # Delete the item
-            
-            cart_item.delete()
+            # Delete the item (and take it out of the cart totals)
+            cart_item.remove()
             
             # Check if cart should be deleted (for guest users)
             cart_deleted = cart.cleanup_if_empty()
-            
-            if not cart_deleted:
-                # Update cart totals (for authenticated users)
-                cart.calculate_totals()
-                
-            else:
-                pass
         # Handle response based on whether cart was deleted
         if cart_deleted:
             # Cart was deleted (guest user)
@@ -237,7 +212,7 @@ def remove_cart_item(request, item_id):
             }, status=status.HTTP_200_OK)
         else:
             # Cart still exists (authenticated user)
-            cart_serializer = CartSerializer(cart)
+            cart_serializer = CartSerializer(CartSerializer.prefetch_items(cart))
             
             return Response({
                 'success': True,
@@ -271,33 +246,27 @@ def increase_cart_item_quantity(request, item_id):
     }
     """
     try:
-        # Get cart item
-        cart_item = get_object_or_404(CartItem, id=item_id)
-        
-        # Verify cart ownership
+        # Get cart item from the user's cart
         cart = get_or_create_cart(request)
-        if cart_item.cart != cart:
+        cart_item = get_cart_item(cart, item_id)
+        if cart_item is None:
             return Response({
                 'success': False,
                 'error': 'Cart item not found in your cart'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Check if quantity can be increased
-        if not cart_item.can_increase_quantity(1):
+        with transaction.atomic():
+            # Increase quantity (and the cart totals) unless it would exceed the stock
+            increased = cart_item.increase_quantity(1)
+        
+        if not increased:
             return Response({
                 'success': False,
                 'error': 'Not enough items available in stock'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        with transaction.atomic():
-            # Increase quantity
-            cart_item.increase_quantity(1)
-            
-            # Update cart totals
-            cart.calculate_totals()
-        
         # Serialize response
-        cart_serializer = CartSerializer(cart)
+        cart_serializer = CartSerializer(CartSerializer.prefetch_items(cart))
         
         return Response({
             'success': True,
@@ -340,12 +309,10 @@ def decrease_cart_item_quantity(request, item_id):
     }
     """
     try:
-        # Get cart item
-        cart_item = get_object_or_404(CartItem, id=item_id)
-        
-        # Verify cart ownership
+        # Get cart item from the user's cart
         cart = get_or_create_cart(request)
-        if cart_item.cart != cart:
+        cart_item = get_cart_item(cart, item_id)
+        if cart_item is None:
             return Response({
                 'success': False,
                 'error': 'Cart item not found in your cart'
@@ -357,12 +324,6 @@ def decrease_cart_item_quantity(request, item_id):
             
             # Check if cart should be deleted (for guest users)
             cart_deleted = cart.cleanup_if_empty()
-            
-            if not cart_deleted:
-                # Update cart totals (for authenticated users)
-                cart.calculate_totals()
-            else:
-                pass
         
         # Handle response based on whether cart was deleted
         if cart_deleted:
@@ -375,7 +336,7 @@ def decrease_cart_item_quantity(request, item_id):
             }, status=status.HTTP_200_OK)
         else:
             # Cart still exists (authenticated user)
-            cart_serializer = CartSerializer(cart)
+            cart_serializer = CartSerializer(CartSerializer.prefetch_items(cart))
             
             response_data = {
                 'success': True,
@@ -436,15 +397,13 @@ def get_cart(request):
                 }
             }, status=status.HTTP_200_OK)
 
-        # Check if there are any items in cart
-        if cart.items.count() > 0:
-            for item in cart.items.all():
-                pass
+        # Load items with their products, variants and images once
+        CartSerializer.prefetch_items(cart)
         
-        # Get cart details
-        
-        # Clear expired items
+        # Clear expired items (checked against the loaded items)
         expired_count = cart.clear_expired_items()
+        if expired_count > 0:
+            CartSerializer.prefetch_items(cart)
         
         # Serialize cart
         cart_serializer = CartSerializer(cart)
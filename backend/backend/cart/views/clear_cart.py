@@ -17,6 +17,8 @@ from django.db import transaction
 
 from cart.models import Cart
 from cart.serializers import CartSerializer
+from Main_Application.sessions import get_session_key
+from cart.sweeper import maybe_sweep
 
 def get_or_create_cart(request):
     """
@@ -43,16 +45,16 @@ def get_or_create_cart(request):
         )
     else:
         # Guest user - get or create session cart
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
+        session_key = get_session_key(request)
         
         cart, created = Cart.objects.get_or_create(
             session_key=session_key,
             is_active=True,
             defaults={'is_active': True}
         )
+        if created:
+            # Guest carts pile up where they are created: sweep expired ones (at most once per interval)
+            maybe_sweep()
     
     return cart
 
@@ -16,13 +16,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.db import transaction
 
 from cart.models import Wishlist, WishlistItem
 from cart.serializers import (
     WishlistSerializer,
     AddToWishlistSerializer
 )
+from cart.upserts import add_wishlist_item
 from products.models import Product, ProductVariant
 
 def get_or_create_wishlist(user):
@@ -90,27 +90,15 @@ def add_to_wishlist(request):
         # Get or create wishlist
         wishlist = get_or_create_wishlist(request.user)
         
-        # Check if item already exists in wishlist
-        existing_item = WishlistItem.objects.filter(
-            wishlist=wishlist,
-            product=product,
-            variant=variant
-        ).first()
+        # Insert the item unless it is already there, in one statement
+        wishlist_item, created = add_wishlist_item(wishlist, product, variant)
         
-        if existing_item:
+        if not created:
             return Response({
                 'success': False,
                 'error': 'Item already exists in wishlist'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        with transaction.atomic():
-            # Create new wishlist item
-            wishlist_item = WishlistItem.objects.create(
-                wishlist=wishlist,
-                product=product,
-                variant=variant
-            )
-        
         # Serialize response
         wishlist_serializer = WishlistSerializer(wishlist)
         
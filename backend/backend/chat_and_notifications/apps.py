@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class ChatAndNotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat_and_notifications'
+
+    def ready(self):
+        # Register signal handlers
+        import chat_and_notifications.signals  # noqa: F401
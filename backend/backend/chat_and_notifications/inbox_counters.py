@@ -0,0 +1,180 @@
+"""
+Inbox Counters
+==============
+
+Unread and status counters for the staff inbox and the customers' chat badge.
+
+- get_inbox_stats() computes every inbox counter in one aggregate query that
+  reads only the (status, unread_staff_count, assigned_to) index; a
+  customer's unread badge is one SUM over the (customer, unread_user_count)
+  index.
+- Staff stats are cached per user together with a version stamp. Every
+  conversation change bumps the stamp (again after commit), which
+  invalidates all entries at once; entries also expire after CACHE_TIMEOUT
+  as a safety net for bulk updates that bypass the model.
+- Every change is pushed after commit to the admin inbox WebSocket group as
+  an inbox_counters delta: the change of the global counters plus the
+  change of the per-assignee counters keyed by staff id, so open inboxes
+  keep their numbers current without polling.
+"""
+
+import logging
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from chat_and_notifications.models import Conversation
+from Main_Application.conf import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'CACHE_TIMEOUT': 60,  # seconds; entries are also invalidated on every conversation change
+}
+
+ADMIN_INBOX_GROUP = 'admin_inbox'
+VERSION_KEY = 'inbox-stats-version'
+ENTRY_KEY = 'inbox-stats:{}'
+
+GLOBAL_FIELDS = (
+    'total_conversations', 'open_conversations', 'closed_conversations',
+    'unread_conversations', 'unread_count',
+)
+ASSIGNED_FIELDS = ('assigned_to_me', 'unread_assigned_to_me')
+
+
+def get_config():
+    """Get inbox counter settings merged over the defaults"""
+    return get_settings('INBOX_COUNTERS', DEFAULTS)
+
+
+def get_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def compute_inbox_stats(user):
+    """Compute the inbox counters of a staff user with one aggregate query"""
+    unread = Q(unread_staff_count__gt=0)
+    mine = Q(assigned_to=user)
+    return Conversation.objects.aggregate(
+        total_conversations=Count('pk'),
+        open_conversations=Count('pk', filter=Q(status='open')),
+        closed_conversations=Count('pk', filter=Q(status='closed')),
+        unread_conversations=Count('pk', filter=unread),
+        unread_count=Coalesce(Sum('unread_staff_count'), 0),
+        assigned_to_me=Count('pk', filter=mine),
+        unread_assigned_to_me=Count('pk', filter=mine & unread),
+    )
+
+
+def get_inbox_stats(user):
+    """Get the inbox counters of a staff user, from the cache when current"""
+    cache = get_cache()
+    key = ENTRY_KEY.format(user.pk)
+    cached = cache.get_many([VERSION_KEY, key])
+    version = cached.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY)
+
+    entry = cached.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    stats = compute_inbox_stats(user)
+    cache.set(key, (version, stats), get_config()['CACHE_TIMEOUT'])
+    return stats
+
+
+def get_unread_count(user):
+    """Unread messages for a user's badge: the staff inbox total or the customer's own"""
+    if user.is_staff or user.is_superuser:
+        return get_inbox_stats(user)['unread_count']
+    return Conversation.objects.filter(Q(customer=user) | Q(assigned_to=user)).aggregate(
+        unread_count=Coalesce(Sum('unread_user_count'), 0),
+    )['unread_count']
+
+
+def invalidate_inbox_stats():
+    """Bump the version stamp so every cached inbox entry is recomputed"""
+    def bump():
+        get_cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+    bump()
+    # Again after commit: a read during the transaction may have cached the old counts
+    transaction.on_commit(bump)
+
+
+def snapshot(conversation):
+    """The fields of a conversation the inbox counters depend on"""
+    return (conversation.status, conversation.assigned_to_id, conversation.unread_staff_count)
+
+
+def _contribution(state):
+    """Counters one conversation adds globally and to its assignee"""
+    if state is None:
+        return {}, None, {}
+    status, assigned_to_id, unread = state
+    counts = {
+        'total_conversations': 1,
+        'open_conversations': int(status == 'open'),
+        'closed_conversations': int(status == 'closed'),
+        'unread_conversations': int(unread > 0),
+        'unread_count': unread,
+    }
+    assigned = {'assigned_to_me': 1, 'unread_assigned_to_me': int(unread > 0)}
+    return counts, assigned_to_id, assigned if assigned_to_id else {}
+
+
+def get_delta(before, after):
+    """Counter changes between two snapshots (None for a missing conversation)"""
+    counts_before, assignee_before, assigned_before = _contribution(before)
+    counts_after, assignee_after, assigned_after = _contribution(after)
+    delta = {
+        field: counts_after.get(field, 0) - counts_before.get(field, 0)
+        for field in GLOBAL_FIELDS
+    }
+    assigned = defaultdict(lambda: dict.fromkeys(ASSIGNED_FIELDS, 0))
+    for assignee, counts, sign in ((assignee_before, assigned_before, -1), (assignee_after, assigned_after, 1)):
+        for field, value in counts.items():
+            # String keys: the delta travels through JSON and msgpack channel layers
+            assigned[str(assignee)][field] += sign * value
+    return (
+        {field: value for field, value in delta.items() if value},
+        {
+            assignee: {field: value for field, value in counts.items() if value}
+            for assignee, counts in assigned.items() if any(counts.values())
+        },
+    )
+
+
+def broadcast_delta(delta, assigned):
+    """Send a counters delta to the admin inbox group"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(ADMIN_INBOX_GROUP, {
+            'type': 'inbox_counters',
+            'delta': delta,
+            'assigned': assigned,
+        })
+    except Exception:
+        # A missing broker must not fail the request that changed the conversation
+        logger.exception('Could not broadcast inbox counters')
+
+
+def conversation_changed(before, after):
+    """Invalidate cached stats and push the counters delta after commit"""
+    delta, assigned = get_delta(before, after)
+    if not delta and not assigned:
+        return
+    invalidate_inbox_stats()
+    transaction.on_commit(lambda: broadcast_delta(delta, assigned))
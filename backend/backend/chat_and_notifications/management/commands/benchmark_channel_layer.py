@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+import queue
+import time
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer, channel_layers
+from django.core.management.base import BaseCommand, CommandError
+from Main_Application.channel_layers import BrokerChannelLayer, ChannelBroker
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    index = round(percent / 100 * (len(values) - 1))
+    return values[index]
+
+
+async def consume(layer, group, consumers, messages, timeout, ready):
+    """Join consumers to a group and collect the latency of every message they receive"""
+    channels = []
+    for _ in range(consumers):
+        channel = await layer.new_channel()
+        await layer.group_add(group, channel)
+        channels.append(channel)
+    ready()
+
+    latencies = []
+    last_received = 0.0
+
+    async def receive_all(channel):
+        nonlocal last_received
+        for _ in range(messages):
+            try:
+                message = await asyncio.wait_for(layer.receive(channel), timeout)
+            except asyncio.TimeoutError:
+                return
+            last_received = time.time()
+            latencies.append(last_received - message['sent_at'])
+
+    await asyncio.gather(*[receive_all(channel) for channel in channels])
+    for channel in channels:
+        await layer.group_discard(group, channel)
+    return latencies, last_received
+
+
+def worker_process(group, consumers, messages, timeout, ready, results):
+    # A layer of its own: nothing inherited from the parent's event loops
+    layer = channel_layers.make_backend(DEFAULT_CHANNEL_LAYER)
+    latencies, last_received = asyncio.run(
+        consume(layer, group, consumers, messages, timeout, lambda: ready.put(consumers))
+    )
+    results.put((latencies, last_received))
+
+
+async def send_messages(layer, group, messages, payload_bytes, rate):
+    padding = 'x' * payload_bytes
+    interval = 1 / rate if rate else 0
+    started = time.time()
+    for sequence in range(messages):
+        await layer.group_send(group, {
+            'type': 'benchmark.message', 'sequence': sequence, 'sent_at': time.time(), 'padding': padding,
+        })
+        if interval:
+            await asyncio.sleep(max(0.0, started + (sequence + 1) * interval - time.time()))
+    return started, time.time()
+
+
+class Command(BaseCommand):
+    help = 'Measure channel layer group_send fan-out latency and throughput to many consumers across worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumers', type=int, default=100, help='Consumers joined to the group in total')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Processes the consumers are spread over (0 runs them in this process)',
+        )
+        parser.add_argument('--messages', type=int, default=200, help='Messages sent to the group')
+        parser.add_argument('--payload-bytes', type=int, default=256, help='Padding added to every message')
+        parser.add_argument('--rate', type=float, default=0, help='Messages sent per second (0 for as fast as possible)')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Seconds a consumer waits for its next message')
+        parser.add_argument('--group', default='benchmark', help='Group name')
+        parser.add_argument(
+            '--with-broker',
+            action='store_true',
+            help='Start the local channel broker in this process (CHANNEL_LAYER=local)',
+        )
+
+    def handle(self, *args, **options):
+        layer = channel_layers.make_backend(DEFAULT_CHANNEL_LAYER)
+        workers = options['workers']
+        if isinstance(layer, InMemoryChannelLayer) and workers:
+            raise CommandError(
+                'The in-memory channel layer does not cross processes: use --workers 0 or set CHANNEL_LAYER'
+            )
+        broker = None
+        if options['with_broker']:
+            if not isinstance(layer, BrokerChannelLayer):
+                raise CommandError('--with-broker needs CHANNEL_LAYER=local')
+            broker = ChannelBroker(layer.host, layer.port).start_in_thread()
+        try:
+            if workers:
+                latencies, finished = self.run_workers(layer, options)
+            else:
+                latencies, finished = asyncio.run(self.run_in_process(layer, options))
+        finally:
+            if broker is not None:
+                broker.stop_thread()
+        self.report(latencies, finished, options)
+
+    def run_workers(self, layer, options):
+        context = multiprocessing.get_context('fork')
+        ready = context.Queue()
+        results = context.Queue()
+        workers = options['workers']
+        processes = []
+        for index in range(workers):
+            consumers = options['consumers'] // workers + (1 if index < options['consumers'] % workers else 0)
+            process = context.Process(target=worker_process, args=(
+                options['group'], consumers, options['messages'], options['timeout'], ready, results,
+            ))
+            process.start()
+            processes.append(process)
+
+        try:
+            for _ in processes:
+                ready.get(timeout=60)
+            self.sent = asyncio.run(send_messages(
+                layer, options['group'], options['messages'], options['payload_bytes'], options['rate']
+            ))
+            latencies, last_received = [], 0.0
+            for _ in processes:
+                worker_latencies, worker_last = results.get(timeout=options['timeout'] + 60)
+                latencies.extend(worker_latencies)
+                last_received = max(last_received, worker_last)
+        except queue.Empty:
+            raise CommandError('Benchmark workers did not respond in time')
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        return latencies, last_received
+
+    async def run_in_process(self, layer, options):
+        ready = asyncio.Event()
+        receiving = asyncio.ensure_future(consume(
+            layer, options['group'], options['consumers'], options['messages'], options['timeout'], ready.set
+        ))
+        await ready.wait()
+        self.sent = await send_messages(
+            layer, options['group'], options['messages'], options['payload_bytes'], options['rate']
+        )
+        return await receiving
+
+    def report(self, latencies, last_received, options):
+        send_started, send_finished = self.sent
+        expected = options['consumers'] * options['messages']
+        latencies.sort()
+        send_seconds = max(send_finished - send_started, 1e-9)
+        delivery_seconds = max(last_received - send_started, 1e-9)
+        self.stdout.write(f"Consumers: {options['consumers']} over {options['workers'] or 1} process(es)")
+        self.stdout.write(
+            f"Sent {options['messages']} messages in {send_seconds:.3f}s "
+            f"({options['messages'] / send_seconds:.0f} group_send/s)"
+        )
+        self.stdout.write(
+            f"Delivered {len(latencies)}/{expected} in {delivery_seconds:.3f}s "
+            f"({len(latencies) / delivery_seconds:.0f} deliveries/s), lost {expected - len(latencies)}"
+        )
+        self.stdout.write(
+            'Latency ms: p50 {:.2f}, p95 {:.2f}, p99 {:.2f}, max {:.2f}'.format(
+                *(percentile(latencies, p) * 1000 for p in (50, 95, 99, 100))
+            )
+        )
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from chat_and_notifications.presence import flush
+
+class Command(BaseCommand):
+    help = 'Write the chat presence set to participant online status and last seen times'
+
+    def handle(self, *args, **options):
+        online, offline = flush()
+        self.stdout.write(self.style.SUCCESS(
+            f'Flushed presence: {online} participants online, {offline} gone offline'
+        ))
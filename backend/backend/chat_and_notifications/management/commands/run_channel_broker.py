@@ -0,0 +1,29 @@
+import asyncio
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Main_Application.channel_layers import DEFAULT_HOST, DEFAULT_PORT, ChannelBroker
+
+class Command(BaseCommand):
+    help = 'Run the local channel broker shared by ASGI workers when CHANNEL_LAYER=local'
+
+    def add_arguments(self, parser):
+        config = settings.CHANNEL_LAYERS['default'].get('CONFIG', {})
+        parser.add_argument(
+            '--host',
+            default=config.get('host', DEFAULT_HOST),
+            help='Address to listen on',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=config.get('port', DEFAULT_PORT),
+            help='Port to listen on',
+        )
+
+    def handle(self, *args, **options):
+        broker = ChannelBroker(options['host'], options['port'])
+        self.stdout.write(self.style.SUCCESS(f"Channel broker listening on {options['host']}:{options['port']}"))
+        try:
+            asyncio.run(broker.serve_forever())
+        except KeyboardInterrupt:
+            pass
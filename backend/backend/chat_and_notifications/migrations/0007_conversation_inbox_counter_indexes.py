@@ -0,0 +1,21 @@
+# Generated by Django 4.2.4 on 2026-10-16 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_and_notifications', '0006_contact'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['status', 'unread_staff_count', 'assigned_to'], name='chat_and_no_status_dac7c6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['customer', 'unread_user_count'], name='chat_and_no_custome_01a090_idx'),
+        ),
+    ]
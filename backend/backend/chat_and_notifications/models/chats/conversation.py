@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -27,6 +27,9 @@ class Conversation(models.Model):
             models.Index(fields=['customer', 'status']),
             models.Index(fields=['assigned_to', 'status']),
             models.Index(fields=['status', 'last_message_at']),
+            # Covering indexes for the inbox counters (chat_and_notifications/inbox_counters.py)
+            models.Index(fields=['status', 'unread_staff_count', 'assigned_to']),
+            models.Index(fields=['customer', 'unread_user_count']),
         ]
     
     def __str__(self):
@@ -37,18 +40,59 @@ class Conversation(models.Model):
         self.last_message_at = timezone.now()
         self.save(update_fields=['last_message_at', 'updated_at'])
     
+    def save(self, *args, **kwargs):
+        """Override save to report status and assignment changes to the inbox counters"""
+        from chat_and_notifications import inbox_counters
+
+        update_fields = kwargs.get('update_fields')
+        tracked = update_fields is None or bool(
+            {'status', 'assigned_to', 'unread_staff_count'} & set(update_fields)
+        )
+        before = None
+        if tracked and self.pk is not None:
+            before = Conversation.objects.filter(pk=self.pk).values_list(
+                'status', 'assigned_to_id', 'unread_staff_count'
+            ).first()
+        super().save(*args, **kwargs)
+        if tracked:
+            inbox_counters.conversation_changed(before, inbox_counters.snapshot(self))
+
+    def delete(self, *args, **kwargs):
+        from chat_and_notifications import inbox_counters
+
+        before = inbox_counters.snapshot(self)
+        result = super().delete(*args, **kwargs)
+        inbox_counters.conversation_changed(before, None)
+        return result
+
     def increment_unread_count(self, is_staff_message=False):
         """Increment unread count for the appropriate side"""
-        if is_staff_message:
-            self.unread_user_count += 1
-        else:
-            self.unread_staff_count += 1
-        self.save(update_fields=['unread_user_count', 'unread_staff_count', 'updated_at'])
-    
+        self.update_unread_count(not is_staff_message, lambda count: count + 1)
+
     def reset_unread_count(self, is_staff=False):
         """Reset unread count for the appropriate side"""
-        if is_staff:
-            self.unread_staff_count = 0
-        else:
-            self.unread_user_count = 0
-        self.save(update_fields=['unread_user_count', 'unread_staff_count', 'updated_at'])
+        self.update_unread_count(is_staff, lambda count: 0)
+
+    def update_unread_count(self, is_staff, change):
+        """
+        Set one side's unread count to change(count). The conversation row is
+        locked while change runs, so concurrent messages are not lost.
+        """
+        from chat_and_notifications import inbox_counters
+
+        field = 'unread_staff_count' if is_staff else 'unread_user_count'
+        with transaction.atomic():
+            row = Conversation.objects.select_for_update().filter(pk=self.pk).values(
+                'status', 'assigned_to_id', 'unread_staff_count', field
+            ).get()
+            count = change(row[field])
+            setattr(self, field, count)
+            if count == row[field]:
+                return
+            self.updated_at = timezone.now()
+            Conversation.objects.filter(pk=self.pk).update(**{field: count, 'updated_at': self.updated_at})
+            if field == 'unread_staff_count':
+                inbox_counters.conversation_changed(
+                    (row['status'], row['assigned_to_id'], row[field]),
+                    (row['status'], row['assigned_to_id'], count),
+                )
@@ -0,0 +1,234 @@
+"""
+Presence
+========
+
+Tracks which users have a chat socket open without writing to the database
+on every connect and disconnect.
+
+- connect() and heartbeat() put a user in the online set with a TTL; clients
+  send a heartbeat over their socket every HEARTBEAT_INTERVAL, so users of a
+  crashed worker simply expire. disconnect() takes a user offline when their
+  last socket closes.
+- BACKEND 'cache' keeps the set in a Django cache (Redis when REDIS_URL is
+  set), shared by every worker; 'memory' keeps it in the process, for a
+  single worker. Entries carry what the inbox shows, so listing online users
+  reads the online index and the entries it names: O(online users), with no
+  database or session scan.
+- The cache index is a plain cache value. Two workers racing on it can drop
+  an id, which the user's next heartbeat puts back.
+- flush() writes Participant.is_online/last_seen_at with two UPDATEs. It runs
+  from presence calls at most once per FLUSH_INTERVAL (and from the
+  flush_presence command), so last_seen_at is accurate to that interval.
+"""
+
+import threading
+import time
+
+from django.core.cache import caches
+from django.utils import timezone
+
+from chat_and_notifications.models import Participant
+from Main_Application.conf import get_settings
+
+DEFAULTS = {
+    'BACKEND': 'cache',
+    'CACHE_ALIAS': 'default',
+    'TTL': 90,  # seconds without a heartbeat before a user is offline
+    'HEARTBEAT_INTERVAL': 30,  # seconds between client heartbeats, sent to clients on connect
+    'FLUSH_INTERVAL': 30,  # seconds between database flushes
+}
+
+INDEX_KEY = 'presence-online'
+ENTRY_KEY = 'presence:{}'
+CONNECTIONS_KEY = 'presence-connections:{}'
+FLUSH_KEY = 'presence-flush'
+
+
+def get_config():
+    """Get presence settings merged over the defaults"""
+    return get_settings('PRESENCE', DEFAULTS)
+
+
+def get_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def make_entry(user):
+    """What the inbox shows for an online user"""
+    return {
+        'id': user.pk,
+        'email': user.email,
+        'full_name': getattr(user, 'full_name', None),
+        'is_staff': user.is_staff or user.is_superuser,
+        'last_seen': timezone.now().isoformat(),
+    }
+
+
+class CachePresence:
+    """Online set kept in a Django cache, shared by every worker"""
+
+    def __init__(self, cache, ttl):
+        self.cache = cache
+        self.ttl = ttl
+
+    def connect(self, user):
+        key = CONNECTIONS_KEY.format(user.pk)
+        self.cache.add(key, 0, self.ttl)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            self.cache.set(key, 1, self.ttl)
+        return self.heartbeat(user)
+
+    def heartbeat(self, user):
+        key = ENTRY_KEY.format(user.pk)
+        cached = self.cache.get_many([INDEX_KEY, key])
+        self.cache.set(key, make_entry(user), self.ttl)
+        self.cache.touch(CONNECTIONS_KEY.format(user.pk), self.ttl)
+        index = cached.get(INDEX_KEY, frozenset())
+        if user.pk not in index:
+            self.cache.set(INDEX_KEY, index | {user.pk}, None)
+        return key not in cached
+
+    def disconnect(self, user):
+        try:
+            connections = self.cache.decr(CONNECTIONS_KEY.format(user.pk))
+        except ValueError:
+            connections = 0
+        if connections > 0:
+            return False
+        return self.go_offline(user)
+
+    def go_offline(self, user):
+        key = ENTRY_KEY.format(user.pk)
+        was_online = self.cache.get(key) is not None
+        self.cache.delete_many([key, CONNECTIONS_KEY.format(user.pk)])
+        return was_online
+
+    def online_users(self):
+        index = self.cache.get(INDEX_KEY, frozenset())
+        entries = self.cache.get_many([ENTRY_KEY.format(user_id) for user_id in index])
+        online = list(entries.values())
+        if len(online) < len(index):
+            # Prune expired ids; an id dropped by a racing heartbeat comes back with the next one
+            self.cache.set(INDEX_KEY, frozenset(entry['id'] for entry in online), None)
+        return online
+
+
+_memory_lock = threading.Lock()
+_memory_entries = {}  # user id -> (expires at, connections, entry)
+
+
+class MemoryPresence:
+    """Online set kept in this process, for a single worker"""
+
+    def __init__(self, entries, ttl):
+        self.entries = entries
+        self.ttl = ttl
+
+    def _current(self, user_id, now):
+        expires, connections, entry = self.entries.get(user_id, (0, 0, None))
+        if expires <= now:
+            return 0, None
+        return connections, entry
+
+    def _update(self, user, connection_change):
+        now = time.monotonic()
+        with _memory_lock:
+            connections, entry = self._current(user.pk, now)
+            self.entries[user.pk] = (now + self.ttl, max(connections + connection_change, 0), make_entry(user))
+        return entry is None
+
+    def connect(self, user):
+        return self._update(user, 1)
+
+    def heartbeat(self, user):
+        return self._update(user, 0)
+
+    def disconnect(self, user):
+        with _memory_lock:
+            connections, entry = self._current(user.pk, time.monotonic())
+            if connections > 1:
+                expires = self.entries[user.pk][0]
+                self.entries[user.pk] = (expires, connections - 1, entry)
+                return False
+            self.entries.pop(user.pk, None)
+        return entry is not None
+
+    def go_offline(self, user):
+        with _memory_lock:
+            _, entry = self._current(user.pk, time.monotonic())
+            self.entries.pop(user.pk, None)
+        return entry is not None
+
+    def online_users(self):
+        now = time.monotonic()
+        with _memory_lock:
+            for user_id in [user_id for user_id, (expires, _, _) in self.entries.items() if expires <= now]:
+                del self.entries[user_id]
+            return [entry for _, _, entry in self.entries.values()]
+
+
+def get_backend():
+    config = get_config()
+    if config['BACKEND'] == 'memory':
+        return MemoryPresence(_memory_entries, config['TTL'])
+    return CachePresence(get_cache(), config['TTL'])
+
+
+def connect(user):
+    """Record a new socket of a user, returns True when the user came online"""
+    came_online = get_backend().connect(user)
+    maybe_flush()
+    return came_online
+
+
+def heartbeat(user):
+    """Keep a user online for another TTL, returns True when the user came online"""
+    came_online = get_backend().heartbeat(user)
+    maybe_flush()
+    return came_online
+
+
+def disconnect(user):
+    """Record a closed socket, returns True when it was the user's last one"""
+    went_offline = get_backend().disconnect(user)
+    maybe_flush()
+    return went_offline
+
+
+def go_offline(user):
+    """Take a user offline regardless of open sockets"""
+    return get_backend().go_offline(user)
+
+
+def online_users(staff_only=False):
+    """Entries of the users online now"""
+    users = get_backend().online_users()
+    if staff_only:
+        return [entry for entry in users if entry['is_staff']]
+    return users
+
+
+def is_staff_online():
+    return bool(online_users(staff_only=True))
+
+
+def flush(now=None):
+    """Write the online set to Participant rows, returns (rows online, rows gone offline)"""
+    now = now or timezone.now()
+    online_ids = [entry['id'] for entry in online_users()]
+    online = Participant.objects.filter(user_id__in=online_ids, is_active=True).update(
+        is_online=True, last_seen_at=now,
+    )
+    offline = Participant.objects.filter(is_online=True).exclude(user_id__in=online_ids).update(
+        is_online=False,
+    )
+    return online, offline
+
+
+def maybe_flush():
+    """Flush when no worker has in the last FLUSH_INTERVAL"""
+    if get_cache().add(FLUSH_KEY, True, get_config()['FLUSH_INTERVAL']):
+        flush()
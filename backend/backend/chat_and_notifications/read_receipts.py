@@ -0,0 +1,105 @@
+"""
+Read Receipts
+=============
+
+Marks chat messages as read in bulk, one conversation at a time.
+
+- A reader reads the other side's messages: a staff member reads the
+  customer's, a customer reads the staff's. Reading a conversation marks
+  every such message up to a watermark read with one conditional UPDATE
+  (created_at <= watermark), instead of one save per message.
+- The watermark is the newest of the given message ids, or the time of the
+  call when the whole conversation is read; seeing a message means the
+  messages before it were seen as well.
+- The reader's unread counter is set to the unread messages left after the
+  watermark in the same transaction, while the conversation row is locked.
+- One messages_read event carrying the watermark is sent to the
+  conversation's WebSocket group after commit.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from chat_and_notifications.models import Message
+
+logger = logging.getLogger(__name__)
+
+
+def is_staff_reader(user):
+    return user.is_staff or user.is_superuser
+
+
+def unread_messages(conversation, user):
+    """Unread messages the other side sent in a conversation"""
+    staff_sender = Q(sender__is_staff=True) | Q(sender__is_superuser=True)
+    return Message.objects.filter(
+        Q(conversation=conversation, is_read_by_recipient=False),
+        ~staff_sender if is_staff_reader(user) else staff_sender,
+    )
+
+
+def mark_conversation_read(conversation, user, message_ids=None):
+    """Mark the other side's messages read up to a watermark, returns (updated count, watermark)"""
+    if message_ids:
+        watermark = Message.objects.filter(
+            conversation=conversation, id__in=message_ids
+        ).aggregate(watermark=Max('created_at'))['watermark']
+        if watermark is None:
+            return 0, None
+    else:
+        watermark = timezone.now()
+
+    updated = 0
+    messages = unread_messages(conversation, user)
+
+    def mark(count):
+        nonlocal updated
+        now = timezone.now()
+        updated = messages.filter(created_at__lte=watermark).update(
+            is_read_by_recipient=True, read_at=now, delivery_status='read', updated_at=now,
+        )
+        return messages.filter(created_at__gt=watermark).count()
+
+    with transaction.atomic():
+        conversation.update_unread_count(is_staff_reader(user), mark)
+        if updated:
+            event = {
+                'type': 'messages_read',
+                'user': user.email,
+                'conversation_id': str(conversation.pk),
+                'message_ids': list(message_ids or []),
+                'watermark': watermark.isoformat(),
+            }
+            transaction.on_commit(lambda: broadcast_read(conversation.pk, event))
+    return updated, watermark
+
+
+def mark_messages_read(user, message_ids, conversations):
+    """Mark messages read per conversation they belong to, returns the updated count"""
+    by_conversation = {}
+    for message_id, conversation_id in Message.objects.filter(
+        id__in=message_ids, conversation__in=conversations
+    ).values_list('id', 'conversation_id'):
+        by_conversation.setdefault(conversation_id, []).append(message_id)
+
+    updated = 0
+    for conversation in conversations.filter(pk__in=by_conversation):
+        updated += mark_conversation_read(conversation, user, by_conversation[conversation.pk])[0]
+    return updated
+
+
+def broadcast_read(conversation_id, event):
+    """Send a messages_read event to the conversation group"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(f'chat_{conversation_id}', event)
+    except Exception:
+        # A missing broker must not fail the request that read the messages
+        logger.exception('Could not broadcast read receipts')
@@ -1,109 +1,62 @@
 """
 Contact Messages Real-time Signal Handlers
-Handles WebSocket broadcasting for Contact model events
+Announces Contact changes to the admin contacts WebSocket group after commit
+(see Main_Application/broadcasts.py); counts are coalesced into one message
 """
 
 from django.db.models.signals import post_save, post_delete
+from django.db.models import Count, Q
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from chat_and_notifications.models.contact.contact import Contact
+from Main_Application.broadcasts import broadcast, broadcast_latest
+
+ADMIN_CONTACTS_GROUP = 'admin_contacts'
+
+
+def contact_count_event():
+    """Unread and total contact counts, in one query"""
+    counts = Contact.objects.aggregate(
+        total_count=Count('id'),
+        unread_count=Count('id', filter=Q(is_read=False)),
+    )
+    return {'type': 'contact_count_updated', **counts}
 
 
 @receiver(post_save, sender=Contact)
-def contact_created_or_updated(sender, instance, created, **kwargs):
+def contact_created_or_updated(sender, instance, created, raw=False, **kwargs):
     """
     Signal handler for Contact model save events
-    Broadcasts real-time updates to admin WebSocket group
+    Queues the contact event and a coalesced count update
     """
-    print(f"🔍 DEBUG: Contact signal triggered - created: {created}, contact: {instance.name}")
-    print(f"🔍 DEBUG: Contact signal - instance.id: {instance.id}, is_read: {instance.is_read}")
-    try:
-        channel_layer = get_channel_layer()
-        if not channel_layer:
-            print("🔍 DEBUG: Contact signal - no channel layer available")
-            return
-        
-        print("🔍 DEBUG: Contact signal - channel layer available, proceeding...")
-
-        # Prepare contact data for WebSocket broadcast
-        contact_data = {
-            'id': instance.id,
-            'name': instance.name,
-            'email': instance.email,
-            'subject': instance.subject,
-            'message': instance.message,
-            'is_read': instance.is_read,
-            'is_replied': instance.is_replied,
-            'created_at': instance.created_at.isoformat(),
-            'updated_at': instance.updated_at.isoformat(),
-            'status': instance.status
-        }
-
-        # Determine event type
-        event_type = 'new_contact' if created else 'contact_updated'
-        print(f"🔍 DEBUG: Contact signal - broadcasting {event_type} to admin_contacts group")
-        
-        # Broadcast to admin group
-        async_to_sync(channel_layer.group_send)(
-            'admin_contacts',
-            {
-                'type': event_type,
-                'contact': contact_data
-            }
-        )
-
-        # Also broadcast contact count update
-        unread_count = Contact.objects.filter(is_read=False).count()
-        total_count = Contact.objects.count()
-        print(f"🔍 DEBUG: Contact signal - broadcasting count update: unread={unread_count}, total={total_count}")
-        
-        async_to_sync(channel_layer.group_send)(
-            'admin_contacts',
-            {
-                'type': 'contact_count_updated',
-                'unread_count': unread_count,
-                'total_count': total_count
-            }
-        )
-        
-        print("🔍 DEBUG: Contact signal - count update broadcasted successfully")
-
-    except Exception as e:
-        # Log error but don't crash the application
-        print(f"Error broadcasting contact update: {e}")
+    if raw:
+        return
+    contact_data = {
+        'id': instance.id,
+        'name': instance.name,
+        'email': instance.email,
+        'subject': instance.subject,
+        'message': instance.message,
+        'is_read': instance.is_read,
+        'is_replied': instance.is_replied,
+        'created_at': instance.created_at.isoformat(),
+        'updated_at': instance.updated_at.isoformat(),
+        'status': instance.status
+    }
+    broadcast(ADMIN_CONTACTS_GROUP, {
+        'type': 'new_contact' if created else 'contact_updated',
+        'contact': contact_data
+    })
+    broadcast_latest(ADMIN_CONTACTS_GROUP, 'contact_count', contact_count_event)
 
 
 @receiver(post_delete, sender=Contact)
 def contact_deleted(sender, instance, **kwargs):
     """
     Signal handler for Contact model delete events
-    Broadcasts real-time updates to admin WebSocket group
+    Queues the deletion and a coalesced count update
     """
-    try:
-        channel_layer = get_channel_layer()
-        if not channel_layer:
-            return
-
-        # Broadcast contact deletion
-        async_to_sync(channel_layer.group_send)(
-            'admin_contacts',
-            {
-                'type': 'contact_deleted',
-                'contact_id': instance.id
-            }
-        )
-
-        # Also broadcast contact count update
-        async_to_sync(channel_layer.group_send)(
-            'admin_contacts',
-            {
-                'type': 'contact_count_updated',
-                'unread_count': Contact.objects.filter(is_read=False).count(),
-                'total_count': Contact.objects.count()
-            }
-        )
-
-    except Exception as e:
-        # Log error but don't crash the application
-        print(f"Error broadcasting contact deletion: {e}")
+    broadcast(ADMIN_CONTACTS_GROUP, {
+        'type': 'contact_deleted',
+        'contact_id': instance.id
+    })
+    broadcast_latest(ADMIN_CONTACTS_GROUP, 'contact_count', contact_count_event)
@@ -1,3 +1,400 @@
-from django.test import TestCase
+import asyncio
+import gc
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from chat_and_notifications import presence
+from chat_and_notifications.inbox_counters import ADMIN_INBOX_GROUP, get_delta
+from chat_and_notifications.models import Conversation, Message, Participant
+from chat_and_notifications.models.contact.contact import Contact
+from chat_and_notifications.routing import websocket_urlpatterns
+from Main_Application import broadcasts
+from Main_Application.channel_layers import BrokerChannelLayer, ChannelBroker
+
+
+class BrokerChannelLayerTests(SimpleTestCase):
+    """The local broker shares groups between workers like the Redis layer"""
+
+    def test_group_send_reaches_channels_of_every_worker(self):
+        async def scenario():
+            broker = ChannelBroker(port=0)
+            await broker.start()
+            # Two layers stand for two ASGI worker processes
+            first = BrokerChannelLayer(port=broker.port)
+            second = BrokerChannelLayer(port=broker.port)
+            try:
+                channels = [await first.new_channel(), await first.new_channel(), await second.new_channel()]
+                for channel in channels:
+                    await first.group_add('admin_orders', channel)
+
+                await second.group_send('admin_orders', {'type': 'order.update', 'order_id': 7})
+                received = [await asyncio.wait_for(
+                    (first if channel in channels[:2] else second).receive(channel), 2
+                ) for channel in channels]
+                self.assertEqual(received, [{'type': 'order.update', 'order_id': 7}] * 3)
+
+                await second.send(channels[0], {'type': 'direct'})
+                self.assertEqual(await asyncio.wait_for(first.receive(channels[0]), 2), {'type': 'direct'})
+
+                # Payloads must be serializable, as with the Redis layer
+                with self.assertRaises(TypeError):
+                    await second.group_send('admin_orders', {'type': 'bad', 'when': object()})
+
+                # A worker that goes away leaves its groups at once
+                await first.group_discard('admin_orders', channels[2])
+                await first.close()
+                for _ in range(50):
+                    if not broker.groups:
+                        break
+                    await asyncio.sleep(0.01)
+                self.assertEqual(dict(broker.groups), {})
+            finally:
+                await second.close()
+                await broker.close()
+
+        asyncio.run(scenario())
+
+    def test_sync_sends_close_their_connection_with_the_loop(self):
+        broker = ChannelBroker(port=0).start_in_thread()
+        self.addCleanup(broker.stop_thread)
+        receiver = BrokerChannelLayer(port=broker.port)
+        sender = BrokerChannelLayer(port=broker.port)
+
+        def on_broker_loop(coroutine):
+            return asyncio.run_coroutine_threadsafe(coroutine, broker.loop).result(2)
+
+        channel = on_broker_loop(receiver.new_channel())
+        on_broker_loop(receiver.group_add('admin_contacts', channel))
+
+        # As the contact signals do from sync code: a new event loop per call
+        for count in range(3):
+            async_to_sync(sender.group_send)('admin_contacts', {'type': 'contact_count_updated', 'total_count': count})
+
+        received = [on_broker_loop(receiver.receive(channel))['total_count'] for _ in range(3)]
+        self.assertEqual(received, [0, 1, 2])
+        deadline = time.time() + 2
+        while len(broker.clients) > 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(broker.clients), 1)
+        self.assertEqual(sender.connections, {})
+
+    def test_connections_of_closed_loops_are_dropped(self):
+        broker = ChannelBroker(port=0).start_in_thread()
+        self.addCleanup(broker.stop_thread)
+        layer = BrokerChannelLayer(port=broker.port)
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(layer.new_channel())
+        # Closed without cancelling its tasks, so the connection never hears of it
+        loop.close()
+        self.assertIn(loop, layer.connections)
+
+        async_to_sync(layer.group_send)('admin_contacts', {'type': 'contact_count_updated'})
+        self.assertNotIn(loop, layer.connections)
+        # The broker saw the stale connection end: only the one of the last call was left, and it closed
+        deadline = time.time() + 2
+        while broker.clients and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(broker.clients, {})
+        # Its reader task was left pending on the closed loop
+        with self.assertLogs('asyncio', 'ERROR'):
+            del loop
+            gc.collect()
+
+
+class ChannelLayerBenchmarkTests(SimpleTestCase):
+    """The fan-out benchmark runs against the configured layer"""
+
+    def test_in_process_benchmark_reports_every_delivery(self):
+        out = StringIO()
+        call_command('benchmark_channel_layer', workers=0, consumers=5, messages=3, stdout=out)
+        self.assertIn('Delivered 15/15', out.getvalue())
+        self.assertIn('lost 0', out.getvalue())
+
+
+class InboxCountersTests(TestCase):
+    """Inbox counters come from one cached aggregate and changes are pushed as deltas"""
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(email='support@example.com', password='pass12345', is_staff=True)
+        self.customer = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        self.other = User.objects.create_user(email='other@example.com', password='pass12345')
+        self.mine = Conversation.objects.create(customer=self.customer, assigned_to=self.staff)
+        self.theirs = Conversation.objects.create(customer=self.other, status='closed')
+        for conversation, sender in ((self.mine, self.customer), (self.mine, self.customer), (self.theirs, self.other)):
+            Message.objects.create(conversation=conversation, sender=sender, content='Hello')
+        Message.objects.create(conversation=self.mine, sender=self.staff, content='Hi')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_stats_are_one_cached_aggregate(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('inbox-stats'))
+        self.assertEqual(response.data, {
+            'total_conversations': 2, 'open_conversations': 1, 'closed_conversations': 1,
+            'unread_conversations': 2, 'unread_count': 3, 'assigned_to_me': 1, 'unread_assigned_to_me': 1,
+        })
+        self.assertEqual(len([q for q in queries.captured_queries if 'conversation' in q['sql']]), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('inbox-unread-count')).data, {'unread_count': 3})
+        self.assertFalse([q for q in queries.captured_queries if 'conversation' in q['sql']])
+
+        self.mine.reset_unread_count(is_staff=True)
+        self.assertEqual(self.client.get(reverse('message-unread-count')).data, {'unread_count': 1})
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(reverse('message-unread-count')).data, {'unread_count': 1})
+
+    def test_changes_are_broadcast_as_deltas_after_commit(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(ADMIN_INBOX_GROUP, channel)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                Message.objects.create(conversation=self.mine, sender=self.customer, content='Anyone?')
+            event = async_to_sync(channel_layer.receive)(channel)
+            self.assertEqual(event['delta'], {'unread_count': 1})
+            self.assertEqual(event['assigned'], {})
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.mine.reset_unread_count(is_staff=True)
+            event = async_to_sync(channel_layer.receive)(channel)
+            self.assertEqual(event['delta'], {'unread_conversations': -1, 'unread_count': -3})
+            self.assertEqual(event['assigned'], {str(self.staff.pk): {'unread_assigned_to_me': -1}})
+
+            # Reading an already read conversation changes nothing
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.mine.reset_unread_count(is_staff=True)
+            self.assertEqual(callbacks, [])
+        finally:
+            async_to_sync(channel_layer.group_discard)(ADMIN_INBOX_GROUP, channel)
+
+    def test_reassignment_moves_the_assignee_counters(self):
+        self.assertEqual(
+            get_delta(('open', self.staff.pk, 2), ('closed', self.other.pk, 2)),
+            (
+                {'open_conversations': -1, 'closed_conversations': 1},
+                {
+                    str(self.staff.pk): {'assigned_to_me': -1, 'unread_assigned_to_me': -1},
+                    str(self.other.pk): {'assigned_to_me': 1, 'unread_assigned_to_me': 1},
+                },
+            ),
+        )
+
+        self.assertEqual(self.client.get(reverse('inbox-stats')).data['assigned_to_me'], 1)
+        self.mine.assigned_to = None
+        self.mine.save()
+        self.assertEqual(self.client.get(reverse('inbox-stats')).data['assigned_to_me'], 0)
+
+
+class ReadReceiptTests(TestCase):
+    """Reading a conversation is one UPDATE up to a watermark and one messages_read event"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='support@example.com', password='pass12345', is_staff=True)
+        self.customer = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        self.conversation = Conversation.objects.create(customer=self.customer, assigned_to=self.staff)
+        self.sent = [
+            Message.objects.create(conversation=self.conversation, sender=self.customer, content=f'Message {i}')
+            for i in range(20)
+        ]
+        self.reply = Message.objects.create(conversation=self.conversation, sender=self.staff, content='Hi')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def mark_read(self, **data):
+        return self.client.post(reverse('message-mark-read'), data, format='json')
+
+    def test_conversation_is_read_with_one_update_and_one_event(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        group = f'chat_{self.conversation.pk}'
+        async_to_sync(channel_layer.group_add)(group, channel)
+        try:
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                response = self.mark_read(conversation_id=self.conversation.pk)
+            event = async_to_sync(channel_layer.receive)(channel)
+        finally:
+            async_to_sync(channel_layer.group_discard)(group, channel)
+
+        self.assertEqual(response.data['updated_count'], 20)
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "chat_and_notifications_message"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(event['user'], 'support@example.com')
+        self.assertIsNotNone(event['watermark'])
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.unread_staff_count, 0)
+        self.assertEqual(self.conversation.unread_user_count, 1)
+        self.assertFalse(Message.objects.filter(sender=self.customer, is_read_by_recipient=False).exists())
+        # The reader's own reply is the customer's to read
+        self.reply.refresh_from_db()
+        self.assertFalse(self.reply.is_read_by_recipient)
+
+    def test_message_ids_mark_up_to_the_newest_and_keep_the_rest_unread(self):
+        response = self.mark_read(message_ids=[self.sent[4].pk, self.sent[1].pk])
+        self.assertEqual(response.data['updated_count'], 5)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.unread_staff_count, 15)
+        self.assertEqual(
+            list(Message.objects.filter(is_read_by_recipient=True).values_list('pk', flat=True)),
+            [message.pk for message in self.sent[:5]],
+        )
+
+        # Customers read the staff's messages only
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.mark_read(conversation_id=self.conversation.pk).data['updated_count'], 1)
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.unread_user_count, self.conversation.unread_staff_count), (0, 15))
+
+
+class MessageHistoryTests(TestCase):
+    """History is paged newest first with a before cursor, and sockets get only the tail"""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        self.conversation = Conversation.objects.create(customer=self.customer)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.customer, content=f'Message {i}')
+            for i in range(35)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_history_is_paged_back_from_the_newest(self):
+        url = reverse('message-list')
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get(url, {'conversation': self.conversation.pk, 'before': ''}).data
+        self.assertLessEqual(len(queries), 3)
+        self.assertEqual([m['content'] for m in page['results'][:2]], ['Message 34', 'Message 33'])
+        self.assertEqual(len(page['results']), 30)
+
+        older = self.client.get(url, {'conversation': self.conversation.pk, 'before': page['next_cursor']}).data
+        self.assertEqual([m['content'] for m in older['results']], [f'Message {i}' for i in range(4, -1, -1)])
+        self.assertIsNone(older['next_cursor'])
+
+        # Without the parameter the list keeps its plain shape
+        plain = self.client.get(url, {'conversation': self.conversation.pk}).data
+        self.assertEqual(len(plain), 35)
+
+    async def test_socket_sends_the_tail_on_connect(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.conversation.pk}/')
+        communicator.scope['user'] = self.customer
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'connection_established')
+        history = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertEqual(history['type'], 'message_history')
+        self.assertEqual(len(history['messages']), 30)
+        self.assertEqual(history['messages'][0]['content'], 'Message 34')
+        self.assertIsNotNone(history['before'])
+
+
+class PresenceTests(TestCase):
+    """Online status lives in the presence set and reaches the database in periodic flushes"""
+
+    def setUp(self):
+        cache.clear()
+        presence._memory_entries.clear()
+        self.staff = User.objects.create_user(email='support@example.com', password='pass12345', is_staff=True)
+        self.customer = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        conversation = Conversation.objects.create(customer=self.customer, assigned_to=self.staff)
+        self.participant = Participant.objects.create(conversation=conversation, user=self.staff)
+
+    def admin_status(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        return client.get(reverse('inbox-admin-status')).data['is_online']
+
+    async def open_inbox(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/admin/inbox/')
+        communicator.scope['user'] = self.staff
+        self.assertTrue((await communicator.connect())[0])
+        await communicator.receive_json_from()
+        return communicator
+
+    async def test_staff_is_online_while_any_socket_is_open(self):
+        first = await self.open_inbox()
+        self.assertEqual(await first.receive_json_from(), {
+            'type': 'user_online_status', 'user': 'support@example.com', 'is_online': True,
+        })
+        second = await self.open_inbox()
+        await second.send_json_to({'type': 'get_online_users'})
+        users = (await second.receive_json_from())['users']
+        self.assertEqual([user['email'] for user in users], ['support@example.com'])
+
+        await first.disconnect()
+        self.assertTrue(await database_sync_to_async(self.admin_status)())
+        await second.disconnect()
+        self.assertFalse(await database_sync_to_async(self.admin_status)())
+
+    def test_connects_do_not_write_participants_until_a_flush(self):
+        for backend in ('cache', 'memory'):
+            with self.subTest(backend=backend), override_settings(PRESENCE={'BACKEND': backend}):
+                cache.set(presence.FLUSH_KEY, True)  # a flush just ran
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertTrue(presence.connect(self.staff))
+                    self.assertFalse(presence.connect(self.staff))
+                    self.assertFalse(presence.heartbeat(self.staff))
+                    self.assertFalse(presence.disconnect(self.staff))
+                self.assertEqual(len(queries), 0)
+                self.assertTrue(presence.is_staff_online())
+
+                self.assertEqual(presence.flush(), (1, 0))
+                self.participant.refresh_from_db()
+                self.assertTrue(self.participant.is_online)
+
+                self.assertTrue(presence.disconnect(self.staff))
+                self.assertEqual(presence.online_users(), [])
+                self.assertEqual(presence.flush(), (0, 1))
+                self.participant.refresh_from_db()
+                self.assertFalse(self.participant.is_online)
+
+    @override_settings(PRESENCE={'BACKEND': 'memory', 'TTL': 90})
+    def test_users_without_heartbeats_expire(self):
+        with mock.patch.object(presence.time, 'monotonic', return_value=1000):
+            presence.connect(self.staff)
+        with mock.patch.object(presence.time, 'monotonic', return_value=1100):
+            self.assertFalse(presence.is_staff_online())
+            # A late heartbeat brings the user back
+            self.assertTrue(presence.heartbeat(self.staff))
+            self.assertTrue(presence.is_staff_online())
+
+
+@override_settings(BROADCASTS={'WORKER': False})
+class ContactBroadcastTests(TestCase):
+    """Contact changes are queued after commit with one count message per transaction"""
+
+    def test_contacts_queue_events_and_one_count(self):
+        broadcasts.queue.take()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Contact.objects.create(name='Buyer', email='buyer@example.com', subject='Order', message=f'Hello {i}')
+            Contact.objects.filter(message='Hello 0').get().delete()
+
+        events = [event for _, event in broadcasts.queue.take()]
+        self.assertEqual(
+            [event['type'] for event in events],
+            ['new_contact'] * 3 + ['contact_deleted', 'contact_count_updated'],
+        )
+        self.assertEqual(events[-1], {'type': 'contact_count_updated', 'total_count': 2, 'unread_count': 2})
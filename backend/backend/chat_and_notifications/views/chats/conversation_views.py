@@ -5,7 +5,10 @@ from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 
+from ... import presence
+from ...inbox_counters import get_inbox_stats
 from ...models import Conversation, Message, Participant
+from ...read_receipts import mark_conversation_read
 from ...serializers import (
     ConversationSerializer, 
     ConversationListSerializer,
@@ -120,12 +123,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
     def mark_read(self, request, pk=None):
         """Mark conversation as read"""
         conversation = self.get_object()
-        user = request.user
-        
-        if user.is_staff or user.is_superuser:
-            conversation.reset_unread_count(is_staff=True)
-        else:
-            conversation.reset_unread_count(is_staff=False)
+        mark_conversation_read(conversation, request.user)
         
         return Response({'message': 'Conversation marked as read'})
 
@@ -142,11 +140,7 @@ class ConversationInboxView(viewsets.ReadOnlyModelViewSet):
         if not (user.is_staff or user.is_superuser):
             return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get all conversations with unread staff count
-        conversations = Conversation.objects.all()
-        total_unread = sum(conv.unread_staff_count for conv in conversations)
-
-        return Response({'unread_count': total_unread})
+        return Response({'unread_count': get_inbox_stats(user)['unread_count']})
     
     def get_queryset(self):
         """Filter conversations for inbox"""
@@ -196,69 +190,22 @@ class ConversationInboxView(viewsets.ReadOnlyModelViewSet):
         if not (user.is_staff or user.is_superuser):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        stats = {
-            'total_conversations': Conversation.objects.count(),
-            'open_conversations': Conversation.objects.filter(status='open').count(),
-            'closed_conversations': Conversation.objects.filter(status='closed').count(),
-            'unread_conversations': Conversation.objects.filter(unread_staff_count__gt=0).count(),
-            'assigned_to_me': Conversation.objects.filter(assigned_to=user).count(),
-            'unread_assigned_to_me': Conversation.objects.filter(
-                assigned_to=user, 
-                unread_staff_count__gt=0
-            ).count()
-        }
+        stats = get_inbox_stats(user)
         
         return Response(stats)
     
     @action(detail=False, methods=['get'])
     def admin_status(self, request):
-        """Check if any admin/staff is online - Real-time session-based detection"""
-        from django.contrib.auth import get_user_model
+        """Check if any admin/staff is online - from the presence set, no session scan"""
         from django.utils import timezone
-        from django.contrib.sessions.models import Session
         from datetime import timedelta
         
-        User = get_user_model()
-        
-        # Check for staff users who logged in within last 1 minute (very recent)
-        one_minute_ago = timezone.now() - timedelta(minutes=1)
-        
-        # First check: Look for staff users with very recent login
-        recent_staff = User.objects.filter(
+        # Staff with an open socket, or who logged in within the last minute
+        online_staff = presence.is_staff_online() or User.objects.filter(
             Q(is_staff=True) | Q(is_superuser=True),
             is_active=True,
-            last_login__gte=one_minute_ago
-        )
-        
-        online_staff = recent_staff.exists()
-        
-        for staff in recent_staff:
-            pass
-        
-        # If no recent login, check active sessions but be very strict
-        if not online_staff:
-            active_sessions = Session.objects.filter(expire_date__gte=timezone.now())
-            
-            # Only check sessions that are very recent (created within last 2 minutes)
-            two_minutes_ago = timezone.now() - timedelta(minutes=2)
-            
-            for session in active_sessions:
-                try:
-                    # Check if session was created recently
-                    session_created_time = session.expire_date - timedelta(weeks=2)  # Approximate creation time
-                    if session_created_time < two_minutes_ago:
-                        continue  # Skip old sessions
-                    
-                    session_data = session.get_decoded()
-                    user_id = session_data.get('_auth_user_id')
-                    if user_id:
-                        user = User.objects.get(id=user_id)
-                        if (user.is_staff or user.is_superuser) and user.is_active:
-                            
-                            online_staff = True
-                            break
-                except Exception as e:
-                    continue
+            last_login__gte=timezone.now() - timedelta(minutes=1)
+        ).exists()
 
         return Response({
             'is_online': online_staff,
@@ -2,10 +2,14 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 
+from Main_Application.keyset_pagination import KeysetPagination
+from ...inbox_counters import get_unread_count
 from ...models import Conversation, Message
+from ...read_receipts import mark_conversation_read, mark_messages_read
 from ...serializers import (
     MessageSerializer,
     MessageCreateSerializer,
@@ -15,9 +19,24 @@ from ...serializers import (
 
 User = get_user_model()
 
+class MessageHistoryPagination(KeysetPagination):
+    """
+    Keyset pagination of a conversation's history over the (conversation,
+    created_at) index: newest messages first, ?before=<next_cursor> scrolls back
+
+    Opt-in like the other keyset lists: ?before= (empty) asks for the newest
+    page, and lists without the parameter keep their plain, unpaginated shape.
+    """
+    page_size = getattr(settings, 'CHAT_SETTINGS', {}).get('HISTORY_PAGE_SIZE', 30)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'before'
+
 class MessageViewSet(viewsets.ModelViewSet):
     """ViewSet for managing messages"""
     permission_classes = [IsAuthenticated]
+    pagination_class = MessageHistoryPagination
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         """Filter messages based on user access"""
@@ -29,9 +48,9 @@ class MessageViewSet(viewsets.ModelViewSet):
                 conversation = Conversation.objects.get(id=conversation_id)
                 # Check if user has access to this conversation
                 if conversation.customer == user or conversation.assigned_to == user:
-                    return Message.objects.filter(conversation=conversation)
+                    return Message.objects.filter(conversation=conversation).select_related('sender')
                 elif user.is_staff or user.is_superuser:
-                    return Message.objects.filter(conversation=conversation)
+                    return Message.objects.filter(conversation=conversation).select_related('sender')
             except Conversation.DoesNotExist:
                 pass
         
@@ -62,44 +81,18 @@ class MessageViewSet(viewsets.ModelViewSet):
             
             if conversation_id:
                 # Mark all unread messages in conversation as read
-                try:
-                    conversation = Conversation.objects.get(id=conversation_id)
-                    if conversation in self.get_user_conversations(user):
-                        messages = Message.objects.filter(
-                            conversation=conversation,
-                            is_read_by_recipient=False
-                        )
-                        updated_count = 0
-                        for message in messages:
-                            message.mark_as_read()
-                            updated_count += 1
-                        
-                        # Reset unread count for the conversation
-
-                        if user.is_staff or user.is_superuser:
-                            conversation.reset_unread_count(is_staff=True)
-                        else:
-                            conversation.reset_unread_count(is_staff=False)
-
-                        return Response({
-                            'message': f'{updated_count} messages marked as read in conversation',
-                            'updated_count': updated_count
-                        })
-                except Conversation.DoesNotExist:
+                conversation = self.get_user_conversations(user).filter(id=conversation_id).first()
+                if conversation is None:
                     return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+                updated_count, _ = mark_conversation_read(conversation, user)
+
+                return Response({
+                    'message': f'{updated_count} messages marked as read in conversation',
+                    'updated_count': updated_count
+                })
             else:
-                # Mark specific messages as read
-                messages = Message.objects.filter(
-                    id__in=message_ids,
-                    conversation__in=self.get_user_conversations(user)
-                )
-                
-                # Mark messages as read
-                updated_count = 0
-                for message in messages:
-                    if not message.is_read_by_recipient:
-                        message.mark_as_read()
-                        updated_count += 1
+                # Mark specific messages (and those before them) as read
+                updated_count = mark_messages_read(user, message_ids, self.get_user_conversations(user))
                 
                 return Response({
                     'message': f'{updated_count} messages marked as read',
@@ -132,15 +125,7 @@ class MessageViewSet(viewsets.ModelViewSet):
     def unread_count(self, request):
         """Get unread message count for user"""
         user = request.user
-        conversations = self.get_user_conversations(user)
-        
-        if user.is_staff or user.is_superuser:
-            unread_count = sum(conv.unread_staff_count for conv in conversations)
-        else:
-            unread_count = sum(conv.unread_user_count for conv in conversations)
-        
-        for conv in conversations:
-            pass
+        unread_count = get_unread_count(user)
 
         return Response({'unread_count': unread_count})
     
@@ -170,18 +155,8 @@ class MessageMarkReadView(viewsets.GenericViewSet):
             message_ids = serializer.validated_data['message_ids']
             user = request.user
             
-            # Get messages that user has access to
-            messages = Message.objects.filter(
-                id__in=message_ids,
-                conversation__in=self.get_user_conversations(user)
-            )
-            
-            # Mark messages as read
-            updated_count = 0
-            for message in messages:
-                if not message.is_read_by_recipient:
-                    message.mark_as_read()
-                    updated_count += 1
+            # Mark the messages (and those before them) per conversation
+            updated_count = mark_messages_read(user, message_ids, self.get_user_conversations(user))
             
             return Response({
                 'message': f'{updated_count} messages marked as read',
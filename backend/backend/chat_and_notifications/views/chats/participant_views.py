@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
 
+from ... import presence
 from ...models import Conversation, Participant
 from ...serializers import (
     ParticipantSerializer,
@@ -91,11 +92,11 @@ class ParticipantViewSet(viewsets.ModelViewSet):
         user = request.user
         is_online = request.data.get('is_online', False)
         
-        # Update all participant records for this user
-        participants = Participant.objects.filter(user=user, is_active=True)
-        
-        for participant in participants:
-            participant.set_online_status(is_online)
+        # Presence is written to participant records by the periodic flush
+        if is_online:
+            presence.heartbeat(user)
+        else:
+            presence.go_offline(user)
         
         return Response({
             'message': f'Online status set to {is_online}',
@@ -111,11 +112,11 @@ class OnlineStatusView(viewsets.GenericViewSet):
         user = request.user
         is_online = request.data.get('is_online', False)
         
-        # Update all participant records for this user
-        participants = Participant.objects.filter(user=user, is_active=True)
-        
-        for participant in participants:
-            participant.set_online_status(is_online)
+        # Presence is written to participant records by the periodic flush
+        if is_online:
+            presence.heartbeat(user)
+        else:
+            presence.go_offline(user)
         
         return Response({
             'message': f'Online status set to {is_online}',
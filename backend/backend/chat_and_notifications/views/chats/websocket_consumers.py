@@ -5,12 +5,51 @@ from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ObjectDoesNotExist
+from Main_Application.keyset_pagination import paginate_keyset
 
-from ...models import Conversation, Message, Participant
+from ... import presence
+from ...inbox_counters import ADMIN_INBOX_GROUP, get_inbox_stats
+from ...models import Conversation, Message
+from ...read_receipts import mark_conversation_read
+from ...serializers import MessageListSerializer
+from .message_views import MessageHistoryPagination
 
 User = get_user_model()
 
-class ChatConsumer(AsyncJsonWebsocketConsumer):
+class PresenceMixin:
+    """Online status of the socket's user through the presence service (no per-socket writes)"""
+    is_present = False
+    
+    async def update_online_status(self, is_online):
+        """Update user's online status and tell the admin inbox when it changed"""
+        if not self.user or self.user.is_anonymous or is_online == self.is_present:
+            return
+        self.is_present = is_online
+        change = presence.connect if is_online else presence.disconnect
+        if await database_sync_to_async(change)(self.user):
+            await self.channel_layer.group_send(
+                ADMIN_INBOX_GROUP,
+                {
+                    'type': 'user_online_status',
+                    'user': self.user.email,
+                    'is_online': is_online
+                }
+            )
+    
+    async def handle_heartbeat(self, content):
+        """Keep the user online; clients send this every heartbeat_interval seconds"""
+        if self.is_present:
+            await database_sync_to_async(presence.heartbeat)(self.user)
+    
+    async def user_online_status(self, event):
+        """Send user online status update"""
+        await self.send_json({
+            'type': 'user_online_status',
+            'user': event['user'],
+            'is_online': event['is_online']
+        })
+
+class ChatConsumer(PresenceMixin, AsyncJsonWebsocketConsumer):
     """WebSocket consumer for individual conversation chat"""
     
     async def connect(self):
@@ -47,7 +86,16 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         await self.send_json({
             'type': 'connection_established',
             'conversation_id': self.conversation_id,
-            'user': self.user.email
+            'user': self.user.email,
+            'heartbeat_interval': presence.get_config()['HEARTBEAT_INTERVAL']
+        })
+        
+        # Only the tail of the history; older pages come from the REST history with ?before=
+        messages, before = await self.get_history_tail()
+        await self.send_json({
+            'type': 'message_history',
+            'messages': messages,
+            'before': before
         })
 
     async def disconnect(self, close_code):
@@ -73,6 +121,8 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             await self.handle_typing_stop(content)
         elif message_type == 'mark_read':
             await self.handle_mark_read(content)
+        elif message_type == 'heartbeat':
+            await self.handle_heartbeat(content)
     
     async def handle_chat_message(self, content):
         """Handle chat message"""
@@ -112,7 +162,7 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             # Also notify admin inbox group for real-time list updates
             try:
                 await self.channel_layer.group_send(
-                    'admin_inbox',
+                    ADMIN_INBOX_GROUP,
                     {
                         'type': 'new_message',
                         'message': message_data
@@ -144,22 +194,11 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         )
     
     async def handle_mark_read(self, content):
-        """Handle mark messages as read"""
+        """Handle mark messages as read (the whole conversation when no ids are given)"""
         message_ids = content.get('message_ids', [])
         
-        if message_ids:
-            await self.mark_messages_read(message_ids)
-            
-            # Notify other participants in the conversation
-            await self.channel_layer.group_send(
-                self.conversation_group_name,
-                {
-                    'type': 'messages_read',
-                    'user': self.user.email,
-                    'message_ids': message_ids
-                }
-            )
-
+        # One UPDATE up to the watermark; participants get one messages_read event after commit
+        if await self.mark_messages_read(message_ids):
             # Also notify admin inbox list to update unread counters in real time
             try:
                 # Fetch minimal conversation data for update
@@ -172,7 +211,7 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
                     'unread_count': getattr(convo, 'unread_staff_count', 0)
                 }
                 await self.channel_layer.group_send(
-                    'admin_inbox',
+                    ADMIN_INBOX_GROUP,
                     {
                         'type': 'conversation_updated',
                         'conversation': payload
@@ -211,7 +250,8 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             await self.send_json({
                 'type': 'messages_read',
                 'user': event['user'],
-                'message_ids': event['message_ids']
+                'message_ids': event['message_ids'],
+                'watermark': event.get('watermark')
             })
     
     @database_sync_to_async
@@ -228,6 +268,16 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         except ObjectDoesNotExist:
             return False
     
+    @database_sync_to_async
+    def get_history_tail(self):
+        """Newest messages of the conversation (newest first) and the cursor before them"""
+        messages, before, _ = paginate_keyset(
+            Message.objects.filter(conversation_id=self.conversation_id).select_related('sender'),
+            '-created_at',
+            MessageHistoryPagination.page_size,
+        )
+        return MessageListSerializer(messages, many=True).data, before
+    
     @database_sync_to_async
     def save_message(self, content):
         """Save message to database"""
@@ -245,42 +295,14 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
     
     @database_sync_to_async
     def mark_messages_read(self, message_ids):
-        """Mark messages as read"""
+        """Mark messages as read, returns the number marked"""
         try:
             conversation = Conversation.objects.get(id=self.conversation_id)
-            messages = Message.objects.filter(
-                id__in=message_ids,
-                conversation=conversation
-            )
-            
-            for message in messages:
-                if not message.is_read_by_recipient:
-                    message.mark_as_read()
-            
-            # Reset unread count for this user
-            if self.user.is_staff or self.user.is_superuser:
-                conversation.reset_unread_count(is_staff=True)
-            else:
-                conversation.reset_unread_count(is_staff=False)
-                
         except ObjectDoesNotExist:
-            pass
+            return 0
+        return mark_conversation_read(conversation, self.user, message_ids)[0]
     
-    @database_sync_to_async
-    def update_online_status(self, is_online):
-        """Update user's online status"""
-        if not self.user or self.user.is_anonymous:
-            return
-            
-        participants = Participant.objects.filter(
-            user_id=self.user.id,
-            is_active=True
-        )
-        
-        for participant in participants:
-            participant.set_online_status(is_online)
-
-class AdminConsumer(AsyncJsonWebsocketConsumer):
+class AdminConsumer(PresenceMixin, AsyncJsonWebsocketConsumer):
     """WebSocket consumer for admin/staff inbox"""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -301,7 +323,7 @@ class AdminConsumer(AsyncJsonWebsocketConsumer):
             await self.close()
             return
         
-        self.admin_group_name = 'admin_inbox'
+        self.admin_group_name = ADMIN_INBOX_GROUP
         
         # Join admin group
         await self.channel_layer.group_add(
@@ -317,7 +339,8 @@ class AdminConsumer(AsyncJsonWebsocketConsumer):
         # Send connection confirmation
         await self.send_json({
             'type': 'admin_connection_established',
-            'user': self.user.email
+            'user': self.user.email,
+            'heartbeat_interval': presence.get_config()['HEARTBEAT_INTERVAL']
         })
     
     async def disconnect(self, close_code):
@@ -344,6 +367,8 @@ class AdminConsumer(AsyncJsonWebsocketConsumer):
             await self.send_stats()
         elif message_type == 'get_online_users':
             await self.send_online_users()
+        elif message_type == 'heartbeat':
+            await self.handle_heartbeat(content)
     
     async def new_conversation(self, event):
         """Send new conversation notification"""
@@ -366,13 +391,14 @@ class AdminConsumer(AsyncJsonWebsocketConsumer):
             'message': event['message']
         })
     
-    async def user_online_status(self, event):
-        """Send user online status update"""
-        await self.send_json({
-            'type': 'user_online_status',
-            'user': event['user'],
-            'is_online': event['is_online']
-        })
+    async def inbox_counters(self, event):
+        """Send the change of this user's inbox counters"""
+        delta = {**event['delta'], **event['assigned'].get(str(self.user.id), {})}
+        if delta:
+            await self.send_json({
+                'type': 'inbox_counters',
+                'delta': delta
+            })
     
     async def send_stats(self):
         """Send inbox statistics"""
@@ -393,42 +419,9 @@ class AdminConsumer(AsyncJsonWebsocketConsumer):
     @database_sync_to_async
     def get_inbox_stats(self):
         """Get inbox statistics"""
-        return {
-            'total_conversations': Conversation.objects.count(),
-            'open_conversations': Conversation.objects.filter(status='open').count(),
-            'unread_conversations': Conversation.objects.filter(unread_staff_count__gt=0).count(),
-            'assigned_to_me': Conversation.objects.filter(assigned_to=self.user).count()
-        }
+        return get_inbox_stats(self.user)
     
     @database_sync_to_async
     def get_online_users(self):
         """Get online users"""
-        online_participants = Participant.objects.filter(
-            is_online=True,
-            is_active=True
-        ).select_related('user')
-        
-        return [
-            {
-                'id': p.user.id,
-                'email': p.user.email,
-                'full_name': p.user.full_name,
-                'is_staff': p.user.is_staff,
-                'last_seen': p.last_seen_at.isoformat()
-            }
-            for p in online_participants
-        ]
-    
-    @database_sync_to_async
-    def update_online_status(self, is_online):
-        """Update user's online status"""
-        if not self.user or self.user.is_anonymous:
-            return
-            
-        participants = Participant.objects.filter(
-            user_id=self.user.id,
-            is_active=True
-        )
-        
-        for participant in participants:
-            participant.set_online_status(is_online)
+        return presence.online_users()
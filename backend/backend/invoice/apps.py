@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class InvoiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'invoice'
+
+    def ready(self):
+        # Register signal handlers
+        import invoice.signals  # noqa: F401
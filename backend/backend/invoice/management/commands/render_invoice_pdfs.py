@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from invoice.pdf_cache import ensure_invoice_pdf, get_invoices
+
+class Command(BaseCommand):
+    help = 'Render the PDFs of invoices whose source data changed since their last render'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Render every invoice again')
+
+    def handle(self, *args, **options):
+        total = rendered = 0
+        for invoice in get_invoices().order_by('pk').iterator():
+            total += 1
+            if ensure_invoice_pdf(invoice, force=options['force']):
+                rendered += 1
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} of {total} invoice PDFs'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.4 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_sha256',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the rendered PDF file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_version',
+            field=models.CharField(blank=True, default='', help_text='Source data version the PDF was rendered from', max_length=64),
+        ),
+    ]
@@ -77,6 +77,21 @@ class Invoice(models.Model):
         help_text="Company email"
     )
     
+    # Rendered PDF, see invoice.pdf_cache
+    pdf_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="SHA-256 of the rendered PDF file"
+    )
+    
+    pdf_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="Source data version the PDF was rendered from"
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,300 @@
+"""
+Invoice PDFs
+============
+
+Invoice PDFs are rendered once and served as files.
+
+- source_version() hashes every value an invoice document shows (invoice,
+  order, items, delivery address, payment). A PDF is rendered again only
+  when that version differs from the one it was rendered from.
+- PDFs are stored content-addressed under MEDIA_ROOT/<DIRECTORY>, named by
+  the SHA-256 of their bytes. ReportLab runs in invariant mode, so the same
+  data gives the same bytes and the same file; files are written to a
+  temporary name and renamed, so readers never see a partial PDF.
+- Saving an invoice, or confirming an order that already has one, schedules
+  a render after commit, done by an in-process background thread. Invoices
+  are only issued by generate_invoice, never by the render. Downloads render
+  synchronously only when no current PDF exists. The render_invoice_pdfs
+  command renders (or re-renders) invoices in bulk.
+- The invoice's pdf_sha256 doubles as the download's ETag.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from invoice.models import Invoice
+from Main_Application.conf import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'DIRECTORY': 'invoices',  # under MEDIA_ROOT
+    'RENDER_ON_COMMIT': True,  # render in a background thread once an invoice or confirmation commits
+}
+
+# Bump when the document layout changes, so every PDF is rendered again
+LAYOUT_VERSION = 1
+
+
+def get_config():
+    """Get invoice PDF settings merged over the defaults"""
+    return get_settings('INVOICE_PDF', DEFAULTS)
+
+
+def get_invoices():
+    """Invoices with everything their document shows, in one query (items are one more)"""
+    return Invoice.objects.select_related('order__delivery_address', 'order__payment__payment_method')
+
+
+def get_payment(order):
+    try:
+        return order.payment
+    except order._meta.get_field('payment').related_model.DoesNotExist:
+        return None
+
+
+def _values(instance):
+    """Stored values of a model instance, without auto_now timestamps"""
+    if instance is None:
+        return None
+    return [
+        (field.attname, getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+        if not getattr(field, 'auto_now', False)
+    ]
+
+
+def source_version(invoice):
+    """Hash of the data the invoice documents show"""
+    order = invoice.order
+    payment = get_payment(order)
+    source = {
+        'layout': LAYOUT_VERSION,
+        'invoice': [
+            value for value in _values(invoice) if value[0] not in ('pdf_sha256', 'pdf_version')
+        ],
+        'order': _values(order),
+        'items': [_values(item) for item in order.items.order_by('pk')],
+        'address': _values(order.delivery_address),
+        'payment': _values(payment),
+        'payment_method': _values(payment.payment_method if payment else None),
+    }
+    return hashlib.sha256(json.dumps(source, default=str, sort_keys=True).encode()).hexdigest()
+
+
+def render_invoice_pdf(invoice):
+    """Build the invoice document with ReportLab, returns the PDF bytes"""
+    buffer = BytesIO()
+
+    # Single page with small margins; invariant output, so equal data gives equal bytes
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36, invariant=True,
+    )
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=15,
+        alignment=TA_CENTER,
+        textColor=colors.HexColor('#28a745')
+    )
+    header_style = ParagraphStyle(
+        'Header',
+        parent=styles['Heading2'],
+        fontSize=12,
+        spaceAfter=8,
+        textColor=colors.HexColor('#28a745')
+    )
+    normal_style = ParagraphStyle(
+        'Normal',
+        parent=styles['Normal'],
+        fontSize=9,
+        spaceAfter=4
+    )
+
+    order = invoice.order
+    address = order.delivery_address
+    payment = get_payment(order)
+    story = []
+
+    # Title
+    story.append(Paragraph("🛍️ INVOICE", title_style))
+    story.append(Spacer(1, 10))
+
+    # Invoice details
+    story.append(Paragraph(f"<b>Invoice Number:</b> {invoice.invoice_number}", normal_style))
+    story.append(Paragraph(f"<b>Invoice Date:</b> {invoice.get_invoice_date_display()}", normal_style))
+    story.append(Paragraph(f"<b>Due Date:</b> {invoice.get_due_date_display()}", normal_style))
+    story.append(Spacer(1, 10))
+
+    # Company info
+    story.append(Paragraph("🛍️ " + (invoice.company_name or "Anon Ecommerce"), header_style))
+    story.append(Paragraph(f"<b>Email:</b> {invoice.company_email or 'info@anonecommerce.com'}", normal_style))
+    story.append(Paragraph(f"<b>Phone:</b> {invoice.company_phone or '+880 1234 567890'}", normal_style))
+    story.append(Paragraph(f"<b>Address:</b> {invoice.company_address or 'Dhaka, Bangladesh'}", normal_style))
+    story.append(Spacer(1, 10))
+
+    # Customer info
+    story.append(Paragraph("Bill To:", header_style))
+    story.append(Paragraph(f"<b>Name:</b> {address.full_name}", normal_style))
+    story.append(Paragraph(f"<b>Phone:</b> {address.phone_number}", normal_style))
+    story.append(Paragraph(f"<b>Address:</b> {address.address_line_1}", normal_style))
+    story.append(Paragraph(f"<b>City:</b> {address.city}", normal_style))
+    story.append(Paragraph(f"<b>Country:</b> {address.country}", normal_style))
+    story.append(Spacer(1, 10))
+
+    # Order items table
+    story.append(Paragraph("Order Items:", header_style))
+    table_data = [['Product', 'SKU', 'Quantity', 'Unit Price', 'Total']]
+    for item in order.items.order_by('pk'):
+        table_data.append([
+            item.product_name or 'N/A',
+            item.product_sku or 'N/A',
+            str(item.quantity),
+            f"৳{item.unit_price:,.2f}",
+            f"৳{item.total_price:,.2f}"
+        ])
+    table = Table(table_data, colWidths=[2.2*inch, 0.8*inch, 0.6*inch, 0.8*inch, 0.8*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#28a745')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 8),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+    ]))
+    story.append(table)
+    story.append(Spacer(1, 10))
+
+    # Totals
+    story.append(Paragraph("Order Summary:", header_style))
+    story.append(Paragraph(f"<b>Subtotal:</b> ৳{order.subtotal:,.2f}", normal_style))
+    story.append(Paragraph(f"<b>Shipping Cost:</b> ৳{invoice.get_shipping_cost():,.2f}", normal_style))
+    story.append(Paragraph(f"<b>Tax Amount:</b> ৳{invoice.get_tax_amount():,.2f}", normal_style))
+    story.append(Paragraph(f"<b>Total Amount:</b> ৳{order.total_amount:,.2f}", normal_style))
+    story.append(Spacer(1, 10))
+
+    # Payment info
+    if payment:
+        method = payment.payment_method
+        story.append(Paragraph("Payment Information:", header_style))
+        story.append(Paragraph(f"<b>Payment Method:</b> {method.name if method else 'N/A'}", normal_style))
+        story.append(Paragraph(f"<b>Status:</b> {payment.status}", normal_style))
+        if method and method.is_cod:
+            story.append(Paragraph("<i>This is a Cash on Delivery order. Payment will be collected upon delivery.</i>", normal_style))
+
+    # Notes
+    if order.notes:
+        story.append(Spacer(1, 10))
+        story.append(Paragraph("Notes:", header_style))
+        story.append(Paragraph(order.notes, normal_style))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def pdf_path(sha256):
+    """Absolute path of the PDF with the given content hash"""
+    return Path(settings.MEDIA_ROOT) / get_config()['DIRECTORY'] / sha256[:2] / f'{sha256}.pdf'
+
+
+def store_pdf(content):
+    """Write PDF bytes under their content hash (once), returns the hash"""
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = pdf_path(sha256)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                temp.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    return sha256
+
+
+def ensure_invoice_pdf(invoice, force=False):
+    """Render the invoice's PDF unless a current one exists, returns True when it rendered"""
+    version = source_version(invoice)
+    if not force and invoice.pdf_version == version and invoice.pdf_sha256 and pdf_path(invoice.pdf_sha256).exists():
+        return False
+
+    sha256 = store_pdf(render_invoice_pdf(invoice))
+    # A plain UPDATE: saving would bump updated_at and fire the invoice signals again
+    Invoice.objects.filter(pk=invoice.pk).update(pdf_sha256=sha256, pdf_version=version)
+    invoice.pdf_sha256, invoice.pdf_version = sha256, version
+    return True
+
+
+def ensure_order_invoice_pdf(order_id):
+    """Render the PDF of the order's invoice when out of date, False when the order has no invoice"""
+    invoice = get_invoices().filter(order_id=order_id).first()
+    if invoice is None:
+        return False
+    return ensure_invoice_pdf(invoice)
+
+
+_pending = set()
+_lock = threading.Lock()
+_running = False
+
+
+def _drain():
+    global _running
+    try:
+        while True:
+            with _lock:
+                if not _pending:
+                    _running = False
+                    return
+                order_id = _pending.pop()
+            close_old_connections()
+            try:
+                ensure_order_invoice_pdf(order_id)
+            except Exception:
+                logger.exception('Could not render the invoice PDF of order %s', order_id)
+    finally:
+        connections.close_all()
+        with _lock:
+            _running = False
+
+
+def render_in_background(order_id):
+    """Render an order's invoice PDF from the background thread, starting it if needed"""
+    global _running
+    with _lock:
+        _pending.add(order_id)
+        if _running:
+            return
+        _running = True
+    threading.Thread(target=_drain, name='invoice-pdf', daemon=True).start()
+
+
+def schedule_invoice_pdf(order_id):
+    """Render an order's invoice PDF once the current transaction commits"""
+    if get_config()['RENDER_ON_COMMIT']:
+        transaction.on_commit(lambda: render_in_background(order_id))
@@ -0,0 +1,6 @@
+"""
+Invoice Signals Package
+"""
+
+# Import signal handlers to ensure they are registered
+from .invoice_pdf_signals import invoice_saved, order_saved_for_invoice
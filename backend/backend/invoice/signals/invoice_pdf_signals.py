@@ -0,0 +1,31 @@
+"""
+Invoice PDF Signal Handlers
+Schedules invoice PDF renders after commit (see invoice/pdf_cache.py); the
+background render is skipped when the invoice's source version is unchanged
+"""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from invoice.models import Invoice
+from invoice.pdf_cache import schedule_invoice_pdf
+from orders.models import Order
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, raw=False, **kwargs):
+    """Render the PDF of a created or edited invoice"""
+    if raw:
+        return
+    schedule_invoice_pdf(instance.order_id)
+
+
+@receiver(post_save, sender=Order)
+def order_saved_for_invoice(sender, instance, raw=False, **kwargs):
+    """Render the invoice of an order that was just confirmed (the worker skips orders without one)"""
+    if raw or instance.status != 'confirmed' or getattr(instance, '_tracked_unchanged', False):
+        return
+    # order_snapshot (orders app) stored the row before the save
+    stored = getattr(instance, '_stored_order', None)
+    if stored is not None and stored['status'] == 'confirmed':
+        return
+    schedule_invoice_pdf(instance.pk)
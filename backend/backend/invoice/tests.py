@@ -0,0 +1,155 @@
+import hashlib
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from invoice import pdf_cache
+from invoice.models import Invoice
+from orders.models import Address, Order, OrderItem, Payment, PaymentMethod
+from products.models import Product
+
+
+@override_settings(INVOICE_PDF={'DIRECTORY': 'invoices', 'RENDER_ON_COMMIT': True}, BROADCASTS={'WORKER': False})
+class InvoicePdfCacheTests(TestCase):
+    """Invoice PDFs are rendered once per source version and served from content-addressed files"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+        self.user = User.objects.create_user(email='buyer@example.com', password='pass12345')
+        address = Address.objects.create(
+            user=self.user, full_name='Buyer', phone_number='01700000000', city='Dhaka',
+            address_line_1='Road 1', postal_code='1200', country='Bangladesh',
+        )
+        self.order = Order.objects.create(
+            user=self.user, delivery_address=address, subtotal=Decimal('10.00'), total_amount=Decimal('10.00')
+        )
+        product = Product.objects.create(title='Mug', slug='mug', status='active', price=Decimal('5.00'), quantity=3)
+        OrderItem.objects.create(
+            order=self.order, product=product, quantity=2, unit_price=Decimal('5.00'), total_price=Decimal('10.00'),
+            product_name='Mug', product_sku='MUG-1',
+        )
+        method = PaymentMethod.objects.create(name='Cash on Delivery', method_type='cash_on_delivery', is_cod=True)
+        Payment.objects.create(order=self.order, payment_method=method, amount=Decimal('10.00'))
+        self.invoice = Invoice.objects.create(order=self.order, status='sent')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('download_invoice_pdf', args=[self.invoice.pk])
+
+    def download(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def content(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_pdf_is_rendered_once_and_served_from_its_content_addressed_file(self):
+        with mock.patch.object(pdf_cache, 'render_invoice_pdf', wraps=pdf_cache.render_invoice_pdf) as render:
+            first = self.download()
+            second = self.download()
+        self.assertEqual(render.call_count, 1)
+
+        self.invoice.refresh_from_db()
+        body = self.content(first)
+        self.assertTrue(body.startswith(b'%PDF'))
+        self.assertEqual(hashlib.sha256(body).hexdigest(), self.invoice.pdf_sha256)
+        self.assertEqual(pdf_cache.pdf_path(self.invoice.pdf_sha256).read_bytes(), body)
+        self.assertEqual(self.content(second), body)
+        self.assertEqual(first['ETag'], f'"{self.invoice.pdf_sha256}"')
+        self.assertEqual(first['Accept-Ranges'], 'bytes')
+        self.assertIn(f'invoice_{self.invoice.invoice_number}.pdf', first['Content-Disposition'])
+
+    def test_if_none_match_and_ranges(self):
+        body = self.content(self.download())
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+        partial = self.download(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.content, body[:10])
+        self.assertEqual(partial['Content-Range'], f'bytes 0-9/{len(body)}')
+
+        suffix = self.download(HTTP_RANGE='bytes=-5')
+        self.assertEqual(suffix.content, body[-5:])
+        self.assertEqual(self.download(HTTP_RANGE=f'bytes={len(body) - 3}-').content, body[-3:])
+
+        unsatisfiable = self.download(HTTP_RANGE=f'bytes={len(body)}-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], f'bytes */{len(body)}')
+
+        # A stale If-Range gets the whole file
+        self.assertEqual(self.download(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"').status_code, 200)
+
+    def test_pdf_is_rendered_again_only_when_its_source_data_changes(self):
+        pdf_cache.ensure_invoice_pdf(pdf_cache.get_invoices().get(pk=self.invoice.pk))
+        self.invoice.refresh_from_db()
+        sha256, version = self.invoice.pdf_sha256, self.invoice.pdf_version
+
+        invoice = pdf_cache.get_invoices().get(pk=self.invoice.pk)
+        self.assertFalse(pdf_cache.ensure_invoice_pdf(invoice))
+        # Equal data renders equal bytes, so a render lands on the same file
+        self.assertEqual(hashlib.sha256(pdf_cache.render_invoice_pdf(invoice)).hexdigest(), sha256)
+
+        self.order.notes = 'Leave at the door'
+        self.order.save()
+        invoice = pdf_cache.get_invoices().get(pk=self.invoice.pk)
+        self.assertTrue(pdf_cache.ensure_invoice_pdf(invoice))
+        self.assertNotEqual(invoice.pdf_version, version)
+        self.assertNotEqual(invoice.pdf_sha256, sha256)
+        # The previous file stays: it is still valid content for its hash
+        self.assertTrue(pdf_cache.pdf_path(sha256).exists())
+
+    def test_invoice_creation_and_order_confirmation_schedule_a_render_after_commit(self):
+        with mock.patch.object(pdf_cache, 'render_in_background') as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.order.status = 'confirmed'
+                self.order.save()
+                render.assert_not_called()
+        render.assert_called_once_with(self.order.pk)
+
+        # Later saves of the confirmed order schedule nothing
+        with mock.patch.object(pdf_cache, 'render_in_background') as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.order.notes = 'Leave at the door'
+                self.order.save()
+        render.assert_not_called()
+
+        self.assertTrue(pdf_cache.ensure_order_invoice_pdf(self.order.pk))
+        self.invoice.refresh_from_db()
+        self.assertTrue(pdf_cache.pdf_path(self.invoice.pdf_sha256).exists())
+
+        # The worker never issues an invoice itself
+        self.invoice.delete()
+        self.assertFalse(pdf_cache.ensure_order_invoice_pdf(self.order.pk))
+        self.assertFalse(Invoice.objects.filter(order=self.order).exists())
+
+    def test_render_command_renders_out_of_date_invoices(self):
+        call_command('render_invoice_pdfs', stdout=mock.Mock())
+        self.invoice.refresh_from_db()
+        self.assertTrue(pdf_cache.pdf_path(self.invoice.pdf_sha256).exists())
+
+        with mock.patch.object(pdf_cache, 'render_invoice_pdf', wraps=pdf_cache.render_invoice_pdf) as render:
+            call_command('render_invoice_pdfs', stdout=mock.Mock())
+        render.assert_not_called()
+
+    def test_html_view_is_cached_per_source_version(self):
+        url = reverse('invoice_pdf', args=[self.invoice.pk])
+        with mock.patch('invoice.views.render_to_string', return_value='<html></html>') as render:
+            first = self.client.get(url)
+            self.client.get(url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
@@ -2,21 +2,13 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404, render
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, HttpResponseNotModified, FileResponse
 from django.template.loader import render_to_string
-from django.conf import settings
-import os
-import tempfile
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.pdfgen import canvas
-from io import BytesIO
+from django.core.cache import cache
+from django.utils.http import parse_etags
 
 from invoice.models import Invoice
+from invoice.pdf_cache import ensure_invoice_pdf, get_invoices, get_payment, pdf_path, source_version
 from invoice.serializers import InvoiceSerializer
 from orders.models.orders.order import Order
 
@@ -81,27 +73,71 @@ def generate_invoice(request, order_id):
             'message': f'Failed to generate invoice: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match names the given ETag"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    tags = [tag.removeprefix('W/') for tag in parse_etags(header)]
+    return '*' in tags or etag in tags
+
+def parse_byte_range(header, size):
+    """
+    (start, end) of a single 'bytes=' range, None to send the whole file;
+    raises ValueError when the range lies outside the file
+    """
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        # Other units and multipart ranges are not supported: send the whole file
+        return None
+    first, _, last = spec.strip().partition('-')
+    if not (first or last) or not (first or '0').isdigit() or not (last or '0').isdigit():
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Invalid range: ignored like a missing header
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def invoice_pdf_view(request, invoice_id):
     """
-    Generate PDF view of invoice
+    Generate PDF view of invoice, cached per source version
     """
     try:
-        invoice = get_object_or_404(Invoice, id=invoice_id, order__user=request.user)
-        
-        # Render invoice template
-        context = {
-            'invoice': invoice,
-            'order': invoice.order,
-            'order_items': invoice.order.items.all(),
-            'delivery_address': invoice.order.delivery_address,
-            'payment': invoice.order.payment,
-        }
-        
-        html_content = render_to_string('invoice/invoice_template.html', context)
-        
-        return HttpResponse(html_content, content_type='text/html')
+        invoice = get_object_or_404(get_invoices(), id=invoice_id, order__user=request.user)
+        version = source_version(invoice)
+        etag = f'"{version}"'
+        if etag_matches(request, etag):
+            return HttpResponseNotModified(headers={'ETag': etag})
+
+        cache_key = f'invoice-html:{invoice.pk}:{version}'
+        html_content = cache.get(cache_key)
+        if html_content is None:
+            # Render invoice template
+            context = {
+                'invoice': invoice,
+                'order': invoice.order,
+                'order_items': invoice.order.items.all(),
+                'delivery_address': invoice.order.delivery_address,
+                'payment': get_payment(invoice.order),
+            }
+            html_content = render_to_string('invoice/invoice_template.html', context)
+            cache.set(cache_key, html_content, 24 * 60 * 60)
+
+        response = HttpResponse(html_content, content_type='text/html')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         return Response({
@@ -113,143 +149,55 @@ def invoice_pdf_view(request, invoice_id):
 @permission_classes([permissions.IsAuthenticated])
 def download_invoice_pdf(request, invoice_id):
     """
-    Download invoice as PDF file using ReportLab
+    Download invoice as PDF file, rendered once per source version (see invoice/pdf_cache.py)
+    Supports If-None-Match and single byte ranges
     """
     try:
-        invoice = get_object_or_404(Invoice, id=invoice_id, order__user=request.user)
+        invoice = get_object_or_404(get_invoices(), id=invoice_id, order__user=request.user)
 
-        # Create BytesIO buffer for PDF
-        buffer = BytesIO()
-        
-        # Create PDF document with smaller margins for single page
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36)
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        
-        # Custom styles - optimized for single page
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=15,
-            alignment=TA_CENTER,
-            textColor=colors.HexColor('#28a745')
-        )
-        
-        header_style = ParagraphStyle(
-            'Header',
-            parent=styles['Heading2'],
-            fontSize=12,
-            spaceAfter=8,
-            textColor=colors.HexColor('#28a745')
-        )
-        
-        normal_style = ParagraphStyle(
-            'Normal',
-            parent=styles['Normal'],
-            fontSize=9,
-            spaceAfter=4
-        )
-        
-        # Build PDF content
-        story = []
-        
-        # Title
-        story.append(Paragraph("🛍️ INVOICE", title_style))
-        story.append(Spacer(1, 10))
-        
-        # Invoice details
-        story.append(Paragraph(f"<b>Invoice Number:</b> {invoice.invoice_number}", normal_style))
-        story.append(Paragraph(f"<b>Invoice Date:</b> {invoice.get_invoice_date_display()}", normal_style))
-        story.append(Paragraph(f"<b>Due Date:</b> {invoice.get_due_date_display()}", normal_style))
-        story.append(Spacer(1, 10))
-        
-        # Company info
-        story.append(Paragraph("🛍️ " + (invoice.company_name or "Anon Ecommerce"), header_style))
-        story.append(Paragraph(f"<b>Email:</b> {invoice.company_email or 'info@anonecommerce.com'}", normal_style))
-        story.append(Paragraph(f"<b>Phone:</b> {invoice.company_phone or '+880 1234 567890'}", normal_style))
-        story.append(Paragraph(f"<b>Address:</b> {invoice.company_address or 'Dhaka, Bangladesh'}", normal_style))
-        story.append(Spacer(1, 10))
-        
-        # Customer info
-        story.append(Paragraph("Bill To:", header_style))
-        story.append(Paragraph(f"<b>Name:</b> {invoice.order.delivery_address.full_name}", normal_style))
-        story.append(Paragraph(f"<b>Phone:</b> {invoice.order.delivery_address.phone_number}", normal_style))
-        story.append(Paragraph(f"<b>Address:</b> {invoice.order.delivery_address.address_line_1}", normal_style))
-        story.append(Paragraph(f"<b>City:</b> {invoice.order.delivery_address.city}", normal_style))
-        story.append(Paragraph(f"<b>Country:</b> {invoice.order.delivery_address.country}", normal_style))
-        story.append(Spacer(1, 10))
-        
-        # Order items table
-        story.append(Paragraph("Order Items:", header_style))
-        
-        # Table data
-        table_data = [['Product', 'SKU', 'Quantity', 'Unit Price', 'Total']]
-        
-        for item in invoice.order.items.all():
-            table_data.append([
-                item.product_name or 'N/A',
-                item.product_sku or 'N/A',
-                str(item.quantity),
-                f"৳{item.unit_price:,.2f}",
-                f"৳{item.total_price:,.2f}"
-            ])
-        
-        # Create table with optimized sizing
-        table = Table(table_data, colWidths=[2.2*inch, 0.8*inch, 0.6*inch, 0.8*inch, 0.8*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#28a745')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 10))
-        
-        # Totals
-        story.append(Paragraph("Order Summary:", header_style))
-        story.append(Paragraph(f"<b>Subtotal:</b> ৳{invoice.order.subtotal:,.2f}", normal_style))
-        story.append(Paragraph(f"<b>Shipping Cost:</b> ৳{invoice.get_shipping_cost():,.2f}", normal_style))
-        story.append(Paragraph(f"<b>Tax Amount:</b> ৳{invoice.get_tax_amount():,.2f}", normal_style))
-        story.append(Paragraph(f"<b>Total Amount:</b> ৳{invoice.order.total_amount:,.2f}", normal_style))
-        story.append(Spacer(1, 10))
-        
-        # Payment info
-        if invoice.order.payment:
-            story.append(Paragraph("Payment Information:", header_style))
-            story.append(Paragraph(f"<b>Payment Method:</b> {invoice.order.payment.payment_method.name if invoice.order.payment.payment_method else 'N/A'}", normal_style))
-            story.append(Paragraph(f"<b>Status:</b> {invoice.order.payment.status}", normal_style))
-            if invoice.order.payment.payment_method and invoice.order.payment.payment_method.is_cod:
-                story.append(Paragraph("<i>This is a Cash on Delivery order. Payment will be collected upon delivery.</i>", normal_style))
-        
-        # Notes
-        if invoice.order.notes:
-            story.append(Spacer(1, 10))
-            story.append(Paragraph("Notes:", header_style))
-            story.append(Paragraph(invoice.order.notes, normal_style))
-        
-        # Build PDF
-        doc.build(story)
-        
-        # Get PDF content
-        pdf_content = buffer.getvalue()
-        buffer.close()
-        
-        # Create response
-        response = HttpResponse(pdf_content, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
-        response['Content-Length'] = len(pdf_content)
+        # Renders here only when the background render has not run yet or the data changed
+        ensure_invoice_pdf(invoice)
+        etag = f'"{invoice.pdf_sha256}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Accept-Ranges': 'bytes'}
+        if etag_matches(request, etag):
+            return HttpResponseNotModified(headers=headers)
 
-        return response
+        path = pdf_path(invoice.pdf_sha256)
+        size = path.stat().st_size
+        filename = f'invoice_{invoice.invoice_number}.pdf'
+
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if range_header and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                return HttpResponse(
+                    status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                    headers={**headers, 'Content-Range': f'bytes */{size}'},
+                )
+
+        if byte_range is None:
+            return FileResponse(
+                open(path, 'rb'), as_attachment=True, filename=filename,
+                content_type='application/pdf', headers=headers,
+            )
+
+        start, end = byte_range
+        with open(path, 'rb') as pdf_file:
+            pdf_file.seek(start)
+            content = pdf_file.read(end - start + 1)
+        return HttpResponse(
+            content,
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type='application/pdf',
+            headers={
+                **headers,
+                'Content-Range': f'bytes {start}-{end}/{size}',
+                'Content-Disposition': f'attachment; filename="{filename}"',
+            },
+        )
         
     except Exception as e:
         import traceback
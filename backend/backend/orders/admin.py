@@ -2,6 +2,7 @@ from django.contrib import admin
 from orders.models.orders.address import Address
 from orders.models.orders.order import Order
 from orders.models.orders.order_item import OrderItem
+from orders.models.orders.stock_reservation import StockReservation
 from orders.models.payments.payment import Payment
 from orders.models.payments.payment_method import PaymentMethod
 
@@ -43,3 +44,10 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ['status', 'payment_method__method_type', 'cod_collected', 'created_at']
     search_fields = ['order__order_number', 'transaction_id']
     readonly_fields = ['created_at', 'updated_at', 'completed_at', 'cod_collected_at']
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['order', 'product', 'variant', 'quantity', 'status', 'expires_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['order__order_number', 'product__title']
+    readonly_fields = ['created_at', 'released_at']
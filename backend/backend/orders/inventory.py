@@ -0,0 +1,249 @@
+"""
+Inventory Reservations
+======================
+
+Takes stock for an order at checkout and gives it back when the order is
+cancelled or refunded, or its payment never completes.
+
+- Stock rows are locked with select_for_update in a fixed order (products by
+  id, then variants by id), so concurrent checkouts never deadlock.
+- Quantities are decremented with a conditional F() update
+  (quantity >= requested), so stock can never be oversold even on databases
+  where row locks are not available.
+- Each decrement is recorded as a StockReservation. Reservations of orders
+  paid online expire after settings.STOCK_RESERVATION['TTL_MINUTES'];
+  release_expired_reservations() cancels those orders and restocks them.
+- Stock is changed with QuerySet.update(), which sends no save signals, so
+  the cached product feeds are invalidated here once the change commits.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from orders.models import Order, StockReservation
+from products.feed_cache import invalidate as invalidate_feeds
+from products.models import Product, ProductVariant
+from Main_Application.conf import get_settings
+
+DEFAULTS = {
+    'TTL_MINUTES': 30,       # minutes an unpaid online order holds its stock
+    'SWEEP_BATCH_SIZE': 100,  # orders released per transaction by the sweeper
+}
+
+# Order statuses that mean the stock is sold
+COMMITTED_STATUSES = ('confirmed', 'processing', 'shipped', 'delivered')
+# Order statuses that give the stock back
+RELEASED_STATUSES = ('cancelled', 'refunded')
+
+
+class InsufficientStock(Exception):
+    """Raised when a product or variant does not have enough stock for a checkout"""
+
+    def __init__(self, name, requested, available):
+        self.name = name
+        self.requested = requested
+        self.available = available
+        super().__init__(f'Not enough stock for "{name}": requested {requested}, available {available}')
+
+
+def get_config():
+    """Get reservation settings merged over the defaults"""
+    return get_settings('STOCK_RESERVATION', DEFAULTS)
+
+
+def tracks_stock(item):
+    """Whether checkout must take stock from a product or variant"""
+    if not item.track_quantity or item.allow_backorder:
+        return False
+    return getattr(item, 'quantity_policy', 'deny') == 'deny'
+
+
+def _merge_lines(lines):
+    """Sum (product_id, variant_id, quantity) lines per stock row"""
+    merged = OrderedDict()
+    for product_id, variant_id, quantity in lines:
+        key = (product_id, variant_id)
+        merged[key] = merged.get(key, 0) + quantity
+    return merged
+
+
+def _lock_stock(product_ids, variant_ids):
+    """Lock product then variant rows in id order, returns ({id: product}, {id: variant})"""
+    products = {
+        product.id: product
+        for product in Product.objects.select_for_update().filter(id__in=product_ids).order_by('id')
+    }
+    variants = {
+        variant.id: variant
+        for variant in ProductVariant.objects.select_for_update().filter(id__in=variant_ids).order_by('id')
+    }
+    return products, variants
+
+
+def reserve_stock(order, lines, expires=True):
+    """
+    Take stock for an order and record the reservations.
+
+    lines is an iterable of (product_id, variant_id, quantity); variant_id is
+    None for simple products. Must run inside transaction.atomic(); raises
+    InsufficientStock, leaving the caller to roll back, if any line cannot be
+    covered. Returns the created reservations.
+    """
+    merged = _merge_lines(lines)
+    products, variants = _lock_stock(
+        {product_id for product_id, _ in merged},
+        {variant_id for _, variant_id in merged if variant_id},
+    )
+
+    expires_at = None
+    if expires:
+        expires_at = timezone.now() + timedelta(minutes=get_config()['TTL_MINUTES'])
+
+    reservations = []
+    # Decrement in the same (product, variant) order the rows were locked in
+    for (product_id, variant_id), quantity in sorted(merged.items(), key=lambda line: (line[0][0], line[0][1] or 0)):
+        if variant_id:
+            model, stock = ProductVariant, variants.get(variant_id)
+        else:
+            model, stock = Product, products.get(product_id)
+        if stock is None:
+            raise InsufficientStock(f'#{variant_id or product_id}', quantity, 0)
+        if not tracks_stock(stock):
+            continue
+
+        updated = model.objects.filter(pk=stock.pk, quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity
+        )
+        if not updated:
+            name = str(stock) if variant_id else stock.title
+            raise InsufficientStock(name, quantity, model.objects.filter(pk=stock.pk).values_list('quantity', flat=True).first() or 0)
+
+        reservations.append(StockReservation(
+            order=order,
+            product_id=product_id,
+            variant_id=variant_id,
+            quantity=quantity,
+            expires_at=expires_at,
+        ))
+
+    if reservations:
+        # Feeds show stock levels; the update() calls above send no save signals
+        transaction.on_commit(invalidate_feeds)
+    return StockReservation.objects.bulk_create(reservations)
+
+
+def _restock(reservations):
+    """Give reserved quantities back, in lock order"""
+    products = {}
+    variants = {}
+    for reservation in reservations:
+        if reservation.variant_id:
+            variants[reservation.variant_id] = variants.get(reservation.variant_id, 0) + reservation.quantity
+        else:
+            products[reservation.product_id] = products.get(reservation.product_id, 0) + reservation.quantity
+
+    _lock_stock(products.keys(), variants.keys())
+    for product_id in sorted(products):
+        Product.objects.filter(pk=product_id).update(quantity=F('quantity') + products[product_id])
+    for variant_id in sorted(variants):
+        ProductVariant.objects.filter(pk=variant_id).update(quantity=F('quantity') + variants[variant_id])
+    transaction.on_commit(invalidate_feeds)
+
+
+def commit_reservations(order):
+    """Mark an order's stock as sold so it never expires, returns the number committed"""
+    return StockReservation.objects.filter(order=order, status='active').update(
+        status='committed', expires_at=None
+    )
+
+
+def release_reservations(order):
+    """Return an order's reserved stock (e.g. on cancellation), returns the number released"""
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order=order, status__in=['active', 'committed'])
+            .order_by('id')
+        )
+        if not reservations:
+            return 0
+        _restock(reservations)
+        StockReservation.objects.filter(id__in=[r.id for r in reservations]).update(
+            status='released', released_at=timezone.now()
+        )
+    return len(reservations)
+
+
+def _reserve_released(order):
+    """Take the stock of a released order again, replacing its released reservations"""
+    released = list(
+        StockReservation.objects.select_for_update()
+        .filter(order=order, status='released')
+        .order_by('id')
+    )
+    if not released or StockReservation.objects.filter(order=order, status__in=['active', 'committed']).exists():
+        return
+    reserve_stock(order, [(r.product_id, r.variant_id, r.quantity) for r in released], expires=False)
+    StockReservation.objects.filter(id__in=[r.id for r in released]).delete()
+
+
+def sync_reservations(order):
+    """
+    Commit or release an order's reservations to match its status.
+
+    An order moved back into a committed status after its stock was released
+    (e.g. cancelled, then confirmed) takes the stock again under the row locks
+    of reserve_stock(); raises InsufficientStock, rolling the change back, if
+    it is gone.
+    """
+    if order.status in RELEASED_STATUSES:
+        return release_reservations(order)
+    if order.status in COMMITTED_STATUSES:
+        with transaction.atomic():
+            _reserve_released(order)
+            return commit_reservations(order)
+    return 0
+
+
+def release_expired_reservations(now=None, batch_size=None):
+    """
+    Cancel pending orders whose reservations expired unpaid and restock them.
+
+    Orders are processed in batches, one transaction each. Returns the number
+    of orders cancelled.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_config()['SWEEP_BATCH_SIZE']
+    cancelled = 0
+    while True:
+        with transaction.atomic():
+            order_ids = list(
+                StockReservation.objects.filter(status='active', expires_at__lte=now)
+                .order_by('order_id')
+                .values_list('order_id', flat=True)
+                .distinct()[:batch_size]
+            )
+            if not order_ids:
+                break
+
+            orders = Order.objects.select_for_update().filter(id__in=order_ids).select_related('payment').order_by('id')
+            for order in orders:
+                payment = getattr(order, 'payment', None)
+                if order.status != 'pending' or (payment and payment.status == 'completed'):
+                    # Paid or moved on meanwhile, the stock is sold
+                    commit_reservations(order)
+                    continue
+
+                release_reservations(order)
+                order._previous_status = order.status
+                order.status = 'cancelled'
+                order.save(update_fields=['status', 'updated_at'])
+                if payment and payment.status in ('pending', 'processing'):
+                    payment.status = 'cancelled'
+                    payment.save(update_fields=['status', 'updated_at'])
+                cancelled += 1
+    return cancelled
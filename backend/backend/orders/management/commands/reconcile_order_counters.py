@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from orders.order_stats import reconcile_order_counters
+
+class Command(BaseCommand):
+    help = 'Recompute order status counters from the orders table and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without correcting the counters',
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_order_counters(fix=not options['dry_run'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Order status counters are in sync'))
+            return
+        for status, (stored, actual) in sorted(drift.items()):
+            stored_display = 'missing' if stored is None else stored
+            self.stdout.write(self.style.WARNING(f'{status}: stored {stored_display}, actual {actual}'))
+        action = 'Reported' if options['dry_run'] else 'Corrected'
+        self.stdout.write(self.style.SUCCESS(f'{action} drift in {len(drift)} order status counters'))
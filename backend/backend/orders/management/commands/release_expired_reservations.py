@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from orders.inventory import release_expired_reservations
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid orders whose stock reservations expired and return their stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Number of orders released per transaction',
+        )
+
+    def handle(self, *args, **options):
+        cancelled = release_expired_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released stock for {cancelled} expired orders'))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.4 on 2026-10-16 22:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_keyset_pagination_indexes'),
+        ('orders', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(help_text='Quantity held')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('committed', 'Committed'), ('released', 'Released')], default='active', help_text='Current reservation status', max_length=20)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='When an active reservation is released (null = never)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, help_text='When the stock was returned', null=True)),
+                ('order', models.ForeignKey(help_text='Order holding this stock', on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='orders.order')),
+                ('product', models.ForeignKey(help_text='Product the stock was taken from', on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='products.product')),
+                ('variant', models.ForeignKey(blank=True, help_text='Variant the stock was taken from (if applicable)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='products.productvariant')),
+            ],
+            options={
+                'verbose_name': 'Stock Reservation',
+                'verbose_name_plural': 'Stock Reservations',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='orders_stoc_status_e8aa04_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.4 on 2026-10-16 23:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_order_status_counters(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderStatusCounter = apps.get_model('orders', 'OrderStatusCounter')
+    counts = dict(Order.objects.order_by().values_list('status').annotate(total=Count('id')))
+    statuses = ['pending', 'confirmed', 'processing', 'shipped', 'delivered', 'cancelled', 'refunded']
+    OrderStatusCounter.objects.bulk_create([
+        OrderStatusCounter(status=status, count=counts.get(status, 0)) for status in statuses
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded')], help_text='Order status counted', max_length=20, unique=True)),
+                ('count', models.IntegerField(default=0, help_text='Number of orders currently in this status')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Order Status Counter',
+                'verbose_name_plural': 'Order Status Counters',
+                'ordering': ['status'],
+            },
+        ),
+        migrations.RunPython(seed_order_status_counters, migrations.RunPython.noop),
+    ]
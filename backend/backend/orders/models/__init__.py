@@ -1,10 +1,12 @@
-from .orders import Address, Order, OrderItem
+from .orders import Address, Order, OrderItem, OrderStatusCounter, StockReservation
 from .payments import Payment, PaymentMethod
 
 __all__ = [
     'Address',
     'Order',
     'OrderItem', 
+    'OrderStatusCounter',
     'Payment',
     'PaymentMethod',
+    'StockReservation',
 ]
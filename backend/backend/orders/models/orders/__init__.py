@@ -1,9 +1,13 @@
 from .address import Address
 from .order import Order
 from .order_item import OrderItem
+from .order_status_counter import OrderStatusCounter
+from .stock_reservation import StockReservation
 
 __all__ = [
     'Address',
     'Order', 
     'OrderItem',
+    'OrderStatusCounter',
+    'StockReservation',
 ]
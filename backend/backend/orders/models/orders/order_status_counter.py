@@ -0,0 +1,31 @@
+from django.db import models
+from .order import Order
+
+class OrderStatusCounter(models.Model):
+    """
+    Number of orders in each status
+    Kept up to date by the order signals so dashboards read one small table
+    instead of counting the orders table
+    """
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        unique=True,
+        help_text="Order status counted"
+    )
+    
+    count = models.IntegerField(
+        default=0,
+        help_text="Number of orders currently in this status"
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Order Status Counter"
+        verbose_name_plural = "Order Status Counters"
+        ordering = ['status']
+    
+    def __str__(self):
+        return f"{self.status}: {self.count}"
@@ -0,0 +1,79 @@
+from django.db import models
+from products.models.products.product import Product
+from products.models.products.variant import ProductVariant
+from .order import Order
+
+class StockReservation(models.Model):
+    """
+    Stock held for an order
+    Quantity is taken from the product/variant at checkout and given back
+    if the order is cancelled or its payment never completes
+    """
+
+    # Reservation status choices
+    STATUS_CHOICES = [
+        ('active', 'Active'),        # held, waiting for payment
+        ('committed', 'Committed'),  # order paid or confirmed, stock is sold
+        ('released', 'Released'),    # returned to stock
+    ]
+
+    # Relationships
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        help_text="Order holding this stock"
+    )
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        help_text="Product the stock was taken from"
+    )
+
+    variant = models.ForeignKey(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        blank=True,
+        null=True,
+        help_text="Variant the stock was taken from (if applicable)"
+    )
+
+    quantity = models.PositiveIntegerField(
+        help_text="Quantity held"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='active',
+        help_text="Current reservation status"
+    )
+
+    expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When an active reservation is released (null = never)"
+    )
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the stock was returned"
+    )
+
+    class Meta:
+        verbose_name = "Stock Reservation"
+        verbose_name_plural = "Stock Reservations"
+        ordering = ['-created_at']
+        indexes = [
+            # Expiry sweep
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x product #{self.product_id} for order #{self.order_id} ({self.status})"
@@ -0,0 +1,116 @@
+"""
+Order Status Counters
+=====================
+
+Keeps OrderStatusCounter in step with the orders table.
+
+Every create, status change and delete is applied as a delta in a single
+UPDATE, so dashboard and WebSocket statistics are one read of a seven-row
+table instead of a COUNT(*) per status. reconcile_order_counters()
+recomputes the counters from the orders table and reports any drift (for
+example after bulk queryset updates, which bypass the signals).
+
+Every order transaction writes to the same few counter rows, so holding
+their locks until the order commits would queue concurrent checkouts and
+status updates behind each other (and could deadlock two bulk updates).
+The changes of a transaction are therefore summed and applied after it
+commits, in one short UPDATE of their own. A process that dies in between
+leaves drift for reconcile_order_counters() to repair.
+"""
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, When
+
+from orders.models import Order, OrderStatusCounter
+from Main_Application.commit_hooks import CommitHook, on_commit_once
+
+STATUSES = [choice[0] for choice in Order.STATUS_CHOICES]
+
+
+class _CounterChanges(CommitHook):
+    """Status counter deltas of one transaction, applied once it commits"""
+
+    def __init__(self):
+        self.deltas = {}
+
+    def add(self, deltas):
+        for status, delta in deltas.items():
+            self.deltas[status] = self.deltas.get(status, 0) + delta
+
+    def run(self):
+        _apply_deltas(self.deltas)
+
+
+def apply_status_change(old_status, new_status):
+    """Move one order between status counters (None for creation / deletion) once the transaction commits"""
+    if old_status == new_status:
+        return
+    deltas = {}
+    if old_status in STATUSES:
+        deltas[old_status] = -1
+    if new_status in STATUSES:
+        deltas[new_status] = 1
+    changes = on_commit_once('order_status_counters', _CounterChanges)
+    if changes is None:
+        _apply_deltas(deltas)
+    else:
+        changes.add(deltas)
+
+
+def _apply_deltas(deltas):
+    """Add deltas to the status counters in one UPDATE"""
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = OrderStatusCounter.objects.filter(status__in=deltas).update(
+        count=F('count') + Case(
+            *[When(status=status, then=delta) for status, delta in deltas.items()],
+            default=0,
+            output_field=IntegerField(),
+        )
+    )
+    if updated < len(deltas):
+        # A counter row is missing; the order row is already written, so a
+        # recount includes this change
+        reconcile_order_counters()
+
+
+def get_order_stats():
+    """Get order counts per status plus the total, in one query"""
+    counts = dict(OrderStatusCounter.objects.values_list('status', 'count'))
+    stats = {'total_orders': sum(counts.get(status, 0) for status in STATUSES)}
+    for status in STATUSES:
+        stats[f'{status}_orders'] = counts.get(status, 0)
+    return stats
+
+
+def count_orders_by_status():
+    """Count orders per status from the orders table (one grouped query)"""
+    counts = dict(Order.objects.order_by().values_list('status').annotate(total=Count('id')))
+    return {status: counts.get(status, 0) for status in STATUSES}
+
+
+def reconcile_order_counters(fix=True):
+    """
+    Recompute the counters from the orders table.
+
+    Returns {status: (stored, actual)} for every counter that had drifted
+    (or was missing); the counters are corrected unless fix is False.
+    """
+    with transaction.atomic():
+        stored = {
+            counter.status: counter.count
+            for counter in OrderStatusCounter.objects.select_for_update()
+        }
+        actual = count_orders_by_status()
+        drift = {
+            status: (stored.get(status), count)
+            for status, count in actual.items()
+            if stored.get(status) != count
+        }
+        if fix and drift:
+            counters = [OrderStatusCounter(status=status, count=actual[status]) for status in drift]
+            OrderStatusCounter.objects.bulk_create(
+                counters, update_conflicts=True, unique_fields=['status'], update_fields=['count', 'updated_at']
+            )
+    return drift
@@ -11,6 +11,7 @@ from django.template.loader import render_to_string
 from django.core.mail import send_mail
 from django.utils import timezone
 from settings.email_model import EmailSettings
+from settings.email_outbox import enqueue_email, send_message
 from settings.models import Logo
 from settings.footer_settings_model import FooterSettings
 from .invoice_generator import InvoiceGenerator
@@ -81,6 +82,61 @@ class InvoiceEmailService:
             logger.error(f"Error generating invoice HTML: {str(e)}")
             return "<p>Invoice details could not be generated.</p>"
     
+    @staticmethod
+    def get_customer_context(order):
+        """Get the order fields shared by every order email"""
+        return {
+            'order_number': order.order_number,
+            'customer_name': order.user.profile.full_name if hasattr(order.user, 'profile') and order.user.profile.full_name else order.user.email,
+            'order_date': order.created_at.strftime('%B %d, %Y'),
+            'order_status': order.get_status_display(),
+            'total_amount': order.total_amount,
+            'delivery_address': f"{order.delivery_address.address_line_1}, {order.delivery_address.city}, {order.delivery_address.country}" if order.delivery_address else "N/A",
+        }
+    
+    @staticmethod
+    def render_order_confirmation_email(order):
+        """Render order confirmation email, returns (subject, html)"""
+        context = {
+            **InvoiceEmailService.get_customer_context(order),
+            'invoice_html': InvoiceEmailService.generate_invoice_html(order),
+            **InvoiceEmailService.get_company_info()
+        }
+        email_html = render_to_string('orders/order_confirmation.html', context)
+        return f"Order Confirmation - {order.order_number}", email_html
+    
+    @staticmethod
+    def render_order_delivered_email(order):
+        """Render order delivered email, returns (subject, html)"""
+        context = {
+            **InvoiceEmailService.get_customer_context(order),
+            'delivery_date': order.delivered_at.strftime('%B %d, %Y') if order.delivered_at else timezone.now().strftime('%B %d, %Y'),
+            'invoice_html': InvoiceEmailService.generate_invoice_html(order),
+            **InvoiceEmailService.get_company_info()
+        }
+        email_html = render_to_string('orders/order_delivered.html', context)
+        return f"Order Delivered - {order.order_number}", email_html
+    
+    @staticmethod
+    def queue_order_confirmation_email(order):
+        """Queue order confirmation email, rendered and sent by the email worker"""
+        return enqueue_email(
+            to_email=order.user.email,
+            renderer='orders.send_invoice_to_email.email_service.render_order_confirmation_outbox',
+            user=order.user,
+            order=order,
+        )
+    
+    @staticmethod
+    def queue_order_delivered_email(order):
+        """Queue order delivered email, rendered and sent by the email worker"""
+        return enqueue_email(
+            to_email=order.user.email,
+            renderer='orders.send_invoice_to_email.email_service.render_order_delivered_outbox',
+            user=order.user,
+            order=order,
+        )
+    
     @staticmethod
     def send_order_confirmation_email(order):
         """Send order confirmation email with invoice"""
@@ -93,35 +149,13 @@ class InvoiceEmailService:
                 logger.error("No email settings found")
                 return False
             
-            # Get company info
-            company_info = InvoiceEmailService.get_company_info()
-            
-            # Generate invoice HTML
-            invoice_html = InvoiceEmailService.generate_invoice_html(order)
-            
-            # Prepare email context
-            context = {
-                'order_number': order.order_number,
-                'customer_name': order.user.profile.full_name if hasattr(order.user, 'profile') and order.user.profile.full_name else order.user.email,
-                'order_date': order.created_at.strftime('%B %d, %Y'),
-                'order_status': order.get_status_display(),
-                'total_amount': order.total_amount,
-                'delivery_address': f"{order.delivery_address.address_line_1}, {order.delivery_address.city}, {order.delivery_address.country}" if order.delivery_address else "N/A",
-                'invoice_html': invoice_html,
-                **company_info
-            }
-            
-            # Render email template
-            email_html = render_to_string(
-                'orders/order_confirmation.html',
-                context
-            )
+            subject, email_html = InvoiceEmailService.render_order_confirmation_email(order)
             
             # Send email
             success = InvoiceEmailService._send_smtp_email(
                 email_settings=email_settings,
                 to_email=order.user.email,
-                subject=f"Order Confirmation - {order.order_number}",
+                subject=subject,
                 html_content=email_html
             )
             
@@ -148,36 +182,13 @@ class InvoiceEmailService:
                 logger.error("No email settings found")
                 return False
             
-            # Get company info
-            company_info = InvoiceEmailService.get_company_info()
-            
-            # Generate invoice HTML
-            invoice_html = InvoiceEmailService.generate_invoice_html(order)
-            
-            # Prepare email context
-            context = {
-                'order_number': order.order_number,
-                'customer_name': order.user.profile.full_name if hasattr(order.user, 'profile') and order.user.profile.full_name else order.user.email,
-                'order_date': order.created_at.strftime('%B %d, %Y'),
-                'delivery_date': order.delivered_at.strftime('%B %d, %Y') if order.delivered_at else timezone.now().strftime('%B %d, %Y'),
-                'order_status': order.get_status_display(),
-                'total_amount': order.total_amount,
-                'delivery_address': f"{order.delivery_address.address_line_1}, {order.delivery_address.city}, {order.delivery_address.country}" if order.delivery_address else "N/A",
-                'invoice_html': invoice_html,
-                **company_info
-            }
-            
-            # Render email template
-            email_html = render_to_string(
-                'orders/order_delivered.html',
-                context
-            )
+            subject, email_html = InvoiceEmailService.render_order_delivered_email(order)
             
             # Send email
             success = InvoiceEmailService._send_smtp_email(
                 email_settings=email_settings,
                 to_email=order.user.email,
-                subject=f"Order Delivered - {order.order_number}",
+                subject=subject,
                 html_content=email_html
             )
             
@@ -194,46 +205,21 @@ class InvoiceEmailService:
     
     @staticmethod
     def _send_smtp_email(email_settings, to_email, subject, html_content):
-        """Send email using SMTP settings"""
+        """Send email over a pooled SMTP connection for the settings profile"""
         try:
-            import smtplib
-            import ssl
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
-            
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{email_settings.from_name} <{email_settings.from_email}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg['Reply-To'] = email_settings.from_email
-            
-            # Add HTML content
-            html_part = MIMEText(html_content, 'html', 'utf-8')
-            msg.attach(html_part)
-            
-            # SMTP configuration
-            smtp_server = email_settings.smtp_host
-            smtp_port = email_settings.smtp_port
-            smtp_username = email_settings.smtp_username
-            smtp_password = email_settings.email_password
-            
-            # Create SMTP connection
-            if email_settings.use_ssl:
-                context = ssl.create_default_context()
-                server = smtplib.SMTP_SSL(smtp_server, smtp_port, context=context)
-            else:
-                server = smtplib.SMTP(smtp_server, smtp_port)
-                if email_settings.use_tls:
-                    server.starttls()
-            
-            # Login and send email
-            server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-            server.quit()
-            
+            send_message(email_settings, to_email, subject, html_content)
             return True
             
         except Exception as e:
             logger.error(f"SMTP email sending failed: {str(e)}")
             return False
+
+
+def render_order_confirmation_outbox(outbox):
+    """Outbox renderer for order confirmation emails"""
+    return InvoiceEmailService.render_order_confirmation_email(outbox.order)
+
+
+def render_order_delivered_outbox(outbox):
+    """Outbox renderer for order delivered emails"""
+    return InvoiceEmailService.render_order_delivered_email(outbox.order)
@@ -0,0 +1,9 @@
+"""
+Orders Signals Package
+"""
+
+# Import signal handlers to ensure they are registered
+from .order_snapshot_signals import order_snapshot
+# Counters before broadcasts: their commit hook must run before the stats message is built
+from .order_stats_signals import order_saved, order_deleted
+from .order_broadcast_signals import order_created_or_updated, order_removed
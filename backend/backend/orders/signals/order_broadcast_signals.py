@@ -0,0 +1,69 @@
+"""
+Order Broadcast Signal Handlers
+Announces order changes to the admin orders WebSocket group after commit
+(see Main_Application/broadcasts.py); stats are coalesced into one message
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from orders.models import Order
+from orders.order_stats import get_order_stats
+from Main_Application.broadcasts import broadcast, broadcast_latest
+
+ADMIN_ORDERS_GROUP = 'admin_orders'
+
+
+def order_data(order):
+    """Order fields shown in the admin orders list"""
+    user_name = order.user.email
+    try:
+        if hasattr(order.user, 'profile') and order.user.profile.full_name:
+            user_name = order.user.profile.full_name
+    except Exception:
+        pass
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'user_email': order.user.email,
+        'user_name': user_name,
+        'total_amount': float(order.total_amount),
+        'status': order.status,
+        'created_at': order.created_at.isoformat(),
+        'updated_at': order.updated_at.isoformat(),
+        'delivery_address': {
+            'address_line_1': order.delivery_address.address_line_1,
+            'city': order.delivery_address.city,
+            'postal_code': order.delivery_address.postal_code,
+        } if order.delivery_address else None
+    }
+
+
+def order_stats_event():
+    return {'type': 'order_stats', 'stats': get_order_stats()}
+
+
+@receiver(post_save, sender=Order)
+def order_created_or_updated(sender, instance, created, raw=False, **kwargs):
+    """Queue the order event and a coalesced stats message"""
+    if raw:
+        return
+    data = order_data(instance)
+    if created:
+        broadcast(ADMIN_ORDERS_GROUP, {'type': 'new_order', 'order': data})
+    else:
+        broadcast(ADMIN_ORDERS_GROUP, {'type': 'order_updated', 'order': data})
+        # Stored row before this save, read by order_snapshot (order_snapshot_signals)
+        stored = getattr(instance, '_stored_order', None)
+        previous_status = stored['status'] if stored else None
+        if stored and previous_status != instance.status:
+            broadcast(ADMIN_ORDERS_GROUP, {
+                'type': 'order_status_changed',
+                'order': {**data, 'previous_status': previous_status},
+            })
+    broadcast_latest(ADMIN_ORDERS_GROUP, 'order_stats', order_stats_event)
+
+
+@receiver(post_delete, sender=Order)
+def order_removed(sender, instance, **kwargs):
+    """Queue a coalesced stats message for a deleted order"""
+    broadcast_latest(ADMIN_ORDERS_GROUP, 'order_stats', order_stats_event)
@@ -0,0 +1,32 @@
+"""
+Order Snapshot Signal Handler
+Reads the stored order row once before a save, for every post_save handler
+that compares against it (status counters, sales rollups, broadcasts)
+"""
+
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from orders.models import Order
+
+# Stored fields the post_save handlers compare against
+SNAPSHOT_FIELDS = ('status', 'total_amount', 'created_at')
+# A save that writes none of these changes nothing the handlers track
+TRACKED_FIELDS = ('status', 'total_amount')
+
+
+@receiver(pre_save, sender=Order)
+def order_snapshot(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Remember the stored row on instance._stored_order (None for new orders)
+
+    Saves whose update_fields leave out the tracked fields skip the SELECT and
+    set instance._tracked_unchanged instead.
+    """
+    instance._stored_order = None
+    instance._tracked_unchanged = False
+    if raw or instance._state.adding or not instance.pk:
+        return
+    if update_fields is not None and not set(TRACKED_FIELDS) & set(update_fields):
+        instance._tracked_unchanged = True
+        return
+    instance._stored_order = Order.objects.filter(pk=instance.pk).values(*SNAPSHOT_FIELDS).first()
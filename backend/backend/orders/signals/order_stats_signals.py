@@ -0,0 +1,25 @@
+"""
+Order Status Counter Signal Handlers
+Keeps OrderStatusCounter in sync with Order create, status change and delete
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from orders.models import Order
+from orders.order_stats import apply_status_change
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, raw=False, **kwargs):
+    """Apply the counter change of a created order or a status change"""
+    if raw or getattr(instance, '_tracked_unchanged', False):
+        return
+    # Stored row before this save, read by order_snapshot (order_snapshot_signals)
+    stored = getattr(instance, '_stored_order', None)
+    apply_status_change(stored['status'] if stored else None, instance.status)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    """Remove a deleted order from the counters"""
+    apply_status_change(instance.status, None)
@@ -1,3 +1,372 @@
-from django.test import TestCase
+import asyncio
+import random
+import threading
+import time
+from io import StringIO
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from Main_Application import broadcasts
+from cart.models import Cart, CartItem
+from orders.inventory import InsufficientStock, release_expired_reservations, reserve_stock
+from orders.models import Address, Order, OrderItem, OrderStatusCounter, Payment, PaymentMethod, StockReservation
+from orders.order_stats import get_order_stats, reconcile_order_counters
+from orders.signals import order_broadcast_signals
+from products.models import Product, ProductVariant
+from settings import email_outbox
+from settings.email_model import EmailOutbox
+
+
+def create_customer(email='buyer@example.com'):
+    user = User.objects.create_user(email=email, password='pass12345')
+    address = Address.objects.create(
+        user=user, full_name='Buyer', phone_number='01700000000', city='Dhaka',
+        address_line_1='Road 1', postal_code='1200', country='Bangladesh',
+    )
+    return user, address
+
+
+def create_order_for(user, address):
+    return Order.objects.create(
+        user=user, delivery_address=address, subtotal=Decimal('10.00'), total_amount=Decimal('10.00')
+    )
+
+
+class CheckoutReservationTests(TestCase):
+    """Stock is taken at checkout and given back on cancellation or expiry"""
+
+    def setUp(self):
+        self.user, self.address = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        PaymentMethod.objects.create(name='Cash on Delivery', method_type='cash_on_delivery', is_cod=True)
+        PaymentMethod.objects.create(name='bKash', method_type='bkash')
+        self.simple = Product.objects.create(title='Mug', slug='mug', status='active', price=Decimal('5.00'), quantity=3)
+        self.variable = Product.objects.create(
+            title='Shirt', slug='shirt', status='active', product_type='variable', price=Decimal('20.00')
+        )
+        self.variant = ProductVariant.objects.create(
+            product=self.variable, title='Large', sku='SHIRT-L', price=Decimal('20.00'), quantity=2
+        )
+
+    def checkout(self, mug=2, shirt=1, payment_method='cash_on_delivery'):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.simple, quantity=mug, unit_price=self.simple.price)
+        CartItem.objects.create(
+            cart=cart, product=self.variable, variant=self.variant, quantity=shirt, unit_price=self.variant.price
+        )
+        cart.calculate_totals()
+        return self.client.post(
+            reverse('create_order'),
+            {'address_id': self.address.id, 'payment_method': payment_method},
+            format='json',
+        )
+
+    def stock(self):
+        self.simple.refresh_from_db()
+        self.variant.refresh_from_db()
+        return self.simple.quantity, self.variant.quantity
+
+    def test_checkout_takes_stock_and_records_reservations(self):
+        response = self.checkout(payment_method='bkash')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.stock(), (1, 1))
+        order = Order.objects.get()
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 2)
+        self.assertEqual(order.items.get(variant=self.variant).total_price, Decimal('20.00'))
+        reservations = StockReservation.objects.filter(order=order, status='active')
+        self.assertEqual(reservations.count(), 2)
+        self.assertTrue(all(r.expires_at for r in reservations))
+
+    def test_checkout_queues_confirmation_email(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        outbox = EmailOutbox.objects.get()
+        self.assertEqual((outbox.to_email, outbox.status, outbox.order_id), (self.user.email, 'queued', Order.objects.get().id))
+        self.assertTrue(outbox.renderer.endswith('render_order_confirmation_outbox'))
+        # One email dispatch; the other callbacks are the order broadcasts
+        self.assertEqual(callbacks.count(email_outbox.dispatch), 1)
+
+    def test_short_stock_rolls_back_the_whole_checkout(self):
+        response = self.checkout(mug=1, shirt=3)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.stock(), (3, 2))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertTrue(CartItem.objects.filter(cart__user=self.user).exists())
+
+    def test_cancelling_returns_stock(self):
+        self.checkout()
+        order = Order.objects.get()
+        self.assertIsNone(order.stock_reservations.first().expires_at)
+
+        response = self.client.patch(reverse('cancel_order', args=[order.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stock(), (3, 2))
+        self.assertFalse(order.stock_reservations.exclude(status='released').exists())
+
+    def test_refunds_return_stock_and_reconfirming_takes_it_again(self):
+        self.checkout()
+        order = Order.objects.get()
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_user(email='staff@example.com', password='pass12345', is_staff=True))
+        url = reverse('update_order_status', args=[order.id])
+
+        self.assertEqual(admin.patch(url, {'status': 'refunded'}, format='json').status_code, 200)
+        self.assertEqual(self.stock(), (3, 2))
+
+        self.assertEqual(admin.patch(url, {'status': 'confirmed'}, format='json').status_code, 200)
+        self.assertEqual(self.stock(), (1, 1))
+        self.assertEqual(list(order.stock_reservations.values_list('status', flat=True)), ['committed', 'committed'])
+
+        admin.patch(url, {'status': 'cancelled'}, format='json')
+        Product.objects.filter(pk=self.simple.pk).update(quantity=1)
+        response = admin.patch(url, {'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertEqual(self.stock(), (1, 2))
+
+    @override_settings(EMAIL_OUTBOX={'DISPATCH_ON_COMMIT': False}, BROADCASTS={'WORKER': False}, INVOICE_PDF={'RENDER_ON_COMMIT': False})
+    def test_stock_changes_invalidate_cached_feeds_after_commit(self):
+        with mock.patch('orders.inventory.invalidate_feeds') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.checkout()
+                invalidate.assert_not_called()
+            self.assertEqual(invalidate.call_count, 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(reverse('cancel_order', args=[Order.objects.get().id]))
+            self.assertEqual(invalidate.call_count, 2)
+
+    def test_expired_unpaid_orders_are_cancelled_and_restocked(self):
+        self.checkout(payment_method='bkash')
+        expired = Order.objects.get()
+        self.checkout(mug=1, shirt=1, payment_method='bkash')
+        paid = Order.objects.exclude(id=expired.id).get()
+        Payment.objects.filter(order=paid).update(status='completed')
+        self.assertEqual(self.stock(), (0, 0))
+
+        cancelled = release_expired_reservations(now=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(cancelled, 1)
+        self.assertEqual(self.stock(), (2, 1))
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'cancelled')
+        self.assertEqual(expired.payment.status, 'cancelled')
+        self.assertEqual(set(paid.stock_reservations.values_list('status', flat=True)), {'committed'})
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(hours=1)), 0)
+
+
+class OrderStatusCounterTests(TestCase):
+    """Status counters follow order creation, transitions and deletion"""
+
+    def setUp(self):
+        self.user, self.address = create_customer()
+
+    def test_counters_follow_status_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            orders = [create_order_for(self.user, self.address) for _ in range(3)]
+            orders[0].status = 'confirmed'
+            orders[0].save()
+            orders[1].status = 'cancelled'
+            orders[1].save(update_fields=['status'])
+            orders[1].notes = 'Called the customer'
+            orders[1].save(update_fields=['notes'])
+            orders[2].delete()
+            # Counters are written once, after commit
+            self.assertEqual(get_order_stats()['total_orders'], 0)
+
+        with self.assertNumQueries(1):
+            stats = get_order_stats()
+        self.assertEqual(stats['total_orders'], 2)
+        self.assertEqual(stats['pending_orders'], 0)
+        self.assertEqual(stats['confirmed_orders'], 1)
+        self.assertEqual(stats['cancelled_orders'], 1)
+        self.assertEqual(reconcile_order_counters(), {})
+
+    def test_status_change_reads_the_stored_order_once(self):
+        order = create_order_for(self.user, self.address)
+        order.status = 'confirmed'
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        stored_reads = [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "orders_order" WHERE "orders_order"."id"' in query['sql']
+        ]
+        self.assertEqual(len(stored_reads), 1)
+
+    def test_rolled_back_changes_are_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    create_order_for(self.user, self.address)
+                    raise ValueError
+            except ValueError:
+                pass
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order_for(self.user, self.address)
+        self.assertEqual(get_order_stats()['total_orders'], 1)
+
+    def test_statistics_endpoint_reads_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order_for(self.user, self.address)
+        admin = User.objects.create_user(email='staff@example.com', password='pass12345', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.get(reverse('order_statistics'))
+
+        self.assertEqual(response.data['statistics']['pending_orders'], 1)
+        self.assertEqual(response.data['statistics']['total_orders'], 1)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order_for(self.user, self.address)
+        # Bulk updates bypass the signals
+        Order.objects.update(status='shipped')
+        OrderStatusCounter.objects.filter(status='refunded').delete()
+
+        out = StringIO()
+        call_command('reconcile_order_counters', '--dry-run', stdout=out)
+        self.assertIn('pending: stored 1, actual 0', out.getvalue())
+        self.assertEqual(get_order_stats()['shipped_orders'], 0)
+
+        call_command('reconcile_order_counters', stdout=StringIO())
+        self.assertEqual(reconcile_order_counters(), {})
+        self.assertEqual(get_order_stats()['shipped_orders'], 1)
+        self.assertTrue(OrderStatusCounter.objects.filter(status='refunded', count=0).exists())
+
+
+@override_settings(BROADCASTS={'WORKER': False, 'COALESCE_WINDOW': 0}, INVOICE_PDF={'RENDER_ON_COMMIT': False})
+class OrderBroadcastTests(TestCase):
+    """Order changes reach the admin group after commit, with one coalesced stats message"""
+
+    def setUp(self):
+        self.user, self.address = create_customer()
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)('admin_orders', self.channel)
+        broadcasts.queue.take()
+
+    def tearDown(self):
+        async_to_sync(self.channel_layer.group_discard)('admin_orders', self.channel)
+
+    def received(self):
+        async def drain():
+            messages = []
+            while True:
+                try:
+                    messages.append(await asyncio.wait_for(self.channel_layer.receive(self.channel), 0.05))
+                except asyncio.TimeoutError:
+                    return messages
+        return async_to_sync(drain)()
+
+    def test_bulk_status_update_sends_one_stats_message_after_commit(self):
+        with mock.patch.object(
+            order_broadcast_signals, 'get_order_stats', wraps=get_order_stats
+        ) as stats, self.captureOnCommitCallbacks(execute=True):
+            orders = [create_order_for(self.user, self.address) for _ in range(3)]
+            for order in orders:
+                order.status = 'confirmed'
+                order.save()
+            # Nothing is sent before the transaction commits
+            self.assertEqual(broadcasts.queue.events, [])
+        self.assertEqual(stats.call_count, 1)
+        # ...nor from the request thread
+        self.assertEqual(self.received(), [])
+
+        broadcasts.flush()
+        messages = self.received()
+        self.assertEqual(
+            [message['type'] for message in messages],
+            ['new_order'] * 3 + ['order_updated', 'order_status_changed'] * 3 + ['order_stats'],
+        )
+        self.assertEqual(messages[4]['order']['previous_status'], 'pending')
+        self.assertEqual(messages[-1]['stats']['confirmed_orders'], 3)
+
+    @override_settings(BROADCASTS={'WORKER': True})
+    def test_in_memory_layer_is_sent_from_the_committing_thread(self):
+        # The worker's own loop must not touch the in-memory layer's queues
+        with mock.patch.object(broadcasts.queue, 'start') as start, self.captureOnCommitCallbacks(execute=True):
+            create_order_for(self.user, self.address)
+        start.assert_not_called()
+        self.assertEqual(broadcasts.queue.take(), [])
+        self.assertEqual([message['type'] for message in self.received()], ['new_order', 'order_stats'])
+
+    def test_rolled_back_changes_are_not_sent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    create_order_for(self.user, self.address)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(broadcasts.queue.take(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order_for(self.user, self.address)
+        self.assertEqual([event['type'] for _, event in broadcasts.queue.take()], ['new_order', 'order_stats'])
+
+
+class ReservationConcurrencyTests(TransactionTestCase):
+    """Many parallel checkouts against limited stock never oversell"""
+
+    CHECKOUTS = 12
+    STOCK = 5
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        user, address = create_customer()
+        product = Product.objects.create(title='Lamp', slug='lamp', status='active', price=Decimal('9.00'), quantity=self.STOCK)
+        orders = [create_order_for(user, address) for _ in range(self.CHECKOUTS)]
+        barrier = threading.Barrier(self.CHECKOUTS)
+        outcomes = []
+
+        def checkout(order):
+            try:
+                barrier.wait()
+                for _ in range(200):
+                    try:
+                        with transaction.atomic():
+                            reserve_stock(order, [(product.id, None, 1)])
+                        outcomes.append('reserved')
+                        return
+                    except InsufficientStock:
+                        outcomes.append('sold_out')
+                        return
+                    except OperationalError:
+                        # SQLite reports lock contention instead of blocking, retry like a client would
+                        time.sleep(random.uniform(0.001, 0.01))
+                outcomes.append('gave_up')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        reserved = StockReservation.objects.filter(product=product).count()
+        self.assertEqual(outcomes.count('reserved'), reserved)
+        self.assertEqual(reserved, self.STOCK)
+        self.assertEqual(outcomes.count('sold_out'), self.CHECKOUTS - self.STOCK)
+        self.assertEqual(product.quantity, 0)
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Q
 from ...models.orders.order import Order
+from ...order_stats import get_order_stats
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -18,8 +19,8 @@ def get_pending_orders_count(request):
                 'error': 'Access denied. Admin privileges required.'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Count pending orders
-        pending_count = Order.objects.filter(status='pending').count()
+        # Read pending count from the status counters
+        pending_count = get_order_stats()['pending_orders']
         
         return Response({
             'pending_count': pending_count,
@@ -45,17 +46,8 @@ def get_order_statistics(request):
                 'error': 'Access denied. Admin privileges required.'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Get order statistics
-        stats = {
-            'total_orders': Order.objects.count(),
-            'pending_orders': Order.objects.filter(status='pending').count(),
-            'confirmed_orders': Order.objects.filter(status='confirmed').count(),
-            'processing_orders': Order.objects.filter(status='processing').count(),
-            'shipped_orders': Order.objects.filter(status='shipped').count(),
-            'delivered_orders': Order.objects.filter(status='delivered').count(),
-            'cancelled_orders': Order.objects.filter(status='cancelled').count(),
-            'refunded_orders': Order.objects.filter(status='refunded').count(),
-        }
+        # Get order statistics from the status counters
+        stats = get_order_stats()
         
         return Response({
             'statistics': stats,
@@ -5,11 +5,28 @@ from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 
+from Main_Application.keyset_pagination import KeysetPagination
+
 class OrderPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 50
 
+class OrderCursorPagination(KeysetPagination):
+    """
+    Keyset pagination for order history, enabled by passing ?cursor=
+    (empty for the first page); without it the list is returned as before
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+class PagedOrderCursorPagination(OrderCursorPagination):
+    """
+    Keyset pagination with page-number pagination as the default mode
+    """
+    fallback_class = OrderPagination
+
 from orders.models.orders.order import Order
 from orders.models.orders.order_item import OrderItem
 from orders.models.orders.address import Address
@@ -18,6 +35,8 @@ from orders.models.payments.payment_method import PaymentMethod
 from orders.serializers.orders.order_serializer import OrderSerializer, OrderCreateSerializer
 from orders.serializers.orders.address_serializer import AddressCreateSerializer
 from cart.models.cart import Cart, CartItem
+from analytics.rollups import add_order_items
+from orders.inventory import InsufficientStock, release_reservations, reserve_stock, sync_reservations
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -39,7 +58,7 @@ def create_order(request):
                         'message': 'No cart found for user'
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
-                cart_items = CartItem.objects.filter(cart=cart)
+                cart_items = CartItem.objects.filter(cart=cart).select_related('product', 'variant')
 
                 # Clean up any duplicate carts (keep only the most recent one)
                 duplicate_carts = Cart.objects.filter(user=request.user).exclude(id=cart.id)
@@ -145,20 +164,36 @@ def create_order(request):
             
             order = order_serializer.save()
 
+            # Take stock for every item, the whole order is rolled back if any line is short
+            try:
+                reserve_stock(
+                    order,
+                    [(item.product_id, item.variant_id, item.quantity) for item in cart_items],
+                    expires=not payment_method.is_cod,
+                )
+            except InsufficientStock as e:
+                transaction.set_rollback(True)
+                return Response({
+                    'success': False,
+                    'message': str(e)
+                }, status=status.HTTP_409_CONFLICT)
+
             # Create order items from cart items
-            for cart_item in cart_items:
-                
-                order_item = OrderItem.objects.create(
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
                     product=cart_item.product,
                     variant=cart_item.variant,
                     quantity=cart_item.quantity,
                     unit_price=cart_item.unit_price,
-                    total_price=cart_item.get_total_price(),  # Use method instead of attribute
+                    total_price=cart_item.get_total_price(),
                     product_name=cart_item.product.title,
-                    product_sku=getattr(cart_item.product, 'sku', None),  # Handle missing sku field
+                    product_sku=getattr(cart_item.product, 'sku', None),
                     variant_title=str(cart_item.variant) if cart_item.variant else None
                 )
+                for cart_item in cart_items
+            ])
+            add_order_items(order, sum(cart_item.quantity for cart_item in cart_items))
 
             # Create payment
             payment = Payment.objects.create(
@@ -175,14 +210,11 @@ def create_order(request):
             cart_id = cart.id
             cart.delete()
 
-            # Send order confirmation email with invoice
+            # Queue order confirmation email with invoice, sent once the order commits
             try:
                 from orders.send_invoice_to_email.email_service import InvoiceEmailService
-                email_sent = InvoiceEmailService.send_order_confirmation_email(order)
-                if email_sent:
-                    pass
-                else:
-                    pass
+                with transaction.atomic():
+                    InvoiceEmailService.queue_order_confirmation_email(order)
             except Exception as e:
                 pass
             
@@ -210,6 +242,8 @@ class OrderListView(generics.ListAPIView):
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         # Check if specific user ID is requested (for admin viewing user orders)
@@ -259,7 +293,8 @@ class DeliveredOrderListView(generics.ListAPIView):
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = OrderPagination
+    pagination_class = PagedOrderCursorPagination
+    cursor_ordering = '-delivered_at'
     
     def get_queryset(self):
         return Order.objects.filter(
@@ -273,7 +308,8 @@ class CancelledRefundedOrderListView(generics.ListAPIView):
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = OrderPagination
+    pagination_class = PagedOrderCursorPagination
+    cursor_ordering = '-updated_at'
     
     def get_queryset(self):
         return Order.objects.filter(
@@ -326,17 +362,23 @@ def update_order_status(request, order_id):
         
         # Set previous status for signal tracking
         order._previous_status = previous_status
-        order.save()
+        try:
+            with transaction.atomic():
+                order.save()
+                
+                # Commit or return reserved stock for the new status
+                sync_reservations(order)
+        except InsufficientStock as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_409_CONFLICT)
         
-        # Send order delivered email with invoice if status is delivered
+        # Queue order delivered email with invoice if status is delivered
         if new_status == 'delivered':
             try:
                 from orders.send_invoice_to_email.email_service import InvoiceEmailService
-                email_sent = InvoiceEmailService.send_order_delivered_email(order)
-                if email_sent:
-                    pass
-                else:
-                    pass
+                InvoiceEmailService.queue_order_delivered_email(order)
             except Exception as e:
                 pass
         
@@ -384,6 +426,9 @@ def cancel_order(request, order_id):
         order._previous_status = previous_status
         order.save()
         
+        # Put the reserved stock back on sale
+        release_reservations(order)
+        
         # You can also store the cancel reason in a separate model if needed
         # For now, we'll just update the status
         
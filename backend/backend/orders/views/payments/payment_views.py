@@ -6,6 +6,7 @@ from django.shortcuts import get_object_or_404
 from orders.models.payments.payment import Payment
 from orders.models.payments.payment_method import PaymentMethod
 from orders.serializers.payments.payment_serializer import PaymentSerializer, PaymentMethodSerializer
+from orders.inventory import commit_reservations
 
 class PaymentMethodListView(generics.ListAPIView):
     """
@@ -47,6 +48,7 @@ def mark_cod_collected(request, payment_id):
         # Update order status to confirmed
         payment.order.status = 'confirmed'
         payment.order.save()
+        commit_reservations(payment.order)
         
         serializer = PaymentSerializer(payment, context={'request': request})
         
@@ -0,0 +1,150 @@
+"""
+Product Feed Cache
+==================
+
+Caches the homepage feed and the first pages of the home pagination API in
+the Django cache configured by settings.PRODUCT_FEED_CACHE.
+
+- Keys carry a generation number; invalidate() bumps it, so every cached
+  feed is dropped in O(1) when a product, variant, image or review changes.
+- Entries have a soft expiry. After it passes, one worker takes a short lock
+  and rebuilds while the others keep serving the stale copy; when an entry is
+  missing, the others wait for the lock holder instead of rebuilding too,
+  for at most WAIT_TIMEOUT, then build it themselves rather than park a
+  request thread for the whole lock lifetime.
+- Hit/miss counters live in the cache so they are shared by all workers.
+"""
+
+import hashlib
+import json
+import time
+import uuid
+
+from django.core.cache import caches
+
+from Main_Application.conf import get_settings
+
+KEY_PREFIX = 'product_feed'
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,        # seconds an entry is fresh
+    'STALE_GRACE': 60,     # seconds a stale entry may still be served while rebuilding
+    'LOCK_TIMEOUT': 10,    # seconds a rebuild lock is held at most
+    'WAIT_INTERVAL': 0.05,  # seconds between polls while another worker rebuilds
+    'WAIT_TIMEOUT': 1,     # seconds a request waits for another worker's rebuild before building itself
+    'CACHED_PAGES': 3,     # home pagination pages that are cached
+}
+
+STATS = ('hits', 'misses', 'stale_hits')
+
+
+def get_config():
+    """Get feed cache settings merged over the defaults"""
+    return get_settings('PRODUCT_FEED_CACHE', DEFAULTS)
+
+
+def get_cache():
+    return caches[get_config()['ALIAS']]
+
+
+def _generation(cache):
+    key = f'{KEY_PREFIX}:generation'
+    generation = cache.get(key)
+    if generation is None:
+        # Seed from the clock so an evicted counter never reuses old keys
+        cache.add(key, int(time.time()), timeout=None)
+        generation = cache.get(key, int(time.time()))
+    return generation
+
+
+def _count(cache, stat):
+    key = f'{KEY_PREFIX}:stats:{stat}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def make_key(name, params=None):
+    """Build the versioned cache key for a feed and its request parameters"""
+    digest = hashlib.md5(json.dumps(params or {}, sort_keys=True).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{_generation(get_cache())}:{name}:{digest}'
+
+
+def _store(cache, key, value, config):
+    cache.set(key, (value, time.time() + config['TIMEOUT']), timeout=config['TIMEOUT'] + config['STALE_GRACE'])
+
+
+def _wait_for(cache, key, config):
+    deadline = time.monotonic() + min(config['WAIT_TIMEOUT'], config['LOCK_TIMEOUT'])
+    while time.monotonic() < deadline:
+        time.sleep(config['WAIT_INTERVAL'])
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return None
+
+
+def get_or_build(name, params, builder):
+    """
+    Return the cached feed for (name, params), building it with builder() on a miss.
+
+    builder must return picklable data (e.g. the response payload dict).
+    """
+    config = get_config()
+    cache = get_cache()
+    key = make_key(name, params)
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until:
+            _count(cache, 'hits')
+            return value
+        if not cache.add(lock_key, token, timeout=config['LOCK_TIMEOUT']):
+            # Another worker is refreshing this entry
+            _count(cache, 'stale_hits')
+            return value
+    elif not cache.add(lock_key, token, timeout=config['LOCK_TIMEOUT']):
+        value = _wait_for(cache, key, config)
+        if value is not None:
+            _count(cache, 'hits')
+            return value
+        token = None
+
+    try:
+        value = builder()
+        _store(cache, key, value, config)
+    finally:
+        if token and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    _count(cache, 'misses')
+    return value
+
+
+def invalidate():
+    """Drop every cached feed by moving to a new key generation"""
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:generation'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time()), timeout=None)
+
+
+def get_stats():
+    """Get shared hit/miss counters"""
+    cache = get_cache()
+    stats = {stat: cache.get(f'{KEY_PREFIX}:stats:{stat}', 0) for stat in STATS}
+    served = stats['hits'] + stats['stale_hits']
+    total = served + stats['misses']
+    stats['hit_ratio'] = round(served / total, 4) if total else 0.0
+    return stats
+
+
+def reset_stats():
+    get_cache().delete_many([f'{KEY_PREFIX}:stats:{stat}' for stat in STATS])
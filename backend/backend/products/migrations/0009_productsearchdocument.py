@@ -0,0 +1,118 @@
+# Generated by Django 4.2.4 on 2026-10-16 22:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The full-text index SQL is frozen here, it must not follow later code changes
+SQLITE_INSTALL_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_search_fts USING fts5(
+        title, short_description, tags, category_name, subcategory_name,
+        content='products_productsearchdocument', content_rowid='id',
+        tokenize='porter unicode61', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_search_fts_ai AFTER INSERT ON products_productsearchdocument BEGIN
+        INSERT INTO products_search_fts(rowid, title, short_description, tags, category_name, subcategory_name)
+        VALUES (new.id, new.title, new.short_description, new.tags, new.category_name, new.subcategory_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_search_fts_ad AFTER DELETE ON products_productsearchdocument BEGIN
+        INSERT INTO products_search_fts(products_search_fts, rowid, title, short_description, tags, category_name, subcategory_name)
+        VALUES ('delete', old.id, old.title, old.short_description, old.tags, old.category_name, old.subcategory_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_search_fts_au AFTER UPDATE ON products_productsearchdocument BEGIN
+        INSERT INTO products_search_fts(products_search_fts, rowid, title, short_description, tags, category_name, subcategory_name)
+        VALUES ('delete', old.id, old.title, old.short_description, old.tags, old.category_name, old.subcategory_name);
+        INSERT INTO products_search_fts(rowid, title, short_description, tags, category_name, subcategory_name)
+        VALUES (new.id, new.title, new.short_description, new.tags, new.category_name, new.subcategory_name);
+    END
+    """,
+]
+
+SQLITE_UNINSTALL_SQL = [
+    "DROP TRIGGER IF EXISTS products_search_fts_au",
+    "DROP TRIGGER IF EXISTS products_search_fts_ad",
+    "DROP TRIGGER IF EXISTS products_search_fts_ai",
+    "DROP TABLE IF EXISTS products_search_fts",
+]
+
+POSTGRES_INSTALL_SQL = [
+    """
+    ALTER TABLE products_productsearchdocument ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(tags, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(category_name, '') || ' ' || coalesce(subcategory_name, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(short_description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS products_productsearchdocument_vector_gin "
+    "ON products_productsearchdocument USING GIN (search_vector)",
+]
+
+POSTGRES_UNINSTALL_SQL = [
+    "DROP INDEX IF EXISTS products_productsearchdocument_vector_gin",
+    "ALTER TABLE products_productsearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_vendor_sql(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    run_vendor_sql(schema_editor, {'sqlite': SQLITE_INSTALL_SQL, 'postgresql': POSTGRES_INSTALL_SQL})
+
+    # Index existing products; the FTS triggers pick up the inserted rows
+    Product = apps.get_model('products', 'Product')
+    ProductSearchDocument = apps.get_model('products', 'ProductSearchDocument')
+    documents = [
+        ProductSearchDocument(
+            product_id=product.id,
+            title=product.title or '',
+            short_description=product.short_description or '',
+            tags=(product.tags or '').replace(',', ' '),
+            category_name=product.category.name if product.category_id else '',
+            subcategory_name=product.subcategory.name if product.subcategory_id else '',
+        )
+        for product in Product.objects.select_related('category', 'subcategory').iterator()
+    ]
+    ProductSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+def drop_search_index(apps, schema_editor):
+    run_vendor_sql(schema_editor, {'sqlite': SQLITE_UNINSTALL_SQL, 'postgresql': POSTGRES_UNINSTALL_SQL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_default_price_product_default_variant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, default='', help_text='Product title', max_length=255)),
+                ('short_description', models.TextField(blank=True, default='', help_text='Brief product description')),
+                ('tags', models.TextField(blank=True, default='', help_text='Product tags')),
+                ('category_name', models.CharField(blank=True, default='', help_text='Category name', max_length=100)),
+                ('subcategory_name', models.CharField(blank=True, default='', help_text='Subcategory name', max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Product Search Document',
+                'verbose_name_plural': 'Product Search Documents',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
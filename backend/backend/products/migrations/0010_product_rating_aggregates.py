@@ -0,0 +1,72 @@
+# Generated by Django 4.2.4 on 2026-10-16 22:49
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductReview = apps.get_model('products', 'ProductReview')
+    rows = ProductReview.objects.filter(is_approved=True).values('product_id').annotate(
+        total_count=Count('id'),
+        total_sum=Sum('rating'),
+        **{f'stars_{rating}': Count('id', filter=Q(rating=rating)) for rating in range(1, 6)},
+    )
+    for row in rows:
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_count=row['total_count'],
+            rating_sum=row['total_sum'],
+            rating_average=row['total_sum'] / row['total_count'],
+            **{f'rating_{rating}_count': row[f'stars_{rating}'] for rating in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_productsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, help_text='Approved 1 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, help_text='Approved 2 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, help_text='Approved 3 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, help_text='Approved 4 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, help_text='Approved 5 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_average',
+            field=models.FloatField(default=0, help_text='Average approved review rating'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of approved reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, help_text='Sum of approved review ratings'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -6,3 +6,4 @@ from .products.variant import ProductVariant
 from .products.image import ProductImage
 from .products.variant_option import VariantOption
 from .products.review import ProductReview, ReviewVote
+from .products.search_document import ProductSearchDocument
@@ -125,6 +125,16 @@ class Product(models.Model):
         help_text="Default variant price (cached for performance)"
     )
     
+    # Rating aggregates over approved reviews (maintained by products.ratings)
+    rating_count = models.PositiveIntegerField(default=0, help_text="Number of approved reviews")
+    rating_sum = models.PositiveIntegerField(default=0, help_text="Sum of approved review ratings")
+    rating_average = models.FloatField(default=0, help_text="Average approved review rating")
+    rating_1_count = models.PositiveIntegerField(default=0, help_text="Approved 1 star reviews")
+    rating_2_count = models.PositiveIntegerField(default=0, help_text="Approved 2 star reviews")
+    rating_3_count = models.PositiveIntegerField(default=0, help_text="Approved 3 star reviews")
+    rating_4_count = models.PositiveIntegerField(default=0, help_text="Approved 4 star reviews")
+    rating_5_count = models.PositiveIntegerField(default=0, help_text="Approved 5 star reviews")
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -138,13 +148,37 @@ class Product(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['category']),
             models.Index(fields=['created_at']),
+            # Keyset pagination of listings
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['status', 'price', 'id']),
         ]
     
+    RATING_FIELDS = (
+        'rating_count', 'rating_sum', 'rating_average',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = self._generate_unique_slug()
         super().save(*args, **kwargs)
     
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Rating aggregates are read-only on the save path: products.ratings
+        # writes them with F() updates, a save never overwrites them with
+        # values that may be stale on this instance (refresh_from_db() reads them)
+        values = [value for value in values if value[0].name not in self.RATING_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Price as loaded: the cart price signals compare a save against it
+        # instead of reading the row again (absent when price was deferred)
+        if 'price' in instance.__dict__:
+            instance._stored_price = instance.price
+        return instance
+    
     def _generate_unique_slug(self):
         """Generate a unique slug for the product"""
         base_slug = slugify(self.title)
@@ -164,14 +198,27 @@ class Product(models.Model):
     def __str__(self):
         return self.title
     
+    def _prefetched(self, relation):
+        """Return prefetched rows for a relation, or None if it was not prefetched"""
+        cache = getattr(self, '_prefetched_objects_cache', {})
+        if relation in cache:
+            return list(cache[relation])
+        return None
+    
     @property
     def is_variable(self):
         """Check if product has variants"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return len(variants) > 0
         return self.variants.exists()
     
     @property
     def min_price(self):
         """Get minimum price from variants or product price"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return min(v.price for v in variants) if variants else self.price
         if self.is_variable:
             return self.variants.aggregate(min_price=models.Min('price'))['min_price']
         return self.price
@@ -179,6 +226,9 @@ class Product(models.Model):
     @property
     def max_price(self):
         """Get maximum price from variants or product price"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return max(v.price for v in variants) if variants else self.price
         if self.is_variable:
             return self.variants.aggregate(max_price=models.Max('price'))['max_price']
         return self.price
@@ -186,6 +236,9 @@ class Product(models.Model):
     @property
     def total_inventory(self):
         """Get total inventory from variants or product quantity"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return sum(v.quantity for v in variants) if variants else self.quantity
         if self.is_variable:
             return self.variants.aggregate(total=models.Sum('quantity'))['total'] or 0
         return self.quantity
@@ -193,6 +246,9 @@ class Product(models.Model):
     @property
     def is_in_stock(self):
         """Check if product is in stock"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return any(v.quantity > 0 for v in variants) if variants else self.quantity > 0
         if self.is_variable:
             return self.variants.filter(quantity__gt=0).exists()
         return self.quantity > 0
@@ -200,11 +256,58 @@ class Product(models.Model):
     @property
     def primary_image(self):
         """Get the primary image or first image"""
+        images = self._prefetched('images')
+        if images is not None:
+            primary = next((image for image in images if image.is_primary), None)
+            return primary or (images[0] if images else None)
         primary = self.images.filter(is_primary=True).first()
         if primary:
             return primary
         return self.images.first()
     
+    @property
+    def active_variants(self):
+        """Get active variants, using prefetched variants when available"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return [v for v in variants if v.is_active]
+        return self.variants.filter(is_active=True)
+    
+    @property
+    def variant_count(self):
+        """Get number of variants, using prefetched variants when available"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return len(variants)
+        return self.variants.count()
+    
+    def get_default_variant(self):
+        """Get default variant, resolving it from prefetched variants when available"""
+        if not self.default_variant_id:
+            return None
+        variants = self._prefetched('variants')
+        if variants is not None:
+            for variant in variants:
+                if variant.id == self.default_variant_id:
+                    return variant
+        return self.default_variant
+    
+    def _first_active_variant(self):
+        """Get the first active variant"""
+        variants = self._prefetched('variants')
+        if variants is not None:
+            return next((v for v in variants if v.is_active), None)
+        return self.variants.filter(is_active=True).first()
+    
+    @property
+    def rating_distribution(self):
+        """Get approved review counts per star, highest rating first"""
+        return [
+            {'rating': rating, 'count': getattr(self, f'rating_{rating}_count')}
+            for rating in range(5, 0, -1)
+            if getattr(self, f'rating_{rating}_count')
+        ]
+    
     def set_default_variant(self, variant=None):
         """Set default variant for variable products"""
         if self.product_type != 'variable':
@@ -224,10 +327,10 @@ class Product(models.Model):
     def get_display_price(self):
         """Get display price for product (default variant price for variable products)"""
         if self.product_type == 'variable':
-            if self.default_variant and self.default_price:
+            if self.default_variant_id and self.default_price:
                 return self.default_price
             # Fallback: get first variant price if default not set
-            first_variant = self.variants.filter(is_active=True).first()
+            first_variant = self._first_active_variant()
             if first_variant:
                 return first_variant.price
         return self.price
@@ -235,10 +338,11 @@ class Product(models.Model):
     def get_display_old_price(self):
         """Get display old price for product (default variant old price for variable products)"""
         if self.product_type == 'variable':
-            if self.default_variant:
-                return self.default_variant.old_price
+            default_variant = self.get_default_variant()
+            if default_variant:
+                return default_variant.old_price
             # Fallback: get first variant old price if default not set
-            first_variant = self.variants.filter(is_active=True).first()
+            first_variant = self._first_active_variant()
             if first_variant:
                 return first_variant.old_price
         return self.old_price
@@ -246,10 +350,11 @@ class Product(models.Model):
     def is_default_variant_in_stock(self):
         """Check if default variant is in stock"""
         if self.product_type == 'variable':
-            if self.default_variant:
-                return self.default_variant.quantity > 0
+            default_variant = self.get_default_variant()
+            if default_variant:
+                return default_variant.quantity > 0
             # Fallback: check first variant stock if default not set
-            first_variant = self.variants.filter(is_active=True).first()
+            first_variant = self._first_active_variant()
             if first_variant:
                 return first_variant.quantity > 0
         return self.is_in_stock
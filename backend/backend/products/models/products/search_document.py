@@ -0,0 +1,29 @@
+from django.db import models
+from .product import Product
+
+class ProductSearchDocument(models.Model):
+    """
+    Denormalized searchable text for a product.
+    
+    The full-text index is attached to this table by the database backend
+    (an FTS5 virtual table on SQLite, a tsvector column on PostgreSQL), see
+    products.search.engine.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='search_document')
+    
+    # Indexed text
+    title = models.CharField(max_length=255, blank=True, default='', help_text="Product title")
+    short_description = models.TextField(blank=True, default='', help_text="Brief product description")
+    tags = models.TextField(blank=True, default='', help_text="Product tags")
+    category_name = models.CharField(max_length=100, blank=True, default='', help_text="Category name")
+    subcategory_name = models.CharField(max_length=100, blank=True, default='', help_text="Subcategory name")
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Product Search Document"
+        verbose_name_plural = "Product Search Documents"
+    
+    def __str__(self):
+        return f"Search document for {self.title}"
@@ -113,6 +113,14 @@ class ProductVariant(models.Model):
         
         super().save(*args, **kwargs)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Loaded price for the cart price signals, as in Product.from_db
+        if 'price' in instance.__dict__:
+            instance._stored_price = instance.price
+        return instance
+    
     def __str__(self):
         return f"{self.product.title} - {self.title}"
     
@@ -161,7 +169,7 @@ class ProductVariant(models.Model):
         """Get all dynamic options as a list of dictionaries"""
         return [
             {'name': option.name, 'value': option.value, 'position': option.position}
-            for option in self.dynamic_options.all().order_by('position')
+            for option in sorted(self.dynamic_options.all(), key=lambda option: option.position)
         ]
     
     def get_all_options(self):
@@ -0,0 +1,108 @@
+"""
+Product Rating Aggregates
+=========================
+
+Keeps the rating_* columns on Product in step with approved reviews.
+
+Review changes are applied as deltas in a single conditional UPDATE, so
+concurrent reviews never lose counts and readers get the aggregates from the
+product row itself with no extra queries.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from products.models import Product, ProductReview
+
+STAR_RATINGS = (1, 2, 3, 4, 5)
+
+
+def apply_rating_delta(product_id, rating, delta):
+    """Add (delta=1) or remove (delta=-1) one approved review from a product's aggregates"""
+    if not product_id or rating not in STAR_RATINGS:
+        return
+    count = F('rating_count') + delta
+    total = F('rating_sum') + delta * rating
+    Product.objects.filter(pk=product_id).update(
+        rating_count=count,
+        rating_sum=total,
+        rating_average=Coalesce(
+            Cast(total, FloatField()) / NullIf(count, Value(0)),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+        **{f'rating_{rating}_count': F(f'rating_{rating}_count') + delta},
+    )
+
+
+def _counted(state):
+    """Return (product_id, rating) if a review state counts towards aggregates"""
+    if state and state['is_approved']:
+        return state['product_id'], state['rating']
+    return None
+
+
+def apply_review_change(old_state, new_state):
+    """
+    Apply the aggregate change between two review states.
+
+    States are dicts with product_id, rating and is_approved, or None when
+    the review does not exist (creation / deletion).
+    """
+    old = _counted(old_state)
+    new = _counted(new_state)
+    if old == new:
+        return
+    if old:
+        apply_rating_delta(old[0], old[1], -1)
+    if new:
+        apply_rating_delta(new[0], new[1], 1)
+
+
+def review_state(review):
+    """Snapshot the fields of a review that affect rating aggregates"""
+    return {
+        'product_id': review.product_id,
+        'rating': review.rating,
+        'is_approved': review.is_approved,
+    }
+
+
+def rebuild_rating_aggregates(batch_size=500):
+    """Recompute every product's aggregates from reviews in one transaction, returns the number of rated products"""
+    approved = ProductReview.objects.filter(is_approved=True)
+    rows = approved.values('product_id').annotate(
+        total_count=Count('id'),
+        total_sum=Sum('rating'),
+        **{f'stars_{rating}': Count('id', filter=Q(rating=rating)) for rating in STAR_RATINGS},
+    ).order_by('product_id')
+
+    rated = 0
+    with transaction.atomic():
+        # Products that lost all their reviews read as unrated; rated ones are
+        # written once below, so no product is ever seen reset to zero
+        Product.objects.exclude(Exists(approved.filter(product=OuterRef('pk')))).exclude(
+            rating_count=0, rating_sum=0,
+        ).update(
+            rating_count=0, rating_sum=0, rating_average=0,
+            **{f'rating_{rating}_count': 0 for rating in STAR_RATINGS},
+        )
+
+        batch = []
+        for row in rows.iterator():
+            product = Product(pk=row['product_id'])
+            product.rating_count = row['total_count']
+            product.rating_sum = row['total_sum'] or 0
+            product.rating_average = product.rating_sum / product.rating_count if product.rating_count else 0
+            for rating in STAR_RATINGS:
+                setattr(product, f'rating_{rating}_count', row[f'stars_{rating}'])
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, Product.RATING_FIELDS)
+                rated += len(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_update(batch, Product.RATING_FIELDS)
+            rated += len(batch)
+    return rated
@@ -0,0 +1,2 @@
+# Search package
+from .engine import search_product_ids, filter_by_search, index_product, rebuild_index
@@ -0,0 +1,214 @@
+"""
+Product Search Engine
+=====================
+
+Ranked full-text search over ProductSearchDocument.
+
+The index lives in the database so it is updated in the same transaction as
+the product it describes:
+
+- SQLite: an external-content FTS5 table (porter stemming, prefix indexes)
+  kept in sync with the document table by triggers, ranked with bm25().
+- PostgreSQL: a generated, weighted tsvector column with a GIN index,
+  ranked with ts_rank().
+- Other backends fall back to icontains matching on the document table.
+
+The index itself (FTS5 table and triggers, or tsvector column and GIN
+index) is created by migration 0009_productsearchdocument.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from products.models import Product, ProductSearchDocument
+
+FTS_TABLE = 'products_search_fts'
+DOCUMENT_TABLE = ProductSearchDocument._meta.db_table
+PRODUCT_TABLE = Product._meta.db_table
+
+# Upper bound on ranked ids returned by search_product_ids(); filter_by_search() has none
+MAX_RESULTS = 1000
+# Upper bound on query terms, longer queries are truncated
+MAX_TERMS = 10
+
+# Column weights, in index column order: title, short_description, tags,
+# category_name, subcategory_name
+SQLITE_WEIGHTS = (10.0, 1.0, 5.0, 3.0, 3.0)
+
+
+def tokenize(query):
+    """Split a user query into lowercase word terms"""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+# Product fields the search document is built from, by name and attname as update_fields may carry either
+INDEXED_FIELDS = frozenset({
+    'title', 'short_description', 'tags', 'category', 'category_id', 'subcategory', 'subcategory_id',
+})
+
+
+def build_document(product):
+    """Build the unsaved search document field values for a product"""
+    return {
+        'title': product.title or '',
+        'short_description': product.short_description or '',
+        'tags': (product.tags or '').replace(',', ' '),
+        'category_name': product.category.name if product.category_id else '',
+        'subcategory_name': product.subcategory.name if product.subcategory_id else '',
+    }
+
+
+def index_product(product):
+    """Create or refresh the search document for one product"""
+    ProductSearchDocument.objects.update_or_create(product=product, defaults=build_document(product))
+
+
+def rebuild_index(batch_size=500):
+    """Rebuild every search document from scratch, returns the number indexed"""
+    ProductSearchDocument.objects.all().delete()
+    queryset = Product.objects.select_related('category', 'subcategory').order_by('id')
+    indexed = 0
+    batch = []
+    for product in queryset.iterator(chunk_size=batch_size):
+        batch.append(ProductSearchDocument(product=product, **build_document(product)))
+        if len(batch) >= batch_size:
+            ProductSearchDocument.objects.bulk_create(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        ProductSearchDocument.objects.bulk_create(batch)
+        indexed += len(batch)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def _sqlite_match(terms):
+    # Every term is a quoted prefix query; FTS5 ANDs them implicitly
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _postgres_tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _fallback_documents(terms):
+    queryset = ProductSearchDocument.objects.all()
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) |
+            Q(short_description__icontains=term) |
+            Q(tags__icontains=term) |
+            Q(category_name__icontains=term) |
+            Q(subcategory_name__icontains=term)
+        )
+    return queryset
+
+
+def _sqlite_search(terms, limit, active_only):
+    weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+    status_clause = "AND p.status = 'active'" if active_only else ''
+    sql = f"""
+        SELECT d.product_id
+        FROM {FTS_TABLE} f
+        JOIN {DOCUMENT_TABLE} d ON d.id = f.rowid
+        JOIN {PRODUCT_TABLE} p ON p.id = d.product_id
+        WHERE {FTS_TABLE} MATCH %s {status_clause}
+        ORDER BY bm25({FTS_TABLE}, {weights}), d.product_id DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_sqlite_match(terms), limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgres_search(terms, limit, active_only):
+    tsquery = _postgres_tsquery(terms)
+    status_clause = "AND p.status = 'active'" if active_only else ''
+    sql = f"""
+        SELECT d.product_id
+        FROM {DOCUMENT_TABLE} d
+        JOIN {PRODUCT_TABLE} p ON p.id = d.product_id
+        WHERE d.search_vector @@ to_tsquery('english', %s) {status_clause}
+        ORDER BY ts_rank(d.search_vector, to_tsquery('english', %s)) DESC, d.product_id DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, tsquery, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_search(terms, limit, active_only):
+    queryset = _fallback_documents(terms)
+    if active_only:
+        queryset = queryset.filter(product__status='active')
+    return list(queryset.order_by('-product_id').values_list('product_id', flat=True)[:limit])
+
+
+def search_product_ids(query, limit=MAX_RESULTS, active_only=True):
+    """Return up to limit product ids matching the query, best match first"""
+    terms = tokenize(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(terms, limit, active_only)
+    if connection.vendor == 'postgresql':
+        return _postgres_search(terms, limit, active_only)
+    return _fallback_search(terms, limit, active_only)
+
+
+def _match_join(terms):
+    """extra() arguments joining the matching documents once, with their rank (lower first); None without an index"""
+    if connection.vendor == 'sqlite':
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        return {
+            'tables': [FTS_TABLE, DOCUMENT_TABLE],
+            'where': [
+                f"{FTS_TABLE} MATCH %s",
+                # The rank column scores the matched row with the weighted bm25(), the index is scanned once
+                f"{FTS_TABLE}.rank MATCH %s",
+                f"{DOCUMENT_TABLE}.id = {FTS_TABLE}.rowid",
+                f"{DOCUMENT_TABLE}.product_id = {PRODUCT_TABLE}.id",
+            ],
+            'params': [_sqlite_match(terms), f'bm25({weights})'],
+            'rank': f"{FTS_TABLE}.rank",
+            'rank_params': [],
+        }
+    if connection.vendor == 'postgresql':
+        tsquery = _postgres_tsquery(terms)
+        return {
+            'tables': [DOCUMENT_TABLE],
+            'where': [
+                f"{DOCUMENT_TABLE}.search_vector @@ to_tsquery('english', %s)",
+                f"{DOCUMENT_TABLE}.product_id = {PRODUCT_TABLE}.id",
+            ],
+            'params': [tsquery],
+            'rank': f"-ts_rank({DOCUMENT_TABLE}.search_vector, to_tsquery('english', %s))",
+            'rank_params': [tsquery],
+        }
+    return None
+
+
+def filter_by_search(queryset, query, order_by_rank=True):
+    """
+    Restrict a Product queryset to search matches, optionally ordered by relevance
+
+    The matching documents are joined into the queryset, so filters applied
+    before or after narrow the same uncapped result set and counts stay exact.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+    join = _match_join(terms)
+    if join is None:
+        queryset = queryset.filter(id__in=_fallback_documents(terms).values('product_id'))
+        return queryset.order_by('-id') if order_by_rank else queryset
+    queryset = queryset.extra(tables=join['tables'], where=join['where'], params=join['params'])
+    if order_by_rank:
+        queryset = queryset.extra(
+            select={'search_rank': join['rank']}, select_params=join['rank_params'],
+        ).order_by('search_rank', '-id')
+    return queryset
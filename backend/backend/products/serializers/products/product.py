@@ -78,7 +78,13 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         return variant
 
 class ProductListSerializer(serializers.ModelSerializer):
-    """Serializer for product list view"""
+    """
+    Serializer for product list view.
+    
+    Pass querysets through setup_eager_loading() to serialize a whole page
+    in a fixed number of queries; the product helpers read the prefetched
+    images and variants instead of querying per product.
+    """
     category_name = serializers.CharField(source='category.name', read_only=True)
     subcategory_name = serializers.CharField(source='subcategory.name', read_only=True)
     min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -93,6 +99,8 @@ class ProductListSerializer(serializers.ModelSerializer):
     default_variant_in_stock = serializers.SerializerMethodField()
     default_variant = serializers.SerializerMethodField()
     variants = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    review_count = serializers.IntegerField(source='rating_count', read_only=True)
     
     class Meta:
         model = Product
@@ -104,11 +112,18 @@ class ProductListSerializer(serializers.ModelSerializer):
             'min_price', 'max_price', 'total_inventory', 'is_in_stock', 'is_variable',
             'featured', 'tags', 'primary_image', 'variant_count',
             'display_price', 'display_old_price', 'default_variant_in_stock',
-            'default_variant', 'variants',
+            'default_variant', 'variants', 'average_rating', 'review_count',
             'created_at', 'updated_at', 'published_at'
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load categories, images, variants and variant options for a page of products"""
+        return queryset.select_related('category', 'subcategory').prefetch_related(
+            'images', 'variants__dynamic_options'
+        )
+    
     def get_primary_image(self, obj):
         primary_image = obj.primary_image
         if primary_image:
@@ -124,7 +139,7 @@ class ProductListSerializer(serializers.ModelSerializer):
         return None
     
     def get_variant_count(self, obj):
-        return obj.variants.count()
+        return obj.variant_count
     
     def get_display_price(self, obj):
         """Get display price (default variant price for variable products)"""
@@ -140,16 +155,21 @@ class ProductListSerializer(serializers.ModelSerializer):
     
     def get_default_variant(self, obj):
         """Get default variant for variable products"""
-        if obj.product_type == 'variable' and obj.default_variant:
-            return ProductVariantSerializer(obj.default_variant).data
+        if obj.product_type == 'variable':
+            default_variant = obj.get_default_variant()
+            if default_variant:
+                return ProductVariantSerializer(default_variant).data
         return None
     
     def get_variants(self, obj):
         """Get all variants for variable products"""
         if obj.product_type == 'variable':
-            variants = obj.variants.filter(is_active=True)
-            return ProductVariantSerializer(variants, many=True).data
+            return ProductVariantSerializer(obj.active_variants, many=True).data
         return []
+    
+    def get_average_rating(self, obj):
+        """Get stored average rating of approved reviews"""
+        return round(obj.rating_average, 1)
 
 class ProductDetailSerializer(serializers.ModelSerializer):
     """Serializer for product detail view"""
@@ -165,6 +185,9 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     display_price = serializers.SerializerMethodField()
     display_old_price = serializers.SerializerMethodField()
     default_variant_in_stock = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    review_count = serializers.IntegerField(source='rating_count', read_only=True)
+    rating_distribution = serializers.ListField(read_only=True)
     
     class Meta:
         model = Product
@@ -177,7 +200,8 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'weight_unit', 'requires_shipping', 'taxable', 'featured',
             'tags', 'min_price', 'max_price', 'total_inventory', 'is_in_stock',
             'is_variable', 'images', 'variants', 'display_price', 'display_old_price',
-            'default_variant_in_stock', 'created_at', 'updated_at', 'published_at'
+            'default_variant_in_stock', 'average_rating', 'review_count', 'rating_distribution',
+            'created_at', 'updated_at', 'published_at'
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
     
@@ -192,6 +216,10 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     def get_default_variant_in_stock(self, obj):
         """Check if default variant is in stock"""
         return obj.is_default_variant_in_stock()
+    
+    def get_average_rating(self, obj):
+        """Get stored average rating of approved reviews"""
+        return round(obj.rating_average, 1)
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for product create/update operations"""
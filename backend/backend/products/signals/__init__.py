@@ -0,0 +1,8 @@
+"""
+Products Signals Package
+"""
+
+# Import signal handlers to ensure they are registered
+from .search_signals import product_saved, category_saved, category_deleting, subcategory_saved, subcategory_deleting
+from .rating_signals import review_saving, review_saved, review_deleted
+from .cache_signals import catalog_changed
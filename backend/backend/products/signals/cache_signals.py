@@ -0,0 +1,29 @@
+"""
+Feed Cache Signal Handlers
+Invalidates cached product feeds when catalog data they render changes
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.models import Category, SubCategory, Product, ProductVariant, ProductImage, ProductReview
+from products.feed_cache import invalidate
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def catalog_changed(sender, raw=False, **kwargs):
+    """Invalidate feeds once the change is committed, so rebuilds see it"""
+    if raw:
+        return
+    transaction.on_commit(invalidate)
@@ -0,0 +1,35 @@
+"""
+Rating Aggregate Signal Handlers
+Keeps Product rating aggregates in sync with ProductReview create, update, approve and delete
+"""
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from products.models import ProductReview
+from products.ratings import apply_review_change, review_state
+
+
+@receiver(pre_save, sender=ProductReview)
+def review_saving(sender, instance, raw=False, **kwargs):
+    """Remember the stored state of the review before it changes"""
+    instance._rating_old_state = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    instance._rating_old_state = ProductReview.objects.filter(pk=instance.pk).values(
+        'product_id', 'rating', 'is_approved'
+    ).first()
+
+
+@receiver(post_save, sender=ProductReview)
+def review_saved(sender, instance, raw=False, **kwargs):
+    """Apply the rating change of a created or updated review"""
+    if raw:
+        return
+    apply_review_change(getattr(instance, '_rating_old_state', None), review_state(instance))
+    instance._rating_old_state = review_state(instance)
+
+
+@receiver(post_delete, sender=ProductReview)
+def review_deleted(sender, instance, **kwargs):
+    """Remove a deleted review from the rating aggregates"""
+    apply_review_change(review_state(instance), None)
@@ -0,0 +1,52 @@
+"""
+Search Index Signal Handlers
+Keeps ProductSearchDocument rows in sync with products and their categories
+"""
+
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from products.models import Product, Category, SubCategory, ProductSearchDocument
+from products.search import index_product
+from products.search.engine import INDEXED_FIELDS
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Refresh the product's search document (deletes cascade to the document)"""
+    if raw:
+        return
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    index_product(instance)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, raw=False, **kwargs):
+    """Propagate category renames to the search documents of its products"""
+    if raw:
+        return
+    ProductSearchDocument.objects.filter(product__category=instance).exclude(
+        category_name=instance.name
+    ).update(category_name=instance.name)
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleting(sender, instance, **kwargs):
+    """Clear the category name before products are detached from it"""
+    ProductSearchDocument.objects.filter(product__category=instance).update(category_name='')
+
+
+@receiver(post_save, sender=SubCategory)
+def subcategory_saved(sender, instance, raw=False, **kwargs):
+    """Propagate subcategory renames to the search documents of its products"""
+    if raw:
+        return
+    ProductSearchDocument.objects.filter(product__subcategory=instance).exclude(
+        subcategory_name=instance.name
+    ).update(subcategory_name=instance.name)
+
+
+@receiver(pre_delete, sender=SubCategory)
+def subcategory_deleting(sender, instance, **kwargs):
+    """Clear the subcategory name before products are detached from it"""
+    ProductSearchDocument.objects.filter(product__subcategory=instance).update(subcategory_name='')
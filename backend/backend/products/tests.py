@@ -1,3 +1,405 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import (
+    Category, Product, ProductImage, ProductReview, ProductSearchDocument, ProductVariant, SubCategory, VariantOption
+)
+from products import feed_cache
+from products.search import engine as search_engine, filter_by_search, rebuild_index, search_product_ids
+from products.serializers import ProductListSerializer
+
+
+def create_catalog(count, category=None):
+    """Create active products alternating between simple and variable types"""
+    products = []
+    for i in range(count):
+        product = Product.objects.create(
+            title=f"Product {i}",
+            slug=f"product-{i}",
+            category=category,
+            status='active',
+            product_type='variable' if i % 2 else 'simple',
+            price=Decimal('10.00') + i,
+            quantity=5,
+        )
+        ProductImage.objects.create(product=product, image=f'products/images/{i}.jpg', position=1)
+        ProductImage.objects.create(product=product, image=f'products/images/{i}_p.jpg', position=2, is_primary=True)
+        if product.product_type == 'variable':
+            for position in (1, 2):
+                variant = ProductVariant.objects.create(
+                    product=product,
+                    title=f"Variant {position}",
+                    sku=f"SKU-{i}-{position}",
+                    price=Decimal('20.00') + position,
+                    quantity=position - 1,
+                    option1_value=str(position),
+                    position=position,
+                )
+                VariantOption.objects.create(variant=variant, name='Size', value=str(position))
+            product.set_default_variant()
+        products.append(product)
+    return products
+
+
+class ProductListSerializerQueryCountTests(TestCase):
+    """Batched list serialization must not issue per-product queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Phones", slug="phones")
+        create_catalog(50, category=cls.category)
+
+    def serialize_page(self, size):
+        queryset = ProductListSerializer.setup_eager_loading(Product.objects.filter(status='active'))
+        return ProductListSerializer(queryset.order_by('-created_at')[:size], many=True).data
+
+    def test_fifty_product_page_uses_fixed_number_of_queries(self):
+        # products, images, variants, variant options
+        with self.assertNumQueries(4):
+            data = self.serialize_page(50)
+        self.assertEqual(len(data), 50)
+
+    def test_batched_output_matches_unbatched_output(self):
+        queryset = Product.objects.filter(status='active').order_by('-created_at')[:10]
+        expected = ProductListSerializer(queryset, many=True).data
+        self.assertEqual(self.serialize_page(10), expected)
+
+    def test_variable_product_fields_come_from_prefetched_variants(self):
+        data = next(item for item in self.serialize_page(50) if item['product_type'] == 'variable')
+        self.assertEqual(data['variant_count'], 2)
+        self.assertEqual(len(data['variants']), 2)
+        self.assertEqual(data['default_variant']['title'], "Variant 1")
+        self.assertEqual(data['min_price'], '21.00')
+        self.assertEqual(data['max_price'], '22.00')
+        self.assertTrue(data['is_in_stock'])
+        self.assertFalse(data['default_variant_in_stock'])
+        self.assertTrue(data['primary_image']['is_primary'])
+
+    def test_home_pagination_query_count_is_independent_of_page_size(self):
+        feed_cache.get_cache().clear()
+        url = reverse('pagination-get-paginated-products')
+        # Warm up so session setup is not counted against the first page size
+        self.client.get(url, {'page_size': 1})
+        counts = []
+        for page_size in (5, 50):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ProductSearchEngineTests(TestCase):
+    """Full-text search index and ranking"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(name="Phones", slug="phones")
+        cls.audio = Category.objects.create(name="Audio", slug="audio")
+        cls.pixel = Product.objects.create(
+            title="Pixel 7 Pro", slug="pixel-7-pro", category=cls.phones, status='active',
+            short_description="Flagship camera phone", tags="android,google", price=Decimal('899.00'),
+        )
+        cls.case = Product.objects.create(
+            title="Leather case", slug="leather-case", category=cls.phones, status='active',
+            short_description="Protective case for the Pixel", tags="accessories", price=Decimal('29.00'),
+        )
+        cls.headphones = Product.objects.create(
+            title="Running headphones", slug="running-headphones", category=cls.audio, status='active',
+            short_description="Wireless earbuds", tags="sport", price=Decimal('59.00'),
+        )
+        cls.draft = Product.objects.create(
+            title="Pixel prototype", slug="pixel-prototype", status='draft', price=Decimal('1.00'),
+        )
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(search_product_ids("pixel"), [self.pixel.id, self.case.id])
+
+    def test_prefix_and_stemmed_terms_match(self):
+        self.assertEqual(search_product_ids("headph"), [self.headphones.id])
+        self.assertEqual(search_product_ids("run"), [self.headphones.id])
+        self.assertEqual(search_product_ids("cameras"), [self.pixel.id])
+
+    def test_category_and_tags_are_indexed(self):
+        self.assertEqual(search_product_ids("audio"), [self.headphones.id])
+        self.assertEqual(search_product_ids("android"), [self.pixel.id])
+
+    def test_index_follows_product_and_category_changes(self):
+        self.headphones.title = "Studio monitors"
+        self.headphones.save()
+        self.assertEqual(search_product_ids("headphones"), [])
+        self.assertEqual(search_product_ids("studio"), [self.headphones.id])
+
+        self.audio.name = "Sound"
+        self.audio.save()
+        self.assertEqual(search_product_ids("sound"), [self.headphones.id])
+
+        self.case.delete()
+        self.assertEqual(search_product_ids("pixel"), [self.pixel.id])
+
+    def test_saves_of_unindexed_fields_skip_the_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.pixel.price = Decimal('799.00')
+            self.pixel.save(update_fields=['price'])
+        self.assertFalse([query for query in queries if 'productsearchdocument' in query['sql']])
+
+        self.pixel.title = "Pixel 8"
+        self.pixel.save(update_fields=['title'])
+        self.assertEqual(search_product_ids("pixel 8"), [self.pixel.id])
+
+    def test_inactive_products_are_excluded(self):
+        self.assertNotIn(self.draft.id, search_product_ids("prototype"))
+        self.assertEqual(search_product_ids("prototype", active_only=False), [self.draft.id])
+
+    def test_rebuild_index_restores_documents(self):
+        ProductSearchDocument.objects.all().delete()
+        self.assertEqual(search_product_ids("pixel"), [])
+        self.assertEqual(rebuild_index(), 4)
+        self.assertEqual(search_product_ids("pixel"), [self.pixel.id, self.case.id])
+
+    def test_search_endpoint_returns_ranked_results(self):
+        response = self.client.get(reverse('search-search-products'), {'q': 'pixel'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.pixel.id, self.case.id])
+
+    def test_filters_narrow_the_whole_ranked_result(self):
+        # Matches are joined into the view's queryset, not taken from the capped id list of search_product_ids()
+        with mock.patch.object(search_engine, 'search_product_ids') as capped:
+            response = self.client.get(reverse('search-search-products'), {'q': 'pixel', 'category': 'phones'})
+            self.assertEqual(response.data['count'], 2)
+            self.assertEqual([item['id'] for item in response.data['results']], [self.pixel.id, self.case.id])
+
+            queryset = filter_by_search(Product.objects.filter(status='active', price__lt=100), 'pixel')
+            self.assertEqual(list(queryset.values_list('id', flat=True)), [self.case.id])
+        capped.assert_not_called()
+
+
+class ProductRatingAggregateTests(TestCase):
+    """Stored rating aggregates follow review changes"""
+
+    def setUp(self):
+        feed_cache.get_cache().clear()
+        self.product = Product.objects.create(title="Rated", slug="rated", status='active', price=Decimal('5.00'))
+
+    def review(self, rating, is_approved=True):
+        return ProductReview.objects.create(product=self.product, rating=rating, comment="ok", is_approved=is_approved)
+
+    def assertAggregates(self, count, total, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, count)
+        self.assertEqual(self.product.rating_sum, total)
+        self.assertAlmostEqual(self.product.rating_average, total / count if count else 0)
+        self.assertEqual([getattr(self.product, f'rating_{star}_count') for star in range(1, 6)], histogram)
+
+    def test_create_update_approve_and_delete(self):
+        first = self.review(5)
+        pending = self.review(2, is_approved=False)
+        self.assertAggregates(1, 5, [0, 0, 0, 0, 1])
+
+        pending.is_approved = True
+        pending.save()
+        self.assertAggregates(2, 7, [0, 1, 0, 0, 1])
+
+        first.rating = 4
+        first.save()
+        self.assertAggregates(2, 6, [0, 1, 0, 1, 0])
+
+        first.is_approved = False
+        first.save()
+        self.assertAggregates(1, 2, [0, 1, 0, 0, 0])
+
+        pending.delete()
+        self.assertAggregates(0, 0, [0, 0, 0, 0, 0])
+
+    def test_stale_product_save_keeps_aggregates(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.review(3)
+        stale.title = "Renamed"
+        stale.save()
+        self.assertAggregates(1, 3, [0, 0, 1, 0, 0])
+
+    def test_deferred_and_missing_row_saves(self):
+        self.review(3)
+        product = Product.objects.only('title').get(pk=self.product.pk)
+        product.title = "Deferred"
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        # Only the loaded fields are written, deferred ones are not fetched one by one
+        self.assertFalse([query for query in queries if '"products_product"."description"' in query['sql']])
+        self.assertFalse([query for query in queries if 'rating_count' in query['sql']])
+        self.assertAggregates(1, 3, [0, 0, 1, 0, 0])
+
+        pk = self.product.pk
+        Product.objects.filter(pk=pk).delete()
+        self.product.save()
+        self.assertTrue(Product.objects.filter(pk=pk).exists())
+
+    def test_rebuild_command_repairs_drift(self):
+        self.review(4)
+        self.review(1)
+        Product.objects.filter(pk=self.product.pk).update(rating_count=9, rating_sum=1, rating_5_count=9)
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.assertAggregates(2, 5, [1, 0, 0, 1, 0])
+
+    def test_homepage_reads_stored_aggregates(self):
+        self.review(4)
+        self.review(5)
+        response = self.client.get(reverse('homepage-products'))
+        product = response.data['products'][0]
+        self.assertEqual(product['average_rating'], 4.5)
+        self.assertEqual(product['review_count'], 2)
+
+
+@override_settings(PRODUCT_FEED_CACHE={'TIMEOUT': 60, 'STALE_GRACE': 60, 'LOCK_TIMEOUT': 2, 'WAIT_INTERVAL': 0.01})
+class ProductFeedCacheTests(TestCase):
+    """Homepage feed cache, invalidation and stampede protection"""
+
+    def setUp(self):
+        feed_cache.get_cache().clear()
+        self.product = Product.objects.create(title="Cached", slug="cached", status='active', price=Decimal('5.00'))
+
+    def test_homepage_is_served_from_cache_until_catalog_changes(self):
+        url = reverse('homepage-products')
+        self.client.get(url)
+        Product.objects.filter(pk=self.product.pk).update(title="Changed behind the cache")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse([query for query in queries if 'products_' in query['sql']])
+        self.assertEqual(response.data['products'][0]['title'], "Cached")
+        self.assertEqual(feed_cache.get_stats()['hits'], 1)
+        self.assertEqual(feed_cache.get_stats()['misses'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = "Renamed"
+            self.product.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['products'][0]['title'], "Renamed")
+
+    def test_first_pagination_pages_are_cached_per_filter(self):
+        url = reverse('pagination-get-paginated-products')
+        self.client.get(url, {'page': 1})
+        self.client.get(url, {'page': 1})
+        self.client.get(url, {'page': 1, 'sort': 'price'})
+        self.client.get(url, {'search': 'cached'})
+        stats = feed_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_only_one_worker_rebuilds_a_missing_entry(self):
+        calls = []
+
+        def slow_builder():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(feed_cache.get_or_build('stampede', {}, slow_builder)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 42}] * 8)
+
+    def test_stale_entry_is_served_while_another_worker_rebuilds(self):
+        cache = feed_cache.get_cache()
+        key = feed_cache.make_key('stale', {})
+        cache.set(key, ({'value': 'old'}, time.time() - 1), timeout=60)
+        cache.add(f'{key}:lock', 'other-worker', timeout=60)
+        value = feed_cache.get_or_build('stale', {}, lambda: self.fail("should not rebuild"))
+        self.assertEqual(value, {'value': 'old'})
+        self.assertEqual(feed_cache.get_stats()['stale_hits'], 1)
+
+        cache.delete(f'{key}:lock')
+        self.assertEqual(feed_cache.get_or_build('stale', {}, lambda: {'value': 'new'}), {'value': 'new'})
+
+    def test_missing_entry_is_built_after_the_wait_timeout(self):
+        cache = feed_cache.get_cache()
+        key = feed_cache.make_key('locked', {})
+        cache.add(f'{key}:lock', 'other-worker', timeout=60)
+        started = time.monotonic()
+        with override_settings(PRODUCT_FEED_CACHE={'LOCK_TIMEOUT': 60, 'WAIT_TIMEOUT': 0.1, 'WAIT_INTERVAL': 0.01}):
+            value = feed_cache.get_or_build('locked', {}, lambda: {'value': 'built'})
+        self.assertEqual(value, {'value': 'built'})
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_subcategory_changes_invalidate_feeds(self):
+        category = Category.objects.create(name="Shoes")
+        key = feed_cache.make_key('homepage', {})
+        with self.captureOnCommitCallbacks(execute=True):
+            subcategory = SubCategory.objects.create(category=category, name="Boots")
+        self.assertNotEqual(feed_cache.make_key('homepage', {}), key)
+        key = feed_cache.make_key('homepage', {})
+        with self.captureOnCommitCallbacks(execute=True):
+            subcategory.delete()
+        self.assertNotEqual(feed_cache.make_key('homepage', {}), key)
+
+
+class HomePaginationCursorTests(TestCase):
+    """Keyset pagination over every supported sort order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(7):
+            # Repeated prices and a NULL price exercise the id tie-breaker
+            price = None if i == 3 else Decimal('10.00') + (i % 3)
+            Product.objects.create(title=f"Item {i % 4}", slug=f"item-{i}", status='active', price=price)
+
+    def setUp(self):
+        self.url = reverse('pagination-get-paginated-products')
+
+    def walk(self, sort, backwards=False):
+        ids = []
+        response = self.client.get(self.url, {'cursor': '', 'page_size': 3, 'sort': sort})
+        pages = [response.data]
+        while response.data['next_cursor']:
+            response = self.client.get(self.url, {'cursor': response.data['next_cursor'], 'page_size': 3, 'sort': sort})
+            pages.append(response.data)
+        if backwards:
+            while response.data['previous_cursor']:
+                response = self.client.get(
+                    self.url, {'cursor': response.data['previous_cursor'], 'page_size': 3, 'sort': sort}
+                )
+                pages.append(response.data)
+        for page in pages:
+            ids.extend(item['id'] for item in page['results'])
+        return ids, pages
+
+    def test_cursor_walk_matches_offset_order_for_every_sort(self):
+        for sort in ['price', 'created_at', 'title', '-price', '-created_at', '-title']:
+            with self.subTest(sort=sort):
+                offset = self.client.get(self.url, {'page_size': 50, 'sort': sort}).data
+                ids, pages = self.walk(sort)
+                self.assertEqual(ids, [item['id'] for item in offset['results']])
+                self.assertEqual(len(pages), 3)
+                self.assertIsNone(pages[0]['count'])
+
+    def test_previous_cursor_walks_back(self):
+        ids, pages = self.walk('-price', backwards=True)
+        forward = [item['id'] for page in pages[:3] for item in page['results']]
+        backward = [item['id'] for page in reversed(pages[2:]) for item in page['results']]
+        self.assertEqual(backward, forward)
+
+    def test_skip_count_mode_and_invalid_cursor(self):
+        response = self.client.get(self.url, {'page_size': 3, 'include_count': 'false'})
+        self.assertIsNone(response.data['count'])
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+        first = self.client.get(self.url, {'cursor': '', 'page_size': 3, 'sort': 'price'}).data
+        response = self.client.get(self.url, {'cursor': first['next_cursor'], 'sort': 'title'})
+        self.assertEqual(response.status_code, 404)
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 
 # Import views
 from .views import CategoryViewSet, SubCategoryViewSet, ProductViewSet
-from .views.products.homepage import homepage_products
+from .views.products.homepage import homepage_products, product_feed_cache_stats
 from .views.products.get_single_product import get_single_product
 from .views.products.product_reviews import get_product_reviews, create_product_review
 from .views.products.purchase_verification import check_purchase_eligibility, get_user_purchase_history
@@ -32,6 +32,7 @@ urlpatterns = [
     path('', include(router.urls)),
     # Homepage API
     path('homepage/', homepage_products, name='homepage-products'),
+    path('homepage/cache-stats/', product_feed_cache_stats, name='product-feed-cache-stats'),
     # Single Product API
     path('product-detail/<slug:slug>/', get_single_product, name='single-product'),
     # Product Reviews API
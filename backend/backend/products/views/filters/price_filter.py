@@ -143,7 +143,7 @@ class PriceFilterViewSet(viewsets.ViewSet):
         end = start + page_size
         
         total_count = queryset.count()
-        products = queryset[start:end]
+        products = ProductListSerializer.setup_eager_loading(queryset)[start:end]
         
         # Serialize products
         serializer = ProductListSerializer(products, many=True, context={'request': request})
@@ -1,6 +1,7 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from django.db.models import Q, Prefetch
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -8,6 +9,16 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.conf import settings
 from products.models import Product
 from products.serializers import ProductListSerializer
+from products.search import filter_by_search
+from products.feed_cache import get_config, get_or_build
+from Main_Application.keyset_pagination import InvalidCursor, paginate_keyset, wants_count
+
+SORT_OPTIONS = ['price', 'created_at', 'title', '-price', '-created_at', '-title']
+
+# Query parameters that select a cached pagination payload
+CACHE_KEY_PARAMS = [
+    'page', 'page_size', 'category', 'subcategory', 'min_price', 'max_price', 'search', 'sort', 'include_count'
+]
 
 class HomePaginationViewSet(viewsets.ViewSet):
     """
@@ -68,6 +79,18 @@ class HomePaginationViewSet(viewsets.ViewSet):
                 type=openapi.TYPE_STRING,
                 enum=['price', 'created_at', 'title', '-price', '-created_at', '-title']
             ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Opaque cursor for keyset pagination (send an empty value for the first page)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'include_count',
+                openapi.IN_QUERY,
+                description="Set to false to skip the total count (default true, false in cursor mode)",
+                type=openapi.TYPE_BOOLEAN
+            ),
         ],
         responses={
             200: openapi.Response(
@@ -92,21 +115,35 @@ class HomePaginationViewSet(viewsets.ViewSet):
     def get_paginated_products(self, request):
         """
         Get paginated products for home page with optional filters
+        The first pages of non-search listings are served from the product feed cache
+        """
+        params = {key: request.query_params.get(key) for key in CACHE_KEY_PARAMS if key in request.query_params}
+        try:
+            page = int(params.get('page', 1))
+        except ValueError:
+            page = 0
+        cacheable = 'search' not in params and 'cursor' not in request.query_params
+        if cacheable and 1 <= page <= get_config()['CACHED_PAGES']:
+            response_data = get_or_build('pagination', params, lambda: self._build_paginated_products(request))
+        else:
+            response_data = self._build_paginated_products(request)
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    def _build_paginated_products(self, request):
+        """
+        Build the paginated products payload for the given request
         """
 
         # Base queryset - only active products
-        queryset = Product.objects.filter(status='active').select_related('category', 'subcategory').prefetch_related('images')
+        queryset = ProductListSerializer.setup_eager_loading(Product.objects.filter(status='active'))
         
         filters_applied = {}
         
         # Search filter
         search_query = request.query_params.get('search', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(tags__icontains=search_query)
-            )
+            # Ranked by relevance unless an explicit sort is requested
+            queryset = filter_by_search(queryset, search_query)
             filters_applied['search'] = search_query
         
         # Category filter
@@ -141,16 +178,19 @@ class HomePaginationViewSet(viewsets.ViewSet):
                 pass
         
         # Sorting
-        sort_by = request.query_params.get('sort', '-created_at')
-        if sort_by in ['price', 'created_at', 'title', '-price', '-created_at', '-title']:
-            queryset = queryset.order_by(sort_by)
-            filters_applied['sort'] = sort_by
+        sort_param = request.query_params.get('sort', '-created_at')
+        sort_by = sort_param if sort_param in SORT_OPTIONS else '-created_at'
+        if search_query and 'sort' not in request.query_params and 'cursor' not in request.query_params:
+            # Keep the relevance ordering from the search index
+            filters_applied['sort'] = 'relevance'
         else:
-            queryset = queryset.order_by('-created_at')
+            # id breaks ties so offset and cursor pages are stable
+            queryset = queryset.order_by(sort_by, '-id' if sort_by.startswith('-') else 'id')
+            if sort_param in SORT_OPTIONS:
+                filters_applied['sort'] = sort_by
         
         # Pagination
         page_size = int(request.query_params.get('page_size', 12))
-        page = int(request.query_params.get('page', 1))
         
         # Ensure page_size is reasonable
         if page_size > 50:
@@ -158,35 +198,39 @@ class HomePaginationViewSet(viewsets.ViewSet):
         elif page_size < 1:
             page_size = 12
         
+        # Keyset (cursor) pagination, keyed on (sort field, id): pass cursor= for the first page
+        if 'cursor' in request.query_params:
+            return self._build_cursor_page(request, queryset, sort_by, page_size, filters_applied)
+        
+        page = int(request.query_params.get('page', 1))
+        
         # Ensure page is valid
         if page < 1:
             page = 1
         
-        # Calculate pagination
-        total_count = queryset.count()
-        total_pages = (total_count + page_size - 1) // page_size
-        
-        # Ensure page doesn't exceed total pages
-        if page > total_pages and total_pages > 0:
-            page = total_pages
+        # Calculate pagination (skipped with include_count=false)
+        if wants_count(request):
+            total_count = queryset.count()
+            total_pages = (total_count + page_size - 1) // page_size
+            
+            # Ensure page doesn't exceed total pages
+            if page > total_pages and total_pages > 0:
+                page = total_pages
+        else:
+            total_count = None
+            total_pages = None
         
         start = (page - 1) * page_size
         end = start + page_size
         
-        products = queryset[start:end]
-        
-        # Serialize products
-        serializer = ProductListSerializer(products, many=True, context={'request': request})
-        
-        # Fix image URLs to be absolute
-        for product_data in serializer.data:
-            if product_data.get('primary_image') and product_data['primary_image'].get('image_url'):
-                if not product_data['primary_image']['image_url'].startswith('http'):
-                    product_data['primary_image']['image_url'] = f"{settings.BACKEND_BASE_URL}{product_data['primary_image']['image_url']}"
+        # Fetch one extra row to know whether a next page exists without counting
+        products = list(queryset[start:end + 1])
+        has_next = len(products) > page_size
+        products = products[:page_size]
         
         # Prepare response data
         response_data = {
-            'results': serializer.data,
+            'results': self._serialize_products(request, products),
             'count': total_count,
             'current_page': page,
             'total_pages': total_pages,
@@ -195,7 +239,7 @@ class HomePaginationViewSet(viewsets.ViewSet):
         }
         
         # Add pagination links
-        if page < total_pages:
+        if has_next:
             next_page = page + 1
             response_data['next'] = f"?page={next_page}&page_size={page_size}"
         else:
@@ -207,7 +251,43 @@ class HomePaginationViewSet(viewsets.ViewSet):
         else:
             response_data['previous'] = None
         
-        return Response(response_data, status=status.HTTP_200_OK)
+        return response_data
+
+    def _build_cursor_page(self, request, queryset, sort_by, page_size, filters_applied):
+        """
+        Build a keyset-paginated payload; deep pages cost the same as the first
+        """
+        try:
+            products, next_cursor, previous_cursor = paginate_keyset(
+                queryset, sort_by, page_size, request.query_params.get('cursor') or None
+            )
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+        
+        return {
+            'results': self._serialize_products(request, products),
+            'count': queryset.count() if wants_count(request, default=False) else None,
+            'page_size': page_size,
+            'filters_applied': filters_applied,
+            'next_cursor': next_cursor,
+            'previous_cursor': previous_cursor,
+            'next': f"?cursor={next_cursor}&page_size={page_size}" if next_cursor else None,
+            'previous': f"?cursor={previous_cursor}&page_size={page_size}" if previous_cursor else None,
+        }
+
+    def _serialize_products(self, request, products):
+        """
+        Serialize a page of products with absolute image URLs
+        """
+        serializer = ProductListSerializer(products, many=True, context={'request': request})
+        
+        # Fix image URLs to be absolute
+        for product_data in serializer.data:
+            if product_data.get('primary_image') and product_data['primary_image'].get('image_url'):
+                if not product_data['primary_image']['image_url'].startswith('http'):
+                    product_data['primary_image']['image_url'] = f"{settings.BACKEND_BASE_URL}{product_data['primary_image']['image_url']}"
+        
+        return serializer.data
 
     @swagger_auto_schema(
         operation_description="Get pagination info without products (for pagination UI)",
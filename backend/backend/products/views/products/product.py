@@ -439,9 +439,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def get_queryset(self):
-        queryset = Product.objects.select_related('category', 'subcategory').prefetch_related(
-            'variants', 'images'
-        )
+        queryset = ProductListSerializer.setup_eager_loading(Product.objects.all())
         
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
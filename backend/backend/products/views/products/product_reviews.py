@@ -3,7 +3,6 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.db.models import Avg, Count
 
 from products.models import Product, ProductReview
 
@@ -24,12 +23,10 @@ def get_product_reviews(request, slug):
             is_approved=True
         ).select_related('user').order_by('-created_at')
         
-        # Calculate average rating
-        avg_rating = reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
-        total_reviews = reviews.count()
-        
-        # Rating distribution
-        rating_distribution = reviews.values('rating').annotate(count=Count('rating')).order_by('-rating')
+        # Rating aggregates are stored on the product
+        avg_rating = product.rating_average
+        total_reviews = product.rating_count
+        rating_distribution = product.rating_distribution
         
         # Prepare reviews data
         reviews_data = []
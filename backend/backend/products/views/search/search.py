@@ -8,6 +8,7 @@ from drf_yasg import openapi
 from django.conf import settings
 from products.models import Product
 from products.serializers import ProductListSerializer
+from products.search import filter_by_search, search_product_ids
 
 class SearchViewSet(viewsets.ViewSet):
     """
@@ -15,7 +16,7 @@ class SearchViewSet(viewsets.ViewSet):
     """
     
     @swagger_auto_schema(
-        operation_description="Search products by name, description, or tags",
+        operation_description="Search products by title, short description, tags, category or subcategory, ranked by relevance",
         manual_parameters=[
             openapi.Parameter(
                 'q',
@@ -102,16 +103,10 @@ class SearchViewSet(viewsets.ViewSet):
             )
         
         # Base queryset - only active products
-        queryset = Product.objects.filter(status='active')
+        queryset = ProductListSerializer.setup_eager_loading(Product.objects.filter(status='active'))
         
-        # Search in title, description, and tags
-        search_query = Q(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(tags__icontains=query)
-        )
-        
-        queryset = queryset.filter(search_query)
+        # Ranked full-text search over title, short description, tags and categories
+        queryset = filter_by_search(queryset, query)
         
         # Apply filters
         filters_applied = {}
@@ -162,9 +157,6 @@ class SearchViewSet(viewsets.ViewSet):
         elif max_val is not None:
             queryset = queryset.filter(effective_max_price__lte=max_val)
         
-        # Order by created_at for now (simplified)
-        queryset = queryset.order_by('-created_at')
-        
         # Pagination
         page_size = int(request.query_params.get('page_size', 12))
         page = int(request.query_params.get('page', 1))
@@ -270,11 +262,10 @@ class SearchViewSet(viewsets.ViewSet):
                 'query': query
             })
         
-        # Get product titles that match the query
-        suggestions = Product.objects.filter(
-            status='active',
-            title__icontains=query
-        ).values_list('title', flat=True).distinct()[:limit]
+        # Get product titles that match the query, best match first
+        product_ids = search_product_ids(query, limit=limit)
+        titles = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'title'))
+        suggestions = [titles[product_id] for product_id in product_ids if product_id in titles]
         
         # Get category names that match the query
         from products.models import Category
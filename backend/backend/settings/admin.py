@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .email_model import EmailSettings, EmailTemplate, EmailLog
+from .email_model import EmailSettings, EmailTemplate, EmailLog, EmailOutbox
 from .footer_settings_model import FooterSettings, SocialMediaLink
 
 # Register your models here.
@@ -49,6 +49,13 @@ class EmailLogAdmin(admin.ModelAdmin):
     search_fields = ['to_email', 'from_email', 'subject']
     readonly_fields = ['created_at', 'sent_at', 'delivered_at']
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['to_email', 'subject']
+    readonly_fields = ['created_at', 'sent_at', 'locked_until', 'last_error']
+
 class SocialMediaLinkInline(admin.TabularInline):
     model = SocialMediaLink
     extra = 1
@@ -262,3 +262,48 @@ class EmailLog(models.Model):
             self.delivered_at = timezone.now()
         
         self.save(update_fields=['status', 'status_message', 'sent_at', 'delivered_at'])
+
+class EmailOutbox(models.Model):
+    """
+    Durable queue of outbound emails, delivered by the email worker
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Recipient and content
+    to_email = models.EmailField(help_text="Recipient email address")
+    subject = models.CharField(max_length=200, blank=True, help_text="Email subject (filled by the renderer if empty)")
+    html_content = models.TextField(blank=True, help_text="HTML content (filled by the renderer if empty)")
+    renderer = models.CharField(max_length=200, blank=True, help_text="Dotted path of a function(outbox) returning (subject, html) at send time")
+    
+    # Delivery state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0, help_text="Delivery attempts made")
+    next_attempt_at = models.DateTimeField(help_text="Earliest time of the next delivery attempt")
+    locked_until = models.DateTimeField(blank=True, null=True, help_text="Lease of the worker currently sending")
+    last_error = models.TextField(blank=True, null=True, help_text="Error of the last failed attempt")
+    
+    # Settings and tracking
+    email_settings = models.ForeignKey(EmailSettings, on_delete=models.SET_NULL, blank=True, null=True, help_text="SMTP profile, primary profile if empty")
+    email_log = models.OneToOneField(EmailLog, on_delete=models.SET_NULL, blank=True, null=True, related_name='outbox')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='outbound_emails')
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Email Outbox"
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            # Worker polling
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.to_email} - {self.subject or self.renderer} ({self.status})"
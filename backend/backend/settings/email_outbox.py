@@ -0,0 +1,356 @@
+"""
+Email Outbox
+============
+
+Outbound email is written to the EmailOutbox table and delivered by a
+worker pool, so request handlers only pay for one INSERT.
+
+- enqueue_email() adds a row (and its pending EmailLog) in the caller's
+  transaction; once it commits, an in-process dispatcher is woken when
+  settings.EMAIL_OUTBOX['DISPATCH_ON_COMMIT'] is on. The run_email_worker
+  command drains the outbox from a separate process.
+- Rows are claimed with a conditional UPDATE and a lease, so several workers
+  can poll the same table without sending a message twice.
+- SMTP connections are pooled per EmailSettings profile: TLS and login
+  happen once per connection instead of once per message.
+- Failed attempts are retried with exponential backoff up to MAX_ATTEMPTS,
+  and the outcome is recorded in EmailLog.
+"""
+
+import logging
+import queue
+import random
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .email_model import EmailLog, EmailOutbox, EmailSettings
+from Main_Application.conf import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 4,               # messages sent in parallel
+    'BATCH_SIZE': 50,           # rows claimed per poll
+    'MAX_ATTEMPTS': 5,          # attempts before a message is marked failed
+    'BACKOFF_BASE': 30,         # seconds before the first retry, doubled each attempt
+    'BACKOFF_MAX': 3600,        # seconds
+    'LEASE_SECONDS': 300,       # a claimed row is reclaimed after this if its worker died
+    'POOL_SIZE': 2,             # open SMTP connections kept per profile
+    'CONNECTION_MAX_IDLE': 60,  # seconds an idle connection is reused without a NOOP check
+    'SMTP_TIMEOUT': 30,         # seconds
+    'DISPATCH_ON_COMMIT': True,  # deliver from a background thread as soon as a row commits
+}
+
+
+def get_config():
+    """Get outbox settings merged over the defaults"""
+    return get_settings('EMAIL_OUTBOX', DEFAULTS)
+
+
+def get_primary_settings():
+    """Get the primary active SMTP profile"""
+    return EmailSettings.objects.filter(is_primary=True, is_active=True).first()
+
+
+class SMTPConnectionPool:
+    """
+    Reusable, logged-in SMTP connections keyed by EmailSettings profile.
+
+    A profile's pool is dropped when the profile is edited (its updated_at
+    changes), so new credentials take effect on the next message.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    @staticmethod
+    def _key(email_settings):
+        return email_settings.pk, email_settings.updated_at
+
+    @staticmethod
+    def _connect(email_settings):
+        config = email_settings.get_smtp_config()
+        timeout = get_config()['SMTP_TIMEOUT']
+        if config['use_ssl']:
+            server = smtplib.SMTP_SSL(config['host'], config['port'], timeout=timeout, context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(config['host'], config['port'], timeout=timeout)
+            if config['use_tls']:
+                server.starttls(context=ssl.create_default_context())
+        if config['username'] and config['password']:
+            server.login(config['username'], config['password'])
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle is None:
+                # Connections of an older version of this profile are stale
+                for stale in [k for k in self._idle if k[0] == key[0]]:
+                    for server, _ in list(self._idle.pop(stale).queue):
+                        self._close(server)
+                idle = self._idle[key] = queue.LifoQueue()
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            return None
+
+    @contextmanager
+    def connection(self, email_settings, fresh=False):
+        """Borrow a logged-in connection (a new one if fresh); it goes back to the pool unless sending failed"""
+        key = self._key(email_settings)
+        server = None
+        pooled = None if fresh else self._checkout(key)
+        if pooled is not None:
+            server, last_used = pooled
+            if time.monotonic() - last_used > get_config()['CONNECTION_MAX_IDLE']:
+                try:
+                    if server.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected('NOOP failed')
+                except Exception:
+                    self._close(server)
+                    server = None
+        if server is None:
+            server = self._connect(email_settings)
+
+        try:
+            yield server
+        except Exception:
+            self._close(server)
+            raise
+
+        with self._lock:
+            idle = self._idle.get(key)
+        if idle is not None and idle.qsize() < get_config()['POOL_SIZE']:
+            idle.put((server, time.monotonic()))
+        else:
+            self._close(server)
+
+    def close_all(self):
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for idle in pools.values():
+            for server, _ in list(idle.queue):
+                self._close(server)
+
+
+pool = SMTPConnectionPool()
+
+
+def build_message(email_settings, to_email, subject, html_content):
+    """Build the MIME message sent for an outbox row"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = f"{email_settings.from_name} <{email_settings.from_email}>"
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg['Reply-To'] = email_settings.reply_to_email or email_settings.from_email
+    msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return msg
+
+
+def send_message(email_settings, to_email, subject, html_content):
+    """Send one message over a pooled connection, raises on failure"""
+    msg = build_message(email_settings, to_email, subject, html_content)
+    try:
+        with pool.connection(email_settings) as server:
+            server.send_message(msg)
+    except (smtplib.SMTPServerDisconnected, ConnectionError):
+        # The server dropped a pooled connection since it was checked; reconnect
+        # once before the attempt counts as failed
+        with pool.connection(email_settings, fresh=True) as server:
+            server.send_message(msg)
+
+
+def enqueue_email(to_email, subject='', html_content='', renderer='', email_settings=None, user=None, order=None):
+    """
+    Queue an email for delivery and return the outbox row.
+
+    Either pass the rendered subject/html_content, or a renderer: the dotted
+    path of a function(outbox) returning (subject, html_content), called by
+    the worker so the caller does not pay for rendering.
+    """
+    email_settings = email_settings or get_primary_settings()
+    log = EmailLog.objects.create(
+        to_email=to_email,
+        from_email=email_settings.from_email if email_settings else '',
+        subject=subject[:200],
+        status='pending',
+        email_settings_used=email_settings,
+        user=user,
+        order=order,
+    )
+    outbox = EmailOutbox.objects.create(
+        to_email=to_email,
+        subject=subject[:200],
+        html_content=html_content,
+        renderer=renderer,
+        email_settings=email_settings,
+        email_log=log,
+        user=user,
+        order=order,
+        next_attempt_at=timezone.now(),
+    )
+    if get_config()['DISPATCH_ON_COMMIT']:
+        transaction.on_commit(dispatch)
+    return outbox
+
+
+def backoff_delay(attempts, config=None):
+    """Seconds to wait before retrying after the given number of failed attempts"""
+    config = config or get_config()
+    delay = min(config['BACKOFF_BASE'] * (2 ** max(attempts - 1, 0)), config['BACKOFF_MAX'])
+    # Up to 10% jitter so a burst of failures does not retry in lockstep
+    return delay + random.uniform(0, delay * 0.1)
+
+
+def claim_batch(limit=None, now=None):
+    """Lease up to limit due rows to this worker, returns the claimed rows"""
+    config = get_config()
+    now = now or timezone.now()
+    limit = limit or config['BATCH_SIZE']
+    due = EmailOutbox.objects.filter(status='queued', next_attempt_at__lte=now)
+    expired_leases = EmailOutbox.objects.filter(status='sending', locked_until__lte=now)
+    candidates = list(due.values_list('id', flat=True)[:limit])
+    if len(candidates) < limit:
+        candidates += list(expired_leases.values_list('id', flat=True)[:limit - len(candidates)])
+
+    lease = now + timedelta(seconds=config['LEASE_SECONDS'])
+    claimed = []
+    for outbox_id in candidates:
+        # Only one worker's conditional update can win a row
+        won = EmailOutbox.objects.filter(id=outbox_id, status__in=['queued', 'sending']).filter(
+            next_attempt_at__lte=now
+        ).exclude(status='sending', locked_until__gt=now).update(status='sending', locked_until=lease)
+        if won:
+            claimed.append(outbox_id)
+    return list(EmailOutbox.objects.filter(id__in=claimed).select_related('email_settings', 'email_log'))
+
+
+def _render(outbox):
+    if outbox.renderer and not outbox.html_content:
+        subject, html_content = import_string(outbox.renderer)(outbox)
+        outbox.subject = outbox.subject or subject[:200]
+        outbox.html_content = html_content
+    return outbox.subject, outbox.html_content
+
+
+def deliver(outbox):
+    """Attempt one delivery of a claimed row and record the outcome, returns True when sent"""
+    config = get_config()
+    outbox.attempts += 1
+    try:
+        email_settings = outbox.email_settings or get_primary_settings()
+        if email_settings is None:
+            raise RuntimeError('No active primary email settings')
+        subject, html_content = _render(outbox)
+        send_message(email_settings, outbox.to_email, subject, html_content)
+    except Exception as e:
+        outbox.last_error = str(e)
+        outbox.locked_until = None
+        if outbox.attempts >= config['MAX_ATTEMPTS']:
+            outbox.status = 'failed'
+        else:
+            outbox.status = 'queued'
+            outbox.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(outbox.attempts, config))
+        outbox.save(update_fields=['attempts', 'status', 'next_attempt_at', 'locked_until', 'last_error'])
+        if outbox.email_log_id:
+            outbox.email_log.additional_data = {**outbox.email_log.additional_data, 'attempts': outbox.attempts}
+            outbox.email_log.save(update_fields=['additional_data'])
+            if outbox.status == 'failed':
+                outbox.email_log.update_status('failed', str(e))
+        logger.warning(f"Email to {outbox.to_email} failed (attempt {outbox.attempts}): {e}")
+        return False
+
+    outbox.status = 'sent'
+    outbox.sent_at = timezone.now()
+    outbox.locked_until = None
+    outbox.last_error = None
+    outbox.email_settings = email_settings
+    outbox.save(update_fields=[
+        'attempts', 'status', 'sent_at', 'locked_until', 'last_error',
+        'subject', 'html_content', 'email_settings',
+    ])
+    if outbox.email_log_id:
+        log = outbox.email_log
+        log.subject = subject[:200]
+        log.html_content = html_content
+        log.from_email = email_settings.from_email
+        log.email_settings_used = email_settings
+        log.additional_data = {**log.additional_data, 'attempts': outbox.attempts}
+        log.save(update_fields=['subject', 'html_content', 'from_email', 'email_settings_used', 'additional_data'])
+        log.update_status('sent', 'Email sent successfully')
+    return True
+
+
+def _deliver_in_thread(outbox):
+    try:
+        return deliver(outbox)
+    finally:
+        connections.close_all()
+
+
+def process_outbox(limit=None, workers=None):
+    """Claim one batch of due rows and deliver them in parallel, returns (sent, failed)"""
+    workers = workers or get_config()['WORKERS']
+    batch = claim_batch(limit)
+    if not batch:
+        return 0, 0
+    if workers <= 1 or len(batch) == 1:
+        results = [deliver(outbox) for outbox in batch]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_deliver_in_thread, batch))
+    sent = sum(1 for result in results if result)
+    return sent, len(results) - sent
+
+
+_dispatcher = threading.Lock()
+_wake = threading.Event()
+
+
+def _drain():
+    try:
+        while True:
+            _wake.clear()
+            close_old_connections()
+            sent, failed = process_outbox()
+            if not sent and not failed and not _wake.is_set():
+                break
+    except Exception as e:
+        logger.error(f"Email dispatcher stopped: {e}")
+    finally:
+        connections.close_all()
+        _dispatcher.release()
+    # A row committed while this thread was finishing
+    if _wake.is_set():
+        dispatch()
+
+
+def dispatch():
+    """Drain due outbox rows from a background thread, unless one is already running"""
+    _wake.set()
+    if not _dispatcher.acquire(blocking=False):
+        return
+    threading.Thread(target=_drain, name='email-outbox', daemon=True).start()
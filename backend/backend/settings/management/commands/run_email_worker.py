@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from settings.email_outbox import pool, process_outbox
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the email outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the due emails and exit instead of polling',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds between polls when the outbox is empty',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of emails sent in parallel',
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        try:
+            while True:
+                close_old_connections()
+                sent, failed = process_outbox(workers=options['workers'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} emails, {failed} failed attempts')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close_all()
+        self.stdout.write(self.style.SUCCESS(f'Email worker finished: {total_sent} sent, {total_failed} failed attempts'))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-16 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_stock_reservations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('settings', '0006_footersettings_business_hours_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_email', models.EmailField(help_text='Recipient email address', max_length=254)),
+                ('subject', models.CharField(blank=True, help_text='Email subject (filled by the renderer if empty)', max_length=200)),
+                ('html_content', models.TextField(blank=True, help_text='HTML content (filled by the renderer if empty)')),
+                ('renderer', models.CharField(blank=True, help_text='Dotted path of a function(outbox) returning (subject, html) at send time', max_length=200)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Delivery attempts made')),
+                ('next_attempt_at', models.DateTimeField(help_text='Earliest time of the next delivery attempt')),
+                ('locked_until', models.DateTimeField(blank=True, help_text='Lease of the worker currently sending', null=True)),
+                ('last_error', models.TextField(blank=True, help_text='Error of the last failed attempt', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('email_log', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox', to='settings.emaillog')),
+                ('email_settings', models.ForeignKey(blank=True, help_text='SMTP profile, primary profile if empty', null=True, on_delete=django.db.models.deletion.SET_NULL, to='settings.emailsettings')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='orders.order')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbound_emails', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Outbound Email',
+                'verbose_name_plural': 'Email Outbox',
+                'ordering': ['next_attempt_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='settings_em_status_747c31_idx')],
+            },
+        ),
+    ]
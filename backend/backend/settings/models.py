@@ -4,7 +4,7 @@ from PIL import Image
 import os
 
 # Import email models
-from .email_model import EmailSettings, EmailTemplate, EmailLog
+from .email_model import EmailSettings, EmailTemplate, EmailLog, EmailOutbox
 
 # Import footer models
 from .footer_settings_model import FooterSettings, SocialMediaLink
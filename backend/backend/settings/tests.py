@@ -1,3 +1,140 @@
-from django.test import TestCase
+import socket
+import unittest
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from settings.email_model import EmailLog, EmailOutbox, EmailSettings
+from settings import email_outbox
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+except ImportError:  # aiosmtpd is only needed by these tests
+    Controller = None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class RecordingHandler:
+    """Local SMTP stand-in that records messages and the connections they arrived on"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+        self.logins = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return '250 OK'
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        self.logins += 1
+        return AuthResult(success=True)
+
+
+@override_settings(EMAIL_OUTBOX={'DISPATCH_ON_COMMIT': False, 'BACKOFF_BASE': 30, 'MAX_ATTEMPTS': 3})
+class EmailOutboxTests(TestCase):
+    """Queued emails are delivered over pooled connections and retried with backoff"""
+
+    def setUp(self):
+        self.port = free_port()
+        owner = User.objects.create_user(email='admin@example.com', password='pass12345')
+        self.email_settings = EmailSettings.objects.create(
+            name='Local', email_address='shop@example.com', email_password='secret',
+            smtp_host='127.0.0.1', smtp_port=self.port, use_tls=False, use_ssl=False,
+            from_name='Shop', from_email='shop@example.com', is_primary=True, created_by=owner,
+        )
+        email_outbox.pool.close_all()
+        self.addCleanup(email_outbox.pool.close_all)
+        self.servers = []
+        self.addCleanup(self.stop_servers)
+
+    def start_server(self):
+        handler = RecordingHandler()
+        controller = Controller(
+            handler, hostname='127.0.0.1', port=self.port,
+            authenticator=handler.authenticate, auth_require_tls=False,
+        )
+        controller.start()
+        self.servers.append(controller)
+        return handler
+
+    def stop_servers(self):
+        while self.servers:
+            self.servers.pop().stop()
+
+    @unittest.skipIf(Controller is None, 'aiosmtpd is not installed')
+    def test_queued_emails_share_one_connection(self):
+        handler = self.start_server()
+        for i in range(5):
+            email_outbox.enqueue_email(f'customer{i}@example.com', f'Hello {i}', '<p>Hi</p>')
+
+        sent, failed = email_outbox.process_outbox(workers=1)
+
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(len(handler.messages), 5)
+        self.assertEqual(len(handler.sessions), 1)
+        self.assertEqual(handler.logins, 1)
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 5)
+        self.assertEqual(EmailLog.objects.filter(status='sent', email_settings_used=self.email_settings).count(), 5)
+        self.assertEqual(email_outbox.process_outbox(), (0, 0))
+
+    @unittest.skipIf(Controller is None, 'aiosmtpd is not installed')
+    def test_dropped_pooled_connection_is_reopened_without_a_failed_attempt(self):
+        self.start_server()
+        email_outbox.enqueue_email('first@example.com', 'Hello', '<p>Hi</p>')
+        self.assertEqual(email_outbox.process_outbox(workers=1), (1, 0))
+
+        # Restarting the server drops the pooled connection
+        self.stop_servers()
+        handler = self.start_server()
+        outbox = email_outbox.enqueue_email('second@example.com', 'Hello', '<p>Hi</p>')
+
+        self.assertEqual(email_outbox.process_outbox(workers=1), (1, 0))
+        outbox.refresh_from_db()
+        self.assertEqual((outbox.status, outbox.attempts), ('sent', 1))
+        self.assertEqual((len(handler.messages), handler.logins), (1, 1))
+
+    @unittest.skipIf(Controller is None, 'aiosmtpd is not installed')
+    def test_renderer_runs_in_the_worker(self):
+        handler = self.start_server()
+        outbox = email_outbox.enqueue_email('customer@example.com', renderer='settings.tests.render_greeting')
+
+        email_outbox.process_outbox()
+
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.subject, 'Greeting for customer@example.com')
+        self.assertIn(b'Subject: Greeting for customer@example.com', handler.messages[0].original_content)
+
+    def test_failed_delivery_is_retried_with_backoff_then_marked_failed(self):
+        # Nothing listens on the port
+        outbox = email_outbox.enqueue_email('customer@example.com', 'Hello', '<p>Hi</p>')
+        before = timezone.now()
+
+        self.assertEqual(email_outbox.process_outbox(), (0, 1))
+
+        outbox.refresh_from_db()
+        self.assertEqual((outbox.status, outbox.attempts), ('queued', 1))
+        self.assertGreaterEqual(outbox.next_attempt_at, before + timedelta(seconds=30))
+        # Not due yet
+        self.assertEqual(email_outbox.process_outbox(), (0, 0))
+
+        for _ in range(2):
+            EmailOutbox.objects.filter(pk=outbox.pk).update(next_attempt_at=timezone.now())
+            email_outbox.process_outbox()
+
+        outbox.refresh_from_db()
+        self.assertEqual((outbox.status, outbox.attempts), ('failed', 3))
+        self.assertEqual(outbox.email_log.status, 'failed')
+
+
+def render_greeting(outbox):
+    return f'Greeting for {outbox.to_email}', '<p>Hello</p>'